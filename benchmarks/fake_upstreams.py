@@ -0,0 +1,163 @@
+"""
+In-process stand-ins for Piston and an OpenAI-compatible chat completions API.
+
+Both servers answer after a latency drawn from a log-normal distribution
+(median and sigma configurable) and fail a configurable fraction of requests
+with 503, so benchmarks can exercise queueing, retries and hedging without
+network access.
+"""
+import asyncio
+import json
+import random
+import socket
+import threading
+import time
+from dataclasses import dataclass
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+PISTON_RUNTIMES = [
+    {"language": "python", "version": "3.10.0", "aliases": ["py", "python3"]},
+    {"language": "javascript", "version": "18.15.0", "aliases": ["node", "js"]},
+    {"language": "java", "version": "15.0.2", "aliases": []},
+    {"language": "c++", "version": "10.2.0", "aliases": ["cpp", "g++"]},
+    {"language": "c", "version": "10.2.0", "aliases": ["gcc"]},
+    {"language": "ruby", "version": "3.0.1", "aliases": ["rb"]},
+    {"language": "go", "version": "1.16.2", "aliases": ["golang"]},
+    {"language": "rust", "version": "1.68.2", "aliases": ["rs"]},
+    {"language": "php", "version": "8.2.3", "aliases": []},
+]
+
+COMPILED_LANGUAGES = {"java", "cpp", "c", "go", "rust"}
+
+TRANSLATED_CODE = "```javascript\nfunction main() {\n    console.log('translated');\n}\n\nmain();\n```"
+
+
+@dataclass
+class LatencyProfile:
+    """Log-normal latency (median in ms, sigma of the underlying normal) plus an error rate."""
+    median_ms: float = 50.0
+    sigma: float = 0.5
+    error_rate: float = 0.0
+
+    def sample(self) -> float:
+        if self.median_ms <= 0:
+            return 0.0
+        return random.lognormvariate(0.0, self.sigma) * self.median_ms / 1000.0
+
+    def should_fail(self) -> bool:
+        return random.random() < self.error_rate
+
+
+def create_fake_piston(profile: LatencyProfile) -> FastAPI:
+    app = FastAPI()
+    app.state.requests = 0
+
+    @app.get("/runtimes")
+    async def runtimes():
+        return PISTON_RUNTIMES
+
+    @app.post("/execute")
+    async def execute(request: Request):
+        app.state.requests += 1
+        body = await request.json()
+        await asyncio.sleep(profile.sample())
+        if profile.should_fail():
+            return JSONResponse(status_code=503, content={"message": "fake piston overloaded"})
+
+        stdout = f"ran {len(body['files'][0]['content'])} bytes\n"
+        result = {
+            "language": body["language"],
+            "version": body.get("version", "*"),
+            "run": {"stdout": stdout, "stderr": "", "output": stdout, "code": 0, "signal": None}
+        }
+        if body["language"] in COMPILED_LANGUAGES:
+            result["compile"] = {"stdout": "", "stderr": "", "output": "", "code": 0, "signal": None}
+        return result
+
+    return app
+
+
+def create_fake_openai(profile: LatencyProfile, token_delay_ms: float = 5.0) -> FastAPI:
+    """Answers /v1/chat/completions (and Groq's /openai/v1/... path), streamed or not."""
+    app = FastAPI()
+    app.state.requests = 0
+
+    async def chat_completions(request: Request):
+        app.state.requests += 1
+        body = await request.json()
+        prompt_tokens = sum(len(message["content"]) for message in body["messages"]) // 4
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(TRANSLATED_CODE) // 4,
+            "total_tokens": prompt_tokens + len(TRANSLATED_CODE) // 4,
+            # Groq also reports timings, as floats
+            "queue_time": 0.012,
+            "prompt_time": 0.004,
+            "completion_time": 0.05,
+            "total_time": 0.054
+        }
+
+        # Time to first token
+        await asyncio.sleep(profile.sample())
+        if profile.should_fail():
+            return JSONResponse(status_code=503, content={"error": {"message": "fake upstream overloaded"}})
+
+        if not body.get("stream"):
+            return {
+                "id": "chatcmpl-bench",
+                "object": "chat.completion",
+                "model": body["model"],
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": TRANSLATED_CODE},
+                             "finish_reason": "stop"}],
+                "usage": usage
+            }
+
+        async def events():
+            for index in range(0, len(TRANSLATED_CODE), 8):
+                chunk = {"choices": [{"index": 0, "delta": {"content": TRANSLATED_CODE[index:index + 8]}}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(token_delay_ms / 1000.0)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    app.add_api_route("/v1/chat/completions", chat_completions, methods=["POST"])
+    app.add_api_route("/openai/v1/chat/completions", chat_completions, methods=["POST"])
+    return app
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class BackgroundServer:
+    """Runs an ASGI app with uvicorn on its own thread and event loop."""
+
+    def __init__(self, app, port: int = 0, lifespan: str = "auto"):
+        self.port = port or free_port()
+        config = uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="error",
+                                access_log=False, lifespan=lifespan)
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self, timeout: float = 15.0) -> "BackgroundServer":
+        self.thread.start()
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if not self.thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError(f"Server on port {self.port} failed to start")
+            time.sleep(0.01)
+        return self
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
@@ -0,0 +1,304 @@
+"""
+Throughput and latency benchmarks for the compile and translate endpoints.
+
+Starts fake Piston and OpenAI-compatible servers plus the CodeVerse app on
+localhost, drives each endpoint at fixed concurrency levels and reports
+throughput and latency percentiles. Everything runs offline in one process,
+so numbers are only meaningful relative to other runs on the same machine.
+
+    python -m benchmarks.run                                  # print results
+    python -m benchmarks.run --output benchmarks/baseline.json  # record a baseline
+    python -m benchmarks.run --baseline benchmarks/baseline.json  # compare, exit 1 on regression
+
+Limits of the app under test (e.g. GROQ_REQUESTS_PER_SECOND) can be set in the
+environment; by default upstream rate limits are lifted so the benchmark
+measures CodeVerse itself.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+project_root = str(Path(__file__).parent.parent.absolute())
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from benchmarks.fake_upstreams import (  # noqa: E402
+    BackgroundServer, LatencyProfile, create_fake_openai, create_fake_piston
+)
+
+BASELINE_VERSION = 1
+
+
+def _compile_body(index: int, unique: bool) -> Dict:
+    marker = index if unique else 0
+    return {"source_code": f"print('hello {marker}')", "language": "python", "stdin": ""}
+
+
+def _translate_body(index: int, unique: bool) -> Dict:
+    marker = index if unique else 0
+    return {
+        "source_code": f"def handler(x):\n    return x + {marker}\n\nprint(handler(1))",
+        "source_language": "python",
+        "target_language": "javascript"
+    }
+
+
+# name -> (path, request body factory)
+SCENARIOS: Dict[str, tuple] = {
+    "compile": ("/compile", _compile_body),
+    "api_compile": ("/api/compile", _compile_body),
+    "translate": ("/translate", _translate_body),
+    "api_translate": ("/api/translate", _translate_body),
+}
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    rank = max(1, min(len(ordered), int(round(q * len(ordered) + 0.5))))
+    return ordered[rank - 1]
+
+
+def _is_success(response: httpx.Response) -> bool:
+    if response.status_code != 200:
+        return False
+    try:
+        return response.json().get("success", True) is not False
+    except ValueError:
+        return False
+
+
+async def run_level(
+    client: httpx.AsyncClient,
+    base_url: str,
+    path: str,
+    body: Callable[[int, bool], Dict],
+    concurrency: int,
+    requests: int,
+    unique: bool,
+    offset: int
+) -> Dict:
+    """Closed-loop load: `concurrency` workers send `requests` requests in total."""
+    latencies: List[float] = []
+    errors = 0
+    statuses: Dict[str, int] = {}
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index, errors
+        while next_index < requests:
+            index = offset + next_index
+            next_index += 1
+            started = time.perf_counter()
+            try:
+                response = await client.post(f"{base_url}{path}", json=body(index, unique))
+                ok = _is_success(response)
+                status = str(response.status_code)
+            except httpx.HTTPError:
+                ok, status = False, "error"
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    ordered = sorted(latencies)
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": statuses,
+        "duration_s": round(elapsed, 4),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0,
+            "p50": round(percentile(ordered, 0.50) * 1000, 3),
+            "p95": round(percentile(ordered, 0.95) * 1000, 3),
+            "p99": round(percentile(ordered, 0.99) * 1000, 3),
+            "max": round(ordered[-1] * 1000, 3) if ordered else 0.0
+        }
+    }
+
+
+async def run_benchmarks(base_url: str, args) -> Dict[str, Dict]:
+    results = {}
+    limits = httpx.Limits(max_connections=max(args.concurrency) * 2, max_keepalive_connections=max(args.concurrency))
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        offset = 0
+        for name in args.scenarios:
+            path, body = SCENARIOS[name]
+            # Warm up connections, runtime lookups and lazily created clients
+            await run_level(client, base_url, path, body, 1, args.warmup, args.unique, offset)
+            offset += args.warmup
+            for concurrency in args.concurrency:
+                result = await run_level(
+                    client, base_url, path, body, concurrency, args.requests, args.unique, offset
+                )
+                offset += args.requests
+                result["scenario"] = name
+                result["path"] = path
+                results[f"{name}@c{concurrency}"] = result
+                print(_format_row(f"{name}@c{concurrency}", result), file=sys.__stdout__, flush=True)
+    return results
+
+
+def _format_row(key: str, result: Dict) -> str:
+    latency = result["latency_ms"]
+    return (
+        f"{key:<22} {result['throughput_rps']:>9.1f} req/s  "
+        f"p50 {latency['p50']:>8.1f}ms  p95 {latency['p95']:>8.1f}ms  p99 {latency['p99']:>8.1f}ms  "
+        f"errors {result['errors']}/{result['requests']}"
+    )
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Regressions of throughput or p95/p99 latency beyond `tolerance` (a fraction)."""
+    regressions = []
+    for key, result in current["results"].items():
+        base = baseline.get("results", {}).get(key)
+        if base is None:
+            continue
+        if result["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{key}: throughput {result['throughput_rps']} req/s < baseline {base['throughput_rps']} req/s"
+            )
+        for quantile in ("p95", "p99"):
+            now, before = result["latency_ms"][quantile], base["latency_ms"][quantile]
+            # Ignore sub-millisecond jitter on very fast paths
+            if now > before * (1 + tolerance) and now - before > 1.0:
+                regressions.append(f"{key}: {quantile} {now}ms > baseline {before}ms")
+        if result["errors"] > base["errors"]:
+            regressions.append(f"{key}: {result['errors']} errors, baseline had {base['errors']}")
+    return regressions
+
+
+def configure_environment(args, piston_url: str, llm_url: str, workdir: str):
+    """Point the app at the fakes and isolate its caches. Existing variables win."""
+    headroom = str(max(args.concurrency) * 4)
+    defaults = {
+        "PISTON_URL": piston_url,
+        "GROQ_BASE_URL": f"{llm_url}/openai/v1/chat/completions",
+        "GROQ_API_KEY": "bench",
+        "LLM_PROVIDERS": "groq",
+        "EXECUTION_BACKEND": "piston",
+        "TRANSLATION_CACHE_PATH": os.path.join(workdir, "translations.sqlite3"),
+        "MIGRATION_ROOT": os.path.join(workdir, "migrations"),
+        "ARTIFACT_CACHE_DIR": os.path.join(workdir, "artifacts"),
+        "CODEVERSE_HTTP2": "false",
+        "LOG_LEVEL": "WARNING",
+    }
+    for upstream in ("PISTON", "GROQ"):
+        defaults.update({
+            f"{upstream}_REQUESTS_PER_SECOND": "0",
+            f"{upstream}_MAX_CONCURRENCY": headroom,
+            f"{upstream}_MAX_QUEUE": headroom,
+        })
+    for name, value in defaults.items():
+        os.environ.setdefault(name, value)
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help="comma separated subset of: " + ", ".join(SCENARIOS))
+    parser.add_argument("--concurrency", default="1,8,32", help="comma separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario and concurrency level")
+    parser.add_argument("--warmup", type=int, default=10, help="warm-up requests per scenario")
+    parser.add_argument("--timeout", type=float, default=60.0, help="client timeout per request, in seconds")
+    parser.add_argument("--repeat-payloads", dest="unique", action="store_false",
+                        help="send identical payloads (measures caching/coalescing instead of upstream calls)")
+    parser.add_argument("--piston-latency-ms", type=float, default=50.0, help="median fake Piston latency")
+    parser.add_argument("--piston-sigma", type=float, default=0.5, help="log-normal sigma of Piston latency")
+    parser.add_argument("--piston-error-rate", type=float, default=0.0, help="fraction of Piston calls answered 503")
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0, help="median fake LLM time to first token")
+    parser.add_argument("--llm-sigma", type=float, default=0.5, help="log-normal sigma of LLM latency")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="fraction of LLM calls answered 503")
+    parser.add_argument("--llm-token-delay-ms", type=float, default=5.0, help="delay between streamed chunks")
+    parser.add_argument("--output", help="write results as JSON (use as a baseline later)")
+    parser.add_argument("--baseline", help="compare against a previous --output file")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed regression, as a fraction")
+    parser.add_argument("--verbose", action="store_true", help="keep the app's own output")
+    args = parser.parse_args(argv)
+
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+    args.concurrency = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    piston_profile = LatencyProfile(args.piston_latency_ms, args.piston_sigma, args.piston_error_rate)
+    llm_profile = LatencyProfile(args.llm_latency_ms, args.llm_sigma, args.llm_error_rate)
+
+    piston = BackgroundServer(create_fake_piston(piston_profile)).start()
+    llm = BackgroundServer(create_fake_openai(llm_profile, args.llm_token_delay_ms)).start()
+    workdir = tempfile.mkdtemp(prefix="codeverse-bench-")
+    configure_environment(args, piston.url, llm.url, workdir)
+
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    with quiet:
+        # Imported only now: services read their configuration at import time
+        from codeverse.main import app
+        server = BackgroundServer(app, lifespan="on").start()
+        try:
+            results = asyncio.run(run_benchmarks(server.url, args))
+        finally:
+            server.stop()
+            llm.stop()
+            piston.stop()
+
+    report = {
+        "version": BASELINE_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count()
+        },
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "unique_payloads": args.unique,
+            "piston": vars(piston_profile),
+            "llm": {**vars(llm_profile), "token_delay_ms": args.llm_token_delay_ms}
+        },
+        "results": results
+    }
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Wrote {args.output}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        if baseline.get("config") != report["config"]:
+            print("Warning: baseline was recorded with a different configuration")
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
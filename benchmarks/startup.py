@@ -0,0 +1,161 @@
+"""
+Cold-start benchmark: import time, startup time and memory of a fresh worker.
+
+Each sample runs in a new interpreter that imports codeverse.main, runs the
+app's startup (lifespan) and answers one request, recording wall time for each
+phase and the process' peak RSS. No upstreams are contacted and no API keys are
+set, so this also checks that a worker boots without them.
+
+    python -m benchmarks.startup                                        # print results
+    python -m benchmarks.startup --output benchmarks/startup_baseline.json
+    python -m benchmarks.startup --baseline benchmarks/startup_baseline.json  # exit 1 on regression
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+project_root = str(Path(__file__).parent.parent.absolute())
+
+BASELINE_VERSION = 1
+
+# Runs in the child interpreter; prints one JSON line
+PROBE = """
+import json, resource, sys, time
+started = time.perf_counter()
+from codeverse.main import app
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(app) as client:
+    ready = time.perf_counter()
+    status = client.get("/").status_code
+    answered = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "startup_ms": (ready - imported) * 1000,
+    "first_request_ms": (answered - ready) * 1000,
+    "total_ms": (answered - started) * 1000,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "libcst_loaded": "libcst" in sys.modules,
+    "status": status
+}))
+"""
+
+METRICS = ("import_ms", "startup_ms", "first_request_ms", "total_ms", "max_rss_mb")
+
+
+def run_probe(env: Dict[str, str]) -> Dict:
+    completed = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=project_root, env=env,
+        capture_output=True, text=True, timeout=120
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Startup probe failed:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def probe_environment(workdir: str) -> Dict[str, str]:
+    env = {
+        name: value for name, value in os.environ.items()
+        if not name.endswith("_API_KEY")
+    }
+    env.update({
+        "PYTHONPATH": project_root,
+        "PYTHONDONTWRITEBYTECODE": "1",
+        "LOG_LEVEL": env.get("LOG_LEVEL", "WARNING"),
+        "MIGRATION_ROOT": os.path.join(workdir, "migrations"),
+        "TRANSLATION_CACHE_PATH": os.path.join(workdir, "translations.sqlite3"),
+        "ARTIFACT_CACHE_DIR": os.path.join(workdir, "artifacts"),
+    })
+    return env
+
+
+def summarize(samples: List[Dict]) -> Dict:
+    summary = {}
+    for name in METRICS:
+        values = sorted(sample[name] for sample in samples)
+        summary[name] = {
+            "median": round(statistics.median(values), 2),
+            "min": round(values[0], 2),
+            "max": round(values[-1], 2)
+        }
+    summary["libcst_loaded"] = any(sample["libcst_loaded"] for sample in samples)
+    return summary
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Median regressions beyond `tolerance` (a fraction), ignoring differences under 5ms / 2MB."""
+    regressions = []
+    for name in METRICS:
+        now = current["results"][name]["median"]
+        before = baseline.get("results", {}).get(name, {}).get("median")
+        if before is None:
+            continue
+        floor = 2.0 if name == "max_rss_mb" else 5.0
+        if now > before * (1 + tolerance) and now - before > floor:
+            regressions.append(f"{name}: median {now} > baseline {before}")
+    return regressions
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=7, help="fresh interpreters to sample")
+    parser.add_argument("--output", help="write results as JSON (use as a baseline later)")
+    parser.add_argument("--baseline", help="compare against a previous --output file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression, as a fraction")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    env = probe_environment(tempfile.mkdtemp(prefix="codeverse-startup-"))
+
+    # One discarded run so every sample sees a warm OS page cache
+    run_probe(env)
+    samples = [run_probe(env) for _ in range(args.runs)]
+    results = summarize(samples)
+
+    for name in METRICS:
+        unit = "MB" if name == "max_rss_mb" else "ms"
+        stats = results[name]
+        print(f"{name:<18} median {stats['median']:>8.1f}{unit}  min {stats['min']:>8.1f}{unit}  "
+              f"max {stats['max']:>8.1f}{unit}")
+    print(f"libcst imported at startup: {results['libcst_loaded']}")
+
+    report = {
+        "version": BASELINE_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count()
+        },
+        "config": {"runs": args.runs},
+        "results": results
+    }
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Wrote {args.output}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
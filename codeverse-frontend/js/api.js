@@ -41,6 +41,116 @@ async function translateCode(sourceCode, sourceLang, targetLang) {
     }
 }
 
+// Editor parse sessions: the server keeps a parsed copy of the source editor's
+// text and receives only edits. Each call resolves to { status, data } so the
+// caller can resync on 404 (session expired) or 409 (out of sync).
+async function parseSessionRequest(method, path, body) {
+    const response = await fetch(`${API_BASE_URL}/api/sessions${path}`, {
+        method,
+        headers: {
+            'Content-Type': 'application/json',
+            'Accept': 'application/json'
+        },
+        body: body === undefined ? undefined : JSON.stringify(body)
+    });
+    return { status: response.status, data: await response.json() };
+}
+
+function openParseSession(language, text) {
+    return parseSessionRequest('POST', '', { language, text });
+}
+
+function replaceParseSession(sessionId, language, text) {
+    return parseSessionRequest('PUT', `/${sessionId}`, { language, text });
+}
+
+function sendParseSessionEdits(sessionId, version, edits) {
+    return parseSessionRequest('POST', `/${sessionId}/edits`, { version, edits });
+}
+
+// One WebSocket for the page's compile, translate and analyze jobs. The server
+// debounces jobs and cancels one when a newer job for the same document and
+// type arrives; submit() resolves with the result for its version and rejects
+// with error.superseded set when a newer version replaced it.
+function openEditorConnection() {
+    const url = API_BASE_URL.replace(/^http/, 'ws') + '/api/editor/ws';
+    let socket = null;
+    let queue = [];
+    // `${type}:${document}` -> { version, resolve, reject, onToken }
+    const waiting = new Map();
+
+    function superseded(message) {
+        const error = new Error(message);
+        error.superseded = true;
+        return error;
+    }
+
+    function connect() {
+        const ws = new WebSocket(url);
+        socket = ws;
+        ws.onopen = () => {
+            for (const message of queue) ws.send(JSON.stringify(message));
+            queue = [];
+        };
+        ws.onmessage = (event) => {
+            const frame = JSON.parse(event.data);
+            const key = `${frame.kind}:${frame.document}`;
+            const job = waiting.get(key);
+            // Frames for versions the page has moved past are stale
+            if (!job || frame.version !== job.version) return;
+            if (frame.type === 'token') {
+                // Translations stream their text before the result frame
+                if (job.onToken) job.onToken(frame.content);
+                return;
+            }
+            waiting.delete(key);
+            if (frame.type === 'result') {
+                job.resolve(frame.result);
+            } else if (frame.type === 'cancelled') {
+                job.reject(superseded('Cancelled'));
+            } else {
+                job.reject(new Error(frame.error));
+            }
+        };
+        ws.onclose = () => {
+            if (socket !== ws) return;
+            socket = null;
+            // Jobs the server was running are lost with the connection
+            for (const job of waiting.values()) job.reject(new Error('Connection to the server was lost'));
+            waiting.clear();
+        };
+    }
+
+    function send(message) {
+        if (!socket || socket.readyState === WebSocket.CLOSING || socket.readyState === WebSocket.CLOSED) {
+            connect();
+        }
+        if (socket.readyState === WebSocket.OPEN) {
+            socket.send(JSON.stringify(message));
+        } else {
+            queue.push(message);
+        }
+    }
+
+    return {
+        // `request` is the body of the matching HTTP endpoint; debounceMs
+        // overrides the server's delay (0 for an explicit click); onToken
+        // receives a translation's text as it streams in
+        submit(type, document, version, request, debounceMs, onToken) {
+            const key = `${type}:${document}`;
+            const previous = waiting.get(key);
+            if (previous) previous.reject(superseded('Superseded by a newer version'));
+            return new Promise((resolve, reject) => {
+                waiting.set(key, { version, resolve, reject, onToken });
+                send({ type, document, version, request, debounce_ms: debounceMs });
+            });
+        },
+        cancel(document) {
+            send({ type: 'cancel', document });
+        }
+    };
+}
+
 // Function to run code
 async function runCode(code, language, outputId) {
     clearTerminal(outputId);
@@ -69,6 +69,13 @@ require(['vs/editor/editor.main'], async function () {
     window.sourceEditor = sourceEditor;
     window.targetEditor = targetEditor;
 
+    // Live diagnostics for the source editor, updated from incremental edits
+    const parseSession = startParseSession(sourceEditor, () => document.getElementById('source-language').value);
+
+    // Translations go over one WebSocket; re-translating after an edit only
+    // redoes the functions that changed
+    const editorConnection = openEditorConnection();
+
     // Language change handlers
     document.getElementById('source-language').addEventListener('change', (e) => {
         const lang = e.target.value;
@@ -77,6 +84,7 @@ require(['vs/editor/editor.main'], async function () {
         // Update sample code based on selected language
         const sampleCode = getSampleCode(lang);
         sourceEditor.setValue(sampleCode);
+        parseSession.resync();
     });
 
     document.getElementById('target-language').addEventListener('change', (e) => {
@@ -137,10 +145,21 @@ require(['vs/editor/editor.main'], async function () {
         translateButton.disabled = true;
 
         try {
-            const translatedCode = await translateCode(sourceCode, sourceLang, targetLang);
-            targetEditor.setValue(translatedCode);
+            let streamed = '';
+            const result = await editorConnection.submit('translate', 'source', sourceEditor.getModel().getVersionId(), {
+                source_code: sourceCode,
+                source_language: sourceLang,
+                target_language: targetLang,
+                // Offline rules first only when asked for: they trade accuracy for speed
+                mode: document.getElementById('quick-translate').checked ? 'tiered' : 'llm'
+            }, 0, (token) => {
+                streamed += token;
+                targetEditor.setValue(streamed);
+            });
+            targetEditor.setValue(result.translated_code);
             showToast('Code translated successfully!');
         } catch (error) {
+            if (error.superseded) return;
             console.error('Translation error:', error);
             showToast(error.message || 'Failed to translate code');
         } finally {
@@ -150,6 +169,100 @@ require(['vs/editor/editor.main'], async function () {
     });
 });
 
+// Keeps a server-side parse session in step with an editor: content changes
+// are sent as edits (batched briefly, one request in flight at a time) and the
+// returned diagnostics are shown as markers.
+function startParseSession(editor, getLanguage) {
+    const model = editor.getModel();
+    let sessionId = null;
+    let version = 0;
+    let pending = [];
+    let timer = null;
+    let busy = false;
+    let needsResync = true;
+
+    function showDiagnostics(data) {
+        version = data.version;
+        monaco.editor.setModelMarkers(model, 'codeverse', data.diagnostics.map(d => ({
+            startLineNumber: d.line,
+            startColumn: d.column,
+            endLineNumber: d.line,
+            endColumn: d.column + 1,
+            message: d.message,
+            severity: monaco.MarkerSeverity.Error
+        })));
+    }
+
+    async function sync() {
+        if (busy) return;
+        busy = true;
+        try {
+            while (needsResync || pending.length) {
+                let result;
+                if (needsResync || !sessionId) {
+                    needsResync = false;
+                    pending = [];
+                    result = sessionId
+                        ? await replaceParseSession(sessionId, getLanguage(), model.getValue())
+                        : await openParseSession(getLanguage(), model.getValue());
+                    if (result.status === 404) {
+                        sessionId = null;
+                        needsResync = true;
+                        continue;
+                    }
+                    if (result.status === 200) sessionId = result.data.session_id;
+                } else {
+                    const edits = pending;
+                    pending = [];
+                    result = await sendParseSessionEdits(sessionId, version, edits);
+                    if (result.status === 404 || result.status === 409) {
+                        needsResync = true;
+                        continue;
+                    }
+                }
+                if (result.status !== 200) return;
+                showDiagnostics(result.data);
+            }
+        } catch (error) {
+            console.error('Parse session error:', error);
+            needsResync = true;
+        } finally {
+            busy = false;
+        }
+    }
+
+    function schedule() {
+        clearTimeout(timer);
+        timer = setTimeout(sync, 50);
+    }
+
+    model.onDidChangeContent((event) => {
+        // Changes in one event refer to the text before it; applied from the
+        // last range to the first, each leaves the earlier ranges valid
+        const changes = [...event.changes].sort((a, b) => b.rangeOffset - a.rangeOffset);
+        for (const change of changes) {
+            pending.push({
+                start_line: change.range.startLineNumber,
+                start_column: change.range.startColumn,
+                end_line: change.range.endLineNumber,
+                end_column: change.range.endColumn,
+                text: change.text
+            });
+        }
+        schedule();
+    });
+
+    schedule();
+
+    return {
+        // Send the whole text again, e.g. after switching language
+        resync() {
+            needsResync = true;
+            schedule();
+        }
+    };
+}
+
 // Terminal output handling
 function appendToTerminal(outputId, text, isError = false) {
     const terminal = document.getElementById(outputId);
@@ -0,0 +1,31 @@
+from codeverse.services.analysis_service import AnalysisService
+from codeverse.services.compiler_service import CompilerService
+from codeverse.services.container import ServiceContainer, services
+from codeverse.services.migration_service import MigrationService
+from codeverse.services.session_service import ParseSessionService
+from codeverse.services.translation_service import TranslationService
+
+
+def get_translation_service() -> TranslationService:
+    return services.translation_service
+
+
+def get_compiler_service() -> CompilerService:
+    return services.compiler_service
+
+
+def get_migration_service() -> MigrationService:
+    return services.migration_service
+
+
+def get_analysis_service() -> AnalysisService:
+    return services.analysis_service
+
+
+def get_parse_session_service() -> ParseSessionService:
+    return services.parse_session_service
+
+
+def get_services() -> ServiceContainer:
+    """The container itself, for endpoints that build services only when a message needs them."""
+    return services
@@ -1,14 +1,54 @@
-from fastapi import APIRouter, HTTPException
-from codeverse.models.schemas import CodeTranslationRequest, TranslationResult, CompileRequest, CompileResponse
+import json
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from codeverse.models.schemas import (
+    CodeTranslationRequest, TranslationResult, BatchTranslateRequest, MigrationRequest,
+    CompileRequest, CompileResponse, AnalyzeRequest, AnalyzeResponse,
+    BatchCompileRequest, BatchCompileResponse, ParseSessionRequest, ParseSessionEditRequest,
+    ParseSessionResponse, EditorJobMessage
+)
 from codeverse.services.translation_service import TranslationService
 from codeverse.services.compiler_service import CompilerService
+from codeverse.services.migration_service import MigrationService, MigrationError
+from codeverse.services.analysis_service import AnalysisService
+from codeverse.services.cpu_pool import CPUTaskTimeout
+from codeverse.services.container import ServiceContainer
+from codeverse.services.editor_session import EditorSession
+from codeverse.services.session_service import (
+    ParseSessionService, SessionConflict, SessionError, SessionNotFound
+)
+from codeverse.api.dependencies import (
+    get_analysis_service, get_compiler_service, get_migration_service, get_parse_session_service,
+    get_services, get_translation_service
+)
+from codeverse.services.streaming import format_sse
+from codeverse.services.scheduler import UpstreamOverloaded, schedulers
+from codeverse.services.resilience import upstreams
 
 router = APIRouter()
-translation_service = TranslationService()
-compiler_service = CompilerService()
+
+def _session_http_error(error: SessionError) -> HTTPException:
+    if isinstance(error, SessionNotFound):
+        return HTTPException(status_code=404, detail=str(error))
+    if isinstance(error, SessionConflict):
+        return HTTPException(status_code=409, detail=str(error))
+    return HTTPException(status_code=400, detail=str(error))
+
+def _validate_translate_request(translation_service: TranslationService, request: CodeTranslationRequest):
+    """Validate languages and source code, raising HTTPException(400) on bad input."""
+    error = translation_service.validate_request(request)
+    if error:
+        raise HTTPException(
+            status_code=400,
+            detail=error
+        )
 
 @router.post("/translate", response_model=TranslationResult)
-async def translate_code(request: CodeTranslationRequest) -> TranslationResult:
+async def translate_code(
+    request: CodeTranslationRequest,
+    translation_service: TranslationService = Depends(get_translation_service)
+) -> TranslationResult:
     """
     Translate code from one programming language to another.
     
@@ -22,26 +62,7 @@ async def translate_code(request: CodeTranslationRequest) -> TranslationResult:
         HTTPException: If translation fails or languages are not supported
     """
     try:
-        # Validate languages
-        if request.source_language not in translation_service.supported_languages:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Source language '{request.source_language}' is not supported. Supported languages: {translation_service.supported_languages}"
-            )
-            
-        if request.target_language not in translation_service.supported_languages:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Target language '{request.target_language}' is not supported. Supported languages: {translation_service.supported_languages}"
-            )
-            
-        # Clean and validate the source code
-        request.source_code = request.source_code.strip()
-        if not request.source_code:
-            raise HTTPException(
-                status_code=400,
-                detail="Source code cannot be empty"
-            )
+        _validate_translate_request(translation_service, request)
 
         # Perform the translation
         result = await translation_service.translate(request)
@@ -55,7 +76,7 @@ async def translate_code(request: CodeTranslationRequest) -> TranslationResult:
             
         return result
         
-    except HTTPException:
+    except (HTTPException, UpstreamOverloaded):
         raise
     except Exception as e:
         raise HTTPException(
@@ -64,12 +85,155 @@ async def translate_code(request: CodeTranslationRequest) -> TranslationResult:
         )
 
 @router.get("/languages")
-async def get_supported_languages():
+async def get_supported_languages(translation_service: TranslationService = Depends(get_translation_service)):
     """Get the list of supported programming languages"""
     return {"languages": translation_service.supported_languages}
 
+@router.post("/translate/stream")
+async def translate_code_stream(
+    request: CodeTranslationRequest,
+    translation_service: TranslationService = Depends(get_translation_service)
+):
+    """
+    Translate code and stream the result back as Server-Sent Events.
+
+    Emits `token` events as the model generates code, then a single `done`
+    event with the cleaned translation (or an `error` event).
+    """
+    _validate_translate_request(translation_service, request)
+
+    async def event_stream():
+        async for event in translation_service.translate_stream(request):
+            yield format_sse(event)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.websocket("/translate/ws")
+async def translate_code_websocket(
+    websocket: WebSocket,
+    translation_service: TranslationService = Depends(get_translation_service)
+):
+    """
+    Stream translations over a WebSocket.
+
+    Each JSON message sent by the client is a translation request; the server
+    answers with the same `token`/`done`/`error` frames as the SSE endpoint.
+    """
+    await websocket.accept()
+    try:
+        while True:
+            try:
+                data = await websocket.receive_json()
+            except ValueError as e:
+                await websocket.send_json({"type": "error", "success": False, "error": f"Invalid JSON: {e}"})
+                continue
+            try:
+                request = CodeTranslationRequest.model_validate(data)
+                _validate_translate_request(translation_service, request)
+            except ValidationError as e:
+                await websocket.send_json({"type": "error", "success": False, "error": str(e)})
+                continue
+            except HTTPException as e:
+                await websocket.send_json({"type": "error", "success": False, "error": e.detail})
+                continue
+
+            async for event in translation_service.translate_stream(request):
+                await websocket.send_json(event)
+    except WebSocketDisconnect:
+        pass
+
+@router.websocket("/editor/ws")
+async def editor_websocket(websocket: WebSocket, container: ServiceContainer = Depends(get_services)):
+    """
+    One connection per editor for compile, translate and analyze jobs.
+
+    Each message is {"type", "document", "version", "request"} (see
+    EditorJobMessage). Jobs are debounced server-side, a newer job for the
+    same document and type cancels the previous one, and every frame sent
+    back is tagged with the job's type, document and version.
+    """
+    await websocket.accept()
+    session = EditorSession(websocket.send_json, container)
+    try:
+        while True:
+            try:
+                data = await websocket.receive_json()
+            except ValueError as e:
+                await session.send({"type": "error", "error": f"Invalid JSON: {e}"})
+                continue
+            try:
+                message = EditorJobMessage.model_validate(data)
+            except ValidationError as e:
+                await session.send({"type": "error", "error": str(e)})
+                continue
+            await session.submit(message)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        session.close()
+
+@router.post("/translate/batch")
+async def translate_batch(
+    request: BatchTranslateRequest,
+    translation_service: TranslationService = Depends(get_translation_service)
+):
+    """
+    Translate many snippets in one request.
+
+    Identical items are translated once, and the LLM calls run with bounded
+    concurrency. Results stream back as newline-delimited JSON in completion
+    order, each tagged with the item's index. A final `summary` line carries
+    aggregate timing and token usage. A failing item does not fail the batch.
+    """
+    if len(request.items) > translation_service.batch_max_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many items ({len(request.items)}), the limit is {translation_service.batch_max_items}"
+        )
+
+    async def event_stream():
+        async for event in translation_service.translate_batch(request.items, request.max_concurrency):
+            yield json.dumps(event) + "\n"
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+@router.get("/translate/cache")
+async def get_translation_cache_stats(translation_service: TranslationService = Depends(get_translation_service)):
+    """Get hit/miss counters for the translation result cache and in-flight request coalescing"""
+    return {**translation_service.cache.stats(), "coalescing": translation_service.inflight.stats()}
+
+@router.get("/compile/cache")
+async def get_execution_cache_stats(compiler_service: CompilerService = Depends(get_compiler_service)):
+    """Get hit/miss counters for the execution result and compiled artifact caches, and request coalescing"""
+    stats = compiler_service.execution_cache.stats()
+    stats["coalescing"] = compiler_service.inflight.stats()
+    artifact_cache = getattr(compiler_service.backend, "artifact_cache", None)
+    if artifact_cache is not None:
+        stats["artifacts"] = artifact_cache.stats()
+    return stats
+
+@router.get("/translate/providers")
+async def get_llm_provider_stats(translation_service: TranslationService = Depends(get_translation_service)):
+    """Get the LLM router's view of each provider (latency and error-rate EWMAs, failovers)"""
+    return translation_service.router.stats()
+
+@router.get("/upstreams")
+async def get_upstream_stats():
+    """Get admission control (queue) and resilience (breaker, retries, hedges) state per upstream API"""
+    return {
+        name: {"admission": schedulers[name].stats(), "resilience": upstreams[name].stats()}
+        for name in schedulers
+    }
+
 @router.post("/compile")
-async def compile_code(request: CompileRequest) -> CompileResponse:
+async def compile_code(
+    request: CompileRequest,
+    compiler_service: CompilerService = Depends(get_compiler_service)
+) -> CompileResponse:
     """
     Compile and execute code using the compiler service.
     """
@@ -91,6 +255,8 @@ async def compile_code(request: CompileRequest) -> CompileResponse:
         result = await compiler_service.compile_and_execute(request)
         return result
         
+    except UpstreamOverloaded:
+        raise
     except Exception as e:
         return CompileResponse(
             success=False,
@@ -98,3 +264,161 @@ async def compile_code(request: CompileRequest) -> CompileResponse:
             output="",
             language=request.language
         )
+
+@router.post("/compile/batch", response_model=BatchCompileResponse)
+async def compile_batch(
+    request: BatchCompileRequest,
+    compiler_service: CompilerService = Depends(get_compiler_service)
+) -> BatchCompileResponse:
+    """
+    Compile a program once and run it against a list of stdin test cases.
+
+    Cases run concurrently (up to `max_parallel`); each result carries its
+    output, exit status, run time and, when an expected output was given,
+    whether it passed.
+    """
+    if not request.source_code:
+        return BatchCompileResponse(success=False, error="Source code cannot be empty")
+
+    return await compiler_service.execute_batch(request)
+
+@router.post("/migrations")
+async def create_migration(
+    request: MigrationRequest,
+    migration_service: MigrationService = Depends(get_migration_service)
+):
+    """
+    Start translating a whole source tree.
+
+    Files are translated in dependency order (leaves first, independent files
+    in parallel) into the job's output directory. Poll the returned job id for
+    progress.
+    """
+    try:
+        return await migration_service.create_job(
+            request.source_language,
+            request.target_language,
+            source_path=request.source_path,
+            archive_base64=request.archive_base64,
+            archive_name=request.archive_name
+        )
+    except MigrationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/migrations")
+async def list_migrations(migration_service: MigrationService = Depends(get_migration_service)):
+    """List migration jobs and their progress"""
+    return {"jobs": migration_service.list_jobs()}
+
+@router.get("/migrations/{job_id}")
+async def get_migration(job_id: str, migration_service: MigrationService = Depends(get_migration_service)):
+    """Get a migration job's progress and per-file status"""
+    summary = migration_service.job_summary(job_id, include_files=True)
+    if summary is None:
+        raise HTTPException(status_code=404, detail=f"Migration job '{job_id}' not found")
+    return summary
+
+@router.post("/analyze", response_model=AnalyzeResponse)
+async def analyze_code(
+    request: AnalyzeRequest,
+    analysis_service: AnalysisService = Depends(get_analysis_service)
+) -> AnalyzeResponse:
+    """
+    Static analysis of a source file: complexity metrics, imports and design patterns.
+
+    Runs in a worker process, so large files do not slow down other requests.
+    Python gets the full analysis; other languages get line counts and imports.
+    """
+    error = analysis_service.validate_request(request.source_code)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    return await analysis_service.analyze(request)
+
+@router.post("/transform")
+async def transform_code(
+    request: CodeTranslationRequest,
+    analysis_service: AnalysisService = Depends(get_analysis_service)
+):
+    """Rule-based translation (no LLM) between Python and JavaScript, run in a worker process"""
+    error = analysis_service.validate_request(request.source_code)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    try:
+        return await analysis_service.transform(request)
+    except CPUTaskTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+
+@router.get("/analyze/stats")
+async def get_analysis_stats(analysis_service: AnalysisService = Depends(get_analysis_service)):
+    """Get the analysis result cache and CPU worker pool state"""
+    return analysis_service.stats()
+
+@router.post("/sessions", response_model=ParseSessionResponse)
+async def open_parse_session(
+    request: ParseSessionRequest,
+    session_service: ParseSessionService = Depends(get_parse_session_service)
+) -> ParseSessionResponse:
+    """
+    Open an editor session: the server keeps the parsed file and the editor
+    then sends only its edits to /sessions/{session_id}/edits.
+    """
+    try:
+        return await session_service.open(request)
+    except SessionError as e:
+        raise _session_http_error(e)
+
+@router.get("/sessions/stats")
+async def get_parse_session_stats(session_service: ParseSessionService = Depends(get_parse_session_service)):
+    """Get the number of open editor sessions"""
+    return session_service.stats()
+
+@router.get("/sessions/{session_id}", response_model=ParseSessionResponse)
+async def get_parse_session(
+    session_id: str,
+    session_service: ParseSessionService = Depends(get_parse_session_service)
+) -> ParseSessionResponse:
+    """Get a session's current diagnostics and metrics"""
+    try:
+        return await session_service.get(session_id)
+    except SessionError as e:
+        raise _session_http_error(e)
+
+@router.put("/sessions/{session_id}", response_model=ParseSessionResponse)
+async def replace_parse_session(
+    session_id: str,
+    request: ParseSessionRequest,
+    session_service: ParseSessionService = Depends(get_parse_session_service)
+) -> ParseSessionResponse:
+    """Replace a session's whole text, e.g. after a 409 or a language change"""
+    try:
+        return await session_service.replace(session_id, request)
+    except SessionError as e:
+        raise _session_http_error(e)
+
+@router.post("/sessions/{session_id}/edits", response_model=ParseSessionResponse)
+async def edit_parse_session(
+    session_id: str,
+    request: ParseSessionEditRequest,
+    session_service: ParseSessionService = Depends(get_parse_session_service)
+) -> ParseSessionResponse:
+    """
+    Apply text edits (in order, Monaco-style 1-based ranges) and get updated
+    diagnostics and metrics. 409 means the edits do not match the server's
+    copy and the client should PUT the full text.
+    """
+    try:
+        return await session_service.edit(session_id, request)
+    except SessionError as e:
+        raise _session_http_error(e)
+
+@router.delete("/sessions/{session_id}")
+async def close_parse_session(
+    session_id: str,
+    session_service: ParseSessionService = Depends(get_parse_session_service)
+):
+    """Close an editor session"""
+    try:
+        session_service.close(session_id)
+    except SessionError as e:
+        raise _session_http_error(e)
+    return {"closed": session_id}
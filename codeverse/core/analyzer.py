@@ -1,6 +1,355 @@
-from typing import Dict, List
-import libcst
-from dataclasses import dataclass
+from typing import Dict, List, Optional
+import copy
+import functools
+import hashlib
+import math
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from codeverse.services.cache import LRUCache
+
+# Import/include statements for languages we do not parse into an AST
+DEPENDENCY_PATTERNS = {
+    'javascript': [
+        r'^\s*import\s+(?:[\w*{}\s,$]+\s+from\s+)?[\'"]([^\'"]+)[\'"]',
+        r'\brequire\(\s*[\'"]([^\'"]+)[\'"]\s*\)',
+        r'^\s*export\s+[\w*{}\s,$]+\s+from\s+[\'"]([^\'"]+)[\'"]',
+    ],
+    'java': [r'^\s*import\s+(?:static\s+)?([\w.]+(?:\.\*)?)\s*;'],
+    'kotlin': [r'^\s*import\s+([\w.]+(?:\.\*)?)'],
+    'cpp': [r'^\s*#\s*include\s*[<"]([^>"]+)[>"]'],
+    'c': [r'^\s*#\s*include\s*[<"]([^>"]+)[>"]'],
+    'go': [r'^\s*import\s+(?:\w+\s+)?"([^"]+)"', r'^\s+(?:\w+\s+)?"([^"]+)"\s*$'],
+    'rust': [r'^\s*(?:pub\s+)?use\s+([\w:]+)', r'^\s*(?:pub\s+)?mod\s+(\w+)\s*;'],
+    'ruby': [r'^\s*require(?:_relative)?\s*\(?\s*[\'"]([^\'"]+)[\'"]'],
+    'php': [
+        r'^\s*(?:require|include)(?:_once)?\s*\(?\s*[\'"]([^\'"]+)[\'"]',
+        r'^\s*use\s+([\w\\]+)\s*;',
+    ],
+    'swift': [r'^\s*import\s+(\w+)'],
+    # Only used when a Python file is too large to analyze within the time budget
+    'python': [r'^\s*import\s+([\w.]+)', r'^\s*from\s+(\.*[\w.]*)\s+import\b'],
+}
+DEPENDENCY_PATTERNS['typescript'] = DEPENDENCY_PATTERNS['javascript']
+
+_compiled_dependency_patterns = {
+    language: [re.compile(pattern, re.MULTILINE) for pattern in patterns]
+    for language, patterns in DEPENDENCY_PATTERNS.items()
+}
+
+# Method names that suggest a class plays a role in a design pattern
+_SUBSCRIBE_METHODS = {'subscribe', 'attach', 'add_listener', 'add_observer', 'register', 'on'}
+_NOTIFY_METHODS = {'notify', 'notify_all', 'notify_observers', 'emit', 'publish', 'dispatch'}
+_FACTORY_PREFIXES = ('create_', 'make_', 'build_', 'new_')
+
+
+class _BudgetExceeded(Exception):
+    pass
+
+
+@dataclass
+class _Scope:
+    """Complexity counters for one function (or the module body)."""
+    name: str
+    cyclomatic: int = 1
+    cognitive: int = 0
+    inner_functions: List[str] = field(default_factory=list)
+    returns_inner_function: bool = False
+    returns_call: bool = False
+
+
+@dataclass
+class _ClassInfo:
+    name: str
+    bases: List[str]
+    decorators: List[str]
+    methods: List[str] = field(default_factory=list)
+    attributes: List[str] = field(default_factory=list)
+    abstract_methods: int = 0
+
+
+@functools.lru_cache(maxsize=None)
+def _analysis_visitor_class():
+    """libcst is imported on first use: it is the slowest import in the app."""
+    import libcst
+
+    def dotted_name(node) -> str:
+        if node is None:
+            return ""
+        if isinstance(node, libcst.Name):
+            return node.value
+        if isinstance(node, libcst.Attribute):
+            return f"{dotted_name(node.value)}.{node.attr.value}"
+        if isinstance(node, libcst.Call):
+            return dotted_name(node.func)
+        return ""
+
+    class _AnalysisVisitor(libcst.CSTVisitor):
+        """
+        Collects imports, complexity and pattern hints in a single walk of the tree.
+
+        Cyclomatic complexity counts decision points (branches, loops, exception
+        handlers, boolean operators, comprehension clauses, match cases).
+        Cognitive complexity follows SonarSource's rules: structures cost 1 plus
+        their nesting depth, `elif`/`else` and each run of like boolean
+        operators cost 1. Halstead operator/operand counts feed the
+        maintainability index.
+        """
+
+        CHECK_EVERY = 256
+
+        def __init__(self, deadline: Optional[float] = None):
+            super().__init__()
+            self.deadline = deadline
+            self.nodes = 0
+            self.modules: List[str] = []
+            self.module_scope = _Scope(name="<module>")
+            self.functions: List[_Scope] = []
+            self.classes: List[_ClassInfo] = []
+            self.operators: Dict[str, int] = {}
+            self.operands: Dict[str, int] = {}
+            self._scopes: List[_Scope] = []
+            # ("class", _ClassInfo) / ("function", _Scope) entries, innermost last
+            self._stack: List[tuple] = []
+            self._nesting = 0
+            self._saved_nesting: List[int] = []
+            self._elifs = set()
+            self._bool_continuations = set()
+
+        # Traversal
+
+        def on_visit(self, node) -> bool:
+            self.nodes += 1
+            if self.deadline is not None and self.nodes % self.CHECK_EVERY == 0:
+                if time.perf_counter() > self.deadline:
+                    raise _BudgetExceeded()
+            return super().on_visit(node)
+
+        @property
+        def scope(self) -> _Scope:
+            return self._scopes[-1] if self._scopes else self.module_scope
+
+        def _decision(self, cognitive: int = 0):
+            self.scope.cyclomatic += 1
+            self.scope.cognitive += cognitive
+
+        def _nested_structure(self):
+            self._decision(1 + self._nesting)
+            self._nesting += 1
+
+        # Imports
+
+        def visit_Import(self, node):
+            for alias in node.names:
+                self.modules.append(dotted_name(alias.name))
+
+        def visit_ImportFrom(self, node):
+            dots = "." * len(node.relative)
+            module = dotted_name(node.module)
+            if module:
+                self.modules.append(dots + module)
+            elif not isinstance(node.names, libcst.ImportStar):
+                # `from . import a, b` depends on the sibling modules a and b
+                for alias in node.names:
+                    self.modules.append(dots + dotted_name(alias.name))
+            else:
+                self.modules.append(dots)
+
+        # Scopes
+
+        def _qualified(self, name: str) -> str:
+            return ".".join([entry.name for _, entry in self._stack] + [name])
+
+        def _enclosing_class(self) -> Optional[_ClassInfo]:
+            """The class whose body we are directly in, if any."""
+            if self._stack and self._stack[-1][0] == "class":
+                return self._stack[-1][1]
+            return None
+
+        def visit_ClassDef(self, node):
+            info = _ClassInfo(
+                name=self._qualified(node.name.value),
+                bases=[dotted_name(arg.value) for arg in node.bases],
+                decorators=[dotted_name(decorator.decorator) for decorator in node.decorators]
+            )
+            self.classes.append(info)
+            self._stack.append(("class", info))
+
+        def leave_ClassDef(self, original_node):
+            self._stack.pop()
+
+        def visit_FunctionDef(self, node):
+            name = node.name.value
+            enclosing_class = self._enclosing_class()
+            if enclosing_class is not None:
+                enclosing_class.methods.append(name)
+                if any(dotted_name(d.decorator).endswith("abstractmethod") for d in node.decorators):
+                    enclosing_class.abstract_methods += 1
+            elif self._scopes:
+                self._scopes[-1].inner_functions.append(name)
+
+            self._saved_nesting.append(self._nesting)
+            # Nested functions add a level of nesting; top-level ones and methods start from zero
+            self._nesting = self._nesting + 1 if enclosing_class is None and self._scopes else 0
+            scope = _Scope(name=self._qualified(name))
+            self.functions.append(scope)
+            self._scopes.append(scope)
+            self._stack.append(("function", scope))
+
+        def leave_FunctionDef(self, original_node):
+            self._scopes.pop()
+            self._stack.pop()
+            self._nesting = self._saved_nesting.pop()
+
+        def visit_Lambda(self, node):
+            self._nesting += 1
+
+        def leave_Lambda(self, original_node):
+            self._nesting -= 1
+
+        def visit_Return(self, node):
+            if not self._scopes:
+                return
+            scope = self._scopes[-1]
+            if isinstance(node.value, libcst.Name) and node.value.value in scope.inner_functions:
+                scope.returns_inner_function = True
+            elif isinstance(node.value, libcst.Call):
+                scope.returns_call = True
+
+        def visit_Assign(self, node):
+            self._operator("=")
+            enclosing_class = self._enclosing_class()
+            if enclosing_class is not None:
+                for target in node.targets:
+                    if isinstance(target.target, libcst.Name):
+                        enclosing_class.attributes.append(target.target.value)
+
+        def visit_AnnAssign(self, node):
+            self._operator("=")
+            enclosing_class = self._enclosing_class()
+            if enclosing_class is not None and isinstance(node.target, libcst.Name):
+                enclosing_class.attributes.append(node.target.value)
+
+        # Control flow
+
+        def visit_If(self, node):
+            if isinstance(node.orelse, libcst.If):
+                self._elifs.add(id(node.orelse))
+            elif isinstance(node.orelse, libcst.Else):
+                self.scope.cognitive += 1
+
+            if id(node) in self._elifs:
+                self._decision(1)
+            else:
+                self._nested_structure()
+
+        def leave_If(self, original_node):
+            if id(original_node) in self._elifs:
+                self._elifs.discard(id(original_node))
+            else:
+                self._nesting -= 1
+
+        def visit_IfExp(self, node):
+            self._nested_structure()
+
+        def leave_IfExp(self, original_node):
+            self._nesting -= 1
+
+        def visit_For(self, node):
+            self._nested_structure()
+
+        def leave_For(self, original_node):
+            self._nesting -= 1
+
+        def visit_While(self, node):
+            self._nested_structure()
+
+        def leave_While(self, original_node):
+            self._nesting -= 1
+
+        def visit_ExceptHandler(self, node):
+            self._nested_structure()
+
+        def leave_ExceptHandler(self, original_node):
+            self._nesting -= 1
+
+        def visit_ExceptStarHandler(self, node):
+            self._nested_structure()
+
+        def leave_ExceptStarHandler(self, original_node):
+            self._nesting -= 1
+
+        def visit_Match(self, node):
+            self.scope.cognitive += 1 + self._nesting
+            self._nesting += 1
+
+        def leave_Match(self, original_node):
+            self._nesting -= 1
+
+        def visit_MatchCase(self, node):
+            self.scope.cyclomatic += 1
+
+        def visit_CompFor(self, node):
+            self.scope.cyclomatic += 1
+
+        def visit_CompIf(self, node):
+            self.scope.cyclomatic += 1
+
+        def visit_BooleanOperation(self, node):
+            operator = type(node.operator).__name__
+            self._operator(operator)
+            # `a and b and c` is one run of the same operator and costs 1
+            if id(node) in self._bool_continuations:
+                self._bool_continuations.discard(id(node))
+                self.scope.cyclomatic += 1
+            else:
+                self._decision(1)
+            for child in (node.left, node.right):
+                if isinstance(child, libcst.BooleanOperation) and type(child.operator).__name__ == operator:
+                    self._bool_continuations.add(id(child))
+
+        # Halstead counts
+
+        def _operator(self, name: str):
+            self.operators[name] = self.operators.get(name, 0) + 1
+
+        def _operand(self, name: str):
+            self.operands[name] = self.operands.get(name, 0) + 1
+
+        def visit_BinaryOperation(self, node):
+            self._operator(type(node.operator).__name__)
+
+        def visit_UnaryOperation(self, node):
+            self._operator(type(node.operator).__name__)
+
+        def visit_AugAssign(self, node):
+            self._operator(type(node.operator).__name__)
+
+        def visit_ComparisonTarget(self, node):
+            self._operator(type(node.operator).__name__)
+
+        def visit_Call(self, node):
+            self._operator("()")
+
+        def visit_Subscript(self, node):
+            self._operator("[]")
+
+        def visit_Name(self, node):
+            self._operand(node.value)
+
+        def visit_Integer(self, node):
+            self._operand(node.value)
+
+        def visit_Float(self, node):
+            self._operand(node.value)
+
+        def visit_SimpleString(self, node):
+            self._operand(node.value)
+
+    return _AnalysisVisitor
+
 
 @dataclass
 class CodePattern:
@@ -9,6 +358,32 @@ class CodePattern:
     locations: List[tuple]
 
 class CodeAnalyzer:
+    """
+    Static analysis of source files: imports, complexity metrics and design patterns.
+
+    Python is parsed with libcst and analyzed in one visitor pass; other
+    languages only get regex-based dependency extraction. Parsed modules and
+    results are cached by content hash, and each analysis has a time budget
+    (ANALYZER_TIME_BUDGET_MS): inputs that would take longer than that to parse
+    (estimated from the measured parse rate) or exceed ANALYZER_MAX_PARSE_CHARS
+    only get line counts and regex imports, and a walk that runs past the
+    budget stops early. Either way the result is marked `partial` instead of
+    blocking the caller.
+    """
+
+    def __init__(self, time_budget: Optional[float] = None, max_parse_chars: Optional[int] = None,
+                 cache_size: Optional[int] = None, ast_cache_size: Optional[int] = None):
+        self.time_budget = time_budget if time_budget is not None else \
+            float(os.getenv('ANALYZER_TIME_BUDGET_MS', 250)) / 1000
+        self.max_parse_chars = max_parse_chars or int(os.getenv('ANALYZER_MAX_PARSE_CHARS', 300_000))
+        self.results = LRUCache(max_entries=cache_size or int(os.getenv('ANALYZER_CACHE_SIZE', 256)))
+        # Parsed trees are much larger than results, so far fewer are kept
+        self.asts = LRUCache(max_entries=ast_cache_size or int(os.getenv('ANALYZER_AST_CACHE_SIZE', 16)))
+        # Characters parsed per second, measured as files are parsed
+        self.parse_rate = 200_000.0
+        # Migrations call the analyzer from worker threads
+        self._lock = threading.Lock()
+
     def extract_patterns(self, source_code: str, language: str) -> Dict:
         """
         Analyzes source code to extract patterns and architectural decisions
@@ -19,58 +394,207 @@ class CodeAnalyzer:
             'complexity_metrics': {},
             'dependencies': []
         }
-        
+
         try:
-            # Parse code into AST
-            ast = self._parse_to_ast(source_code, language)
-            
-            # Detect design patterns
-            patterns['detected_patterns'] = self._detect_patterns(ast)
-            
-            # Analyze complexity
-            patterns['complexity_metrics'] = self._analyze_complexity(ast)
-            
-            # Extract dependencies
-            patterns['dependencies'] = self._extract_dependencies(ast)
-            
+            patterns.update(self.analyze(source_code, language))
         except Exception as e:
             patterns['errors'] = str(e)
-            
+
         return patterns
 
-    def _parse_to_ast(self, code: str, language: str):
+    def analyze(self, source_code: str, language: str) -> Dict:
+        """
+        Patterns, complexity metrics and dependencies of one file, served from
+        the cache when the same code was analyzed before.
+        """
+        key = self._cache_key(source_code, language)
+        with self._lock:
+            cached = self.results.get(key)
+        if cached is None:
+            cached = self._analyze_uncached(source_code, language, key)
+            with self._lock:
+                self.results.set(key, cached)
+        # Callers get their own copy; cached results are shared
+        return copy.deepcopy(cached)
+
+    def _analyze_uncached(self, source_code: str, language: str, key: str) -> Dict:
+        started = time.perf_counter()
+        if language.lower() != 'python':
+            return {
+                'detected_patterns': [],
+                'complexity_metrics': self._line_metrics(source_code),
+                'dependencies': self._regex_dependencies(source_code, language)
+            }
+
+        if len(source_code) > self.max_parse_chars:
+            return self._degraded(source_code, language, f"Source is larger than {self.max_parse_chars} characters")
+        # Parsing cannot be interrupted, so skip it when it alone would blow the budget
+        if len(source_code) / self.parse_rate > self.time_budget:
+            return self._degraded(source_code, language, "Parsing would exceed the analysis time budget")
+
+        # The one-off libcst import does not count against the budget
+        visitor_class = _analysis_visitor_class()
+        started = time.perf_counter()
+        ast = self._parse_to_ast(source_code, language, key)
+        visitor = visitor_class(deadline=started + self.time_budget)
+        partial = False
+        try:
+            ast.visit(visitor)
+        except _BudgetExceeded:
+            partial = True
+
+        result = {
+            'detected_patterns': self._detect_patterns(visitor),
+            'complexity_metrics': self._analyze_complexity(visitor, source_code),
+            'dependencies': self._extract_dependencies(visitor),
+            'analysis_ms': round((time.perf_counter() - started) * 1000, 3)
+        }
+        if partial:
+            # Imports are cheap to recover; metrics stay as far as the walk got
+            result['dependencies'] = list(dict.fromkeys(
+                result['dependencies'] + self._regex_dependencies(source_code, language)
+            ))
+            result['partial'] = True
+            result['errors'] = f"Analysis stopped after its {self.time_budget * 1000:.0f}ms time budget"
+        return result
+
+    def _degraded(self, source_code: str, language: str, reason: str) -> Dict:
+        return {
+            'detected_patterns': [],
+            'complexity_metrics': self._line_metrics(source_code),
+            'dependencies': self._regex_dependencies(source_code, language),
+            'partial': True,
+            'errors': f"{reason}; only line counts and imports were extracted"
+        }
+
+    @staticmethod
+    def _cache_key(source_code: str, language: str) -> str:
+        return hashlib.sha256(f"{language.lower()}\0{source_code}".encode('utf-8')).hexdigest()
+
+    def _parse_to_ast(self, code: str, language: str, key: Optional[str] = None):
         """
         Parses source code to AST based on language
         """
         if language.lower() == 'python':
-            return libcst.parse_module(code)
+            import libcst
+            key = key or self._cache_key(code, language)
+            with self._lock:
+                ast = self.asts.get(key)
+            if ast is None:
+                started = time.perf_counter()
+                ast = libcst.parse_module(code)
+                elapsed = time.perf_counter() - started
+                with self._lock:
+                    self.asts.set(key, ast)
+                    # Only inputs big enough to time meaningfully update the estimate
+                    if len(code) >= 2000 and elapsed > 0:
+                        self.parse_rate = 0.8 * self.parse_rate + 0.2 * (len(code) / elapsed)
+            return ast
         # Add support for other languages
         raise NotImplementedError(f"AST parsing for {language} not implemented")
 
-    def _detect_patterns(self, ast) -> List[CodePattern]:
+    def _detect_patterns(self, visitor) -> List[CodePattern]:
         """
-        Detects common design patterns in the AST
+        Detects common design patterns from the classes and functions the visitor saw
         """
-        patterns = []
-        # Implement pattern detection logic
-        return patterns
+        found: Dict[str, CodePattern] = {}
+
+        def add(name: str, confidence: float, location: tuple):
+            pattern = found.setdefault(name, CodePattern(name=name, confidence=confidence, locations=[]))
+            pattern.confidence = max(pattern.confidence, confidence)
+            pattern.locations.append(location)
+
+        for info in visitor.classes:
+            methods = set(info.methods)
+            location = ("class", info.name)
+            if '__new__' in methods and '_instance' in info.attributes:
+                add('singleton', 0.9, location)
+            elif '_instance' in info.attributes and methods & {'instance', 'get_instance'}:
+                add('singleton', 0.7, location)
+            if {'__enter__', '__exit__'} <= methods or {'__aenter__', '__aexit__'} <= methods:
+                add('context_manager', 0.95, location)
+            if {'__iter__', '__next__'} <= methods or {'__aiter__', '__anext__'} <= methods:
+                add('iterator', 0.95, location)
+            if methods & _SUBSCRIBE_METHODS and methods & _NOTIFY_METHODS:
+                add('observer', 0.8, location)
+            if any(decorator.split('.')[-1] in ('dataclass', 's', 'define') for decorator in info.decorators):
+                add('dataclass', 0.95, location)
+            if info.abstract_methods or any(base.split('.')[-1] in ('ABC', 'ABCMeta') for base in info.bases):
+                add('abstract_base_class', 0.9, location)
+            if any(base.split('.')[-1] in ('Enum', 'IntEnum', 'StrEnum', 'Flag') for base in info.bases):
+                add('enum', 0.95, location)
+
+        for scope in visitor.functions:
+            location = ("function", scope.name)
+            if scope.returns_inner_function:
+                add('decorator', 0.85, location)
+            if scope.returns_call and scope.name.split('.')[-1].startswith(_FACTORY_PREFIXES):
+                add('factory', 0.7, location)
 
-    def _analyze_complexity(self, ast) -> Dict:
+        return list(found.values())
+
+    def _analyze_complexity(self, visitor, source_code: str) -> Dict:
         """
         Analyzes code complexity metrics
         """
-        metrics = {
-            'cyclomatic_complexity': 0,
-            'cognitive_complexity': 0,
-            'maintainability_index': 0
-        }
-        # Implement complexity analysis
+        scopes = [visitor.module_scope] + visitor.functions
+        # The whole file as one control-flow graph: one entry plus every decision point
+        cyclomatic = 1 + sum(scope.cyclomatic - 1 for scope in scopes)
+        cognitive = sum(scope.cognitive for scope in scopes)
+        metrics = self._line_metrics(source_code)
+
+        operators, operands = visitor.operators, visitor.operands
+        vocabulary = len(operators) + len(operands)
+        length = sum(operators.values()) + sum(operands.values())
+        volume = length * math.log2(vocabulary) if vocabulary > 1 else 0.0
+        loc = max(metrics['lines_of_code'], 1)
+        # SEI maintainability index rescaled to 0-100, as in Visual Studio
+        maintainability = (171 - 5.2 * math.log(max(volume, 1)) - 0.23 * cyclomatic - 16.2 * math.log(loc)) * 100 / 171
+
+        metrics.update({
+            'cyclomatic_complexity': cyclomatic,
+            'cognitive_complexity': cognitive,
+            'maintainability_index': round(max(0.0, maintainability), 2),
+            'halstead_volume': round(volume, 2),
+            'functions': [
+                {'name': scope.name, 'cyclomatic_complexity': scope.cyclomatic,
+                 'cognitive_complexity': scope.cognitive}
+                for scope in visitor.functions
+            ]
+        })
         return metrics
 
-    def _extract_dependencies(self, ast) -> List[str]:
+    @staticmethod
+    def _line_metrics(source_code: str) -> Dict:
+        lines = source_code.splitlines()
+        code_lines = [line for line in lines if line.strip() and not line.lstrip().startswith(('#', '//'))]
+        return {'lines': len(lines), 'lines_of_code': len(code_lines)}
+
+    def extract_dependencies(self, source_code: str, language: str) -> List[str]:
         """
-        Extracts code dependencies from imports and usage
+        Extracts imported modules/files from source code in any supported language
         """
+        if language.lower() == 'python':
+            return self.analyze(source_code, language)['dependencies']
+        return self._regex_dependencies(source_code, language)
+
+    @staticmethod
+    def _regex_dependencies(source_code: str, language: str) -> List[str]:
         dependencies = []
-        # Implement dependency extraction
-        return dependencies 
\ No newline at end of file
+        for pattern in _compiled_dependency_patterns.get(language.lower(), []):
+            dependencies.extend(match.group(1) for match in pattern.finditer(source_code))
+        return list(dict.fromkeys(dependencies))
+
+    def _extract_dependencies(self, visitor) -> List[str]:
+        """
+        Extracts code dependencies from imports and usage
+        """
+        # Keep first-seen order, drop duplicates
+        return list(dict.fromkeys(module for module in visitor.modules if module))
+
+    def stats(self) -> Dict:
+        return {
+            "results": self.results.stats(),
+            "asts": self.asts.stats(),
+            "parse_rate_chars_per_s": round(self.parse_rate)
+        }
@@ -0,0 +1,396 @@
+from dataclasses import dataclass, replace
+from typing import List, Optional, Sequence, Tuple
+import ast
+import re
+import textwrap
+import zlib
+
+# Top-level lines that belong in the shared header rather than in a chunk
+HEADER_PATTERNS = {
+    'javascript': r'^\s*(import\b|export\s+\*\s+from\b|(const|let|var)\s+[\w{}\s,]+=\s*require\()',
+    'typescript': r'^\s*(import\b|export\s+\*\s+from\b)',
+    'java': r'^\s*(package|import)\b',
+    'kotlin': r'^\s*(package|import)\b',
+    'cpp': r'^\s*(#\s*(include|define|pragma)|using\s+namespace)\b',
+    'c': r'^\s*#\s*(include|define|pragma)\b',
+    'go': r'^\s*(package|import)\b',
+    'rust': r'^\s*((pub\s+)?use|extern\s+crate|#!\[)',
+    'ruby': r'^\s*require(_relative)?\b',
+    'php': r'^\s*(<\?php|namespace\b|use\b|require|include)',
+    'swift': r'^\s*import\b',
+}
+
+# Languages whose top-level blocks end with a bare `end` instead of a brace
+END_KEYWORD_LANGUAGES = {'ruby'}
+
+# First line of a brace-language unit whose body is a list of members
+CLASS_PATTERN = re.compile(r'\b(class|interface|struct|enum|impl|object|record)\b')
+
+
+@dataclass
+class Chunk:
+    index: int
+    name: str
+    code: str
+    start_line: int
+    end_line: int
+    signature: str = ""
+    # "unit" (top-level code), "shell" (a class minus its methods) or
+    # "member" (methods of `parent`, spliced back into the shell before it)
+    kind: str = "unit"
+    parent: str = ""
+
+
+class CodeChunker:
+    """
+    Splits source files at top-level boundaries (classes, functions, statements)
+    so they can be translated piecewise and reassembled in order.
+
+    Python is split with ast; other languages use a brace/`end` depth scanner
+    that skips strings and comments.
+    """
+
+    def split(self, source_code: str, language: str) -> Tuple[str, List[Chunk]]:
+        """Return (header, units): imports/includes and the top-level units after them."""
+        if language.lower() == 'python':
+            try:
+                return self._split_python(source_code)
+            except (SyntaxError, ValueError):
+                pass
+        return self._split_generic(source_code, language.lower())
+
+    def pack(self, units: List[Chunk], max_chars: int, stable: bool = False) -> List[Chunk]:
+        """
+        Merge adjacent small units so each chunk stays under `max_chars` where possible.
+
+        Shells are never merged, and members only with members of the same
+        class. With `stable`, a chunk also ends after any unit whose content
+        hash says so (about every max_chars / 2 characters): the boundaries
+        depend on the units around them only, so editing one unit changes its
+        own chunk rather than shifting every chunk after it.
+        """
+        packed: List[Chunk] = []
+        closed = False
+        for unit in units:
+            last = packed[-1] if packed else None
+            if (last and not closed and last.kind == unit.kind != "shell" and last.parent == unit.parent
+                    and len(last.code) + len(unit.code) + 1 <= max_chars):
+                packed[-1] = replace(
+                    last,
+                    name=f"{last.name}, {unit.name}",
+                    code=f"{last.code}\n{unit.code}",
+                    end_line=unit.end_line,
+                    signature="\n".join(s for s in (last.signature, unit.signature) if s)
+                )
+            else:
+                packed.append(replace(unit, index=len(packed)))
+            closed = stable and zlib.crc32(unit.code.encode()) % max(max_chars, 1) < 2 * len(unit.code)
+        return packed
+
+    def split_classes(self, units: List[Chunk], language: str, max_chars: int) -> List[Chunk]:
+        """Replace each class unit longer than `max_chars` by its shell followed by its methods."""
+        split: List[Chunk] = []
+        for unit in units:
+            parts = self._split_class(unit, language.lower()) if len(unit.code) > max_chars else None
+            split.extend(parts or [unit])
+        return [replace(chunk, index=index) for index, chunk in enumerate(split)]
+
+    def assemble(self, chunks: Sequence[Chunk], translations: Sequence[str], language: str) -> str:
+        """Join translated chunks in order, splicing members back into their class's translated shell."""
+        parts: List[str] = []
+        members: List[str] = []
+        for chunk, translation in zip(chunks, translations):
+            if chunk.kind == "member":
+                members.append(translation)
+                continue
+            if members:
+                parts[-1] = self._splice(parts[-1], members, language.lower())
+                members = []
+            parts.append(translation)
+        if members:
+            parts[-1] = self._splice(parts[-1], members, language.lower())
+        return "\n\n".join(parts)
+
+    def context_header(self, header: str, units: List[Chunk]) -> str:
+        """Imports plus the signature of every top-level unit, shared by all chunks."""
+        signatures = [unit.signature for unit in units if unit.signature]
+        parts = [header.strip()] if header.strip() else []
+        if signatures:
+            parts.append("\n".join(signatures))
+        return "\n\n".join(parts)
+
+    def _split_class(self, unit: Chunk, language: str) -> Optional[List[Chunk]]:
+        """[shell, methods...] for a class unit, or None if it is not a class with methods."""
+        if language == 'python':
+            try:
+                ranges = self._python_methods(unit.code)
+            except (SyntaxError, ValueError):
+                return None
+        elif language in END_KEYWORD_LANGUAGES:
+            return None
+        else:
+            ranges = self._brace_methods(unit.code, language)
+        if not ranges:
+            return None
+
+        lines = unit.code.split("\n")
+        shell: List[str] = []
+        members: List[Chunk] = []
+        taken = 0
+        for start, end in ranges:
+            shell.extend(lines[taken:start])
+            code = "\n".join(lines[start:end]).rstrip("\n")
+            if code.strip():
+                members.append(Chunk(
+                    index=0, name=f"{unit.name}.{self._member_name(lines[start:end])}", code=code,
+                    start_line=unit.start_line + start, end_line=unit.start_line + end - 1,
+                    kind="member", parent=unit.name
+                ))
+            taken = end
+        shell.extend(lines[taken:])
+        declaration = next(number for number, line in enumerate(shell) if line.strip())
+        if language == 'python' and not any(line.strip() for line in shell[declaration + 1:]):
+            # Nothing but methods: keep the class body valid
+            indent = re.match(r'\s*', members[0].code).group()
+            shell.append(f"{indent or '    '}pass")
+        return [replace(unit, code="\n".join(shell).rstrip("\n"), kind="shell")] + members
+
+    @staticmethod
+    def _member_name(lines: List[str]) -> str:
+        for line in lines:
+            stripped = line.strip()
+            if stripped and not stripped.startswith(("@", "#", "//", "/*", "*")):
+                names = re.findall(r'(\w+)\s*\(', stripped)
+                return names[0] if names else "member"
+        return "member"
+
+    @staticmethod
+    def _python_methods(code: str) -> List[Tuple[int, int]]:
+        """0-based [start, end) line ranges of a class's methods, with the comments above them."""
+        module = ast.parse(code)
+        if len(module.body) != 1 or not isinstance(module.body[0], ast.ClassDef):
+            return []
+        ranges = []
+        previous_end = module.body[0].body[0].lineno - 1
+        for statement in module.body[0].body:
+            if isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                ranges.append((previous_end, statement.end_lineno))
+            previous_end = statement.end_lineno
+        return ranges
+
+    def _brace_methods(self, code: str, language: str) -> List[Tuple[int, int]]:
+        """0-based [start, end) line ranges of the brace-delimited methods inside a class body."""
+        lines = code.split("\n")
+        opening = None
+        depth, in_block_comment = 0, False
+        for number, line in enumerate(lines):
+            depth, in_block_comment = self._scan_depth(line, depth, in_block_comment, language)
+            if depth > 0:
+                opening = number
+                break
+        if (opening is None or depth != 1 or not lines[opening].rstrip().endswith("{")
+                or not CLASS_PATTERN.search(" ".join(lines[:opening + 1]))
+                or not lines[-1].strip().startswith("}")):
+            return []
+
+        ranges = []
+        start = opening + 1
+        depth = 0
+        for number in range(opening + 1, len(lines) - 1):
+            stripped = lines[number].strip()
+            depth, in_block_comment = self._scan_depth(lines[number], depth, in_block_comment, language)
+            if depth > 0 or in_block_comment or not stripped or stripped.startswith(("//", "/*", "*", "@")):
+                continue
+            if stripped.endswith("}"):
+                ranges.append((start, number + 1))
+            if stripped.endswith(("}", ";")):
+                start = number + 1
+        return ranges
+
+    @staticmethod
+    def _splice(shell: str, members: List[str], language: str) -> str:
+        """Insert translated members at the end of a translated class shell."""
+        indented = re.search(r'^([ \t]+)\S', shell, re.MULTILINE)
+        indent = indented.group(1) if indented else "    "
+        body = "\n\n".join(textwrap.indent(textwrap.dedent(member).strip("\n"), indent) for member in members)
+        if language == 'python':
+            lines = shell.rstrip().split("\n")
+            if len(lines) > 1 and lines[-1].strip() == "pass":
+                lines.pop()
+            return "\n".join(lines) + "\n\n" + body
+        closing = r'^\s*end\b' if language in END_KEYWORD_LANGUAGES else r'\}'
+        matches = list(re.finditer(closing, shell, re.MULTILINE))
+        if not matches:
+            return f"{shell}\n\n{body}"
+        at = matches[-1].start()
+        before = shell[:at].rstrip()
+        separator = "\n" if before.endswith("{") or language in END_KEYWORD_LANGUAGES else "\n\n"
+        return f"{before}{separator}{body}\n{shell[at:].lstrip(' ')}"
+
+    def _split_python(self, source_code: str) -> Tuple[str, List[Chunk]]:
+        module = ast.parse(source_code)
+        lines = source_code.splitlines(keepends=True)
+        header_lines: List[str] = []
+        units: List[Chunk] = []
+        pending: List[str] = []
+        pending_start = 1
+
+        def flush(end_line: int):
+            nonlocal pending
+            if pending and "".join(pending).strip():
+                units.append(Chunk(
+                    index=len(units), name="statements", code="".join(pending).rstrip("\n"),
+                    start_line=pending_start, end_line=end_line
+                ))
+            pending = []
+
+        # Leading comments / shebang go in the header; comments between
+        # statements belong to the statement after them
+        line = min([node.lineno for node in getattr(module.body[0], "decorator_list", [])]
+                   + [module.body[0].lineno]) if module.body else len(lines) + 1
+        preamble = "".join(lines[:line - 1])
+        for statement in module.body:
+            if statement.end_lineno < line:
+                # Shares a line with the previous statement (a = 1; b = 2)
+                continue
+            end = statement.end_lineno
+            code = "".join(lines[line - 1:end])
+            if isinstance(statement, (ast.Import, ast.ImportFrom)):
+                # Only leading imports form the header; later ones stay in place
+                if not units and not pending:
+                    header_lines.append(code)
+                    line = end + 1
+                    continue
+
+            if isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                flush(line - 1)
+                keyword = "class" if isinstance(statement, ast.ClassDef) else "def"
+                units.append(Chunk(
+                    index=len(units), name=statement.name, code=code.rstrip("\n"),
+                    start_line=line, end_line=end, signature=self._python_signature(code, keyword)
+                ))
+            else:
+                if not pending:
+                    pending_start = line
+                pending.append(code)
+            line = end + 1
+        # Comments after the last statement
+        footer = "".join(lines[line - 1:])
+        if footer.strip():
+            if not pending:
+                pending_start = line
+            pending.append(footer)
+            line = len(lines) + 1
+        flush(line - 1)
+
+        header = (preamble + "".join(header_lines)).rstrip("\n")
+        return header, units
+
+    @staticmethod
+    def _python_signature(code: str, keyword: str) -> str:
+        for line in code.splitlines():
+            stripped = line.strip()
+            if stripped.startswith((f"{keyword} ", f"async {keyword} ")):
+                return stripped
+        return ""
+
+    def _split_generic(self, source_code: str, language: str) -> Tuple[str, List[Chunk]]:
+        header_pattern = re.compile(HEADER_PATTERNS[language]) if language in HEADER_PATTERNS else None
+        lines = source_code.split("\n")
+        header_lines: List[str] = []
+        units: List[Chunk] = []
+        current: List[str] = []
+        current_start = 1
+        depth = 0
+        in_block_comment = False
+        in_header = True
+        header_open = 0  # unclosed brackets of a multi-line import, e.g. Go's `import (`
+
+        for number, line in enumerate(lines, start=1):
+            stripped = line.strip()
+            if in_header and header_open > 0:
+                header_lines.append(line)
+                header_open = self._scan_depth(line, header_open, False, language)[0]
+                continue
+            if depth == 0 and in_header and not in_block_comment:
+                if header_pattern and header_pattern.match(line):
+                    header_lines.append(line)
+                    header_open = self._scan_depth(line, 0, False, language)[0]
+                    continue
+                if not stripped and not current:
+                    header_lines.append(line)
+                    continue
+                in_header = False
+
+            if not current:
+                current_start = number
+            current.append(line)
+            depth, in_block_comment = self._scan_depth(line, depth, in_block_comment, language)
+
+            if depth <= 0 and not in_block_comment and self._ends_unit(stripped, language):
+                depth = 0
+                units.append(self._make_unit(len(units), current, current_start, number))
+                current = []
+
+        if current and "\n".join(current).strip():
+            units.append(self._make_unit(len(units), current, current_start, len(lines)))
+
+        return "\n".join(header_lines).strip("\n"), units
+
+    @staticmethod
+    def _ends_unit(stripped: str, language: str) -> bool:
+        if language in END_KEYWORD_LANGUAGES:
+            return stripped == "end"
+        return stripped.endswith(("}", "};", ";")) or stripped == ")"
+
+    @staticmethod
+    def _scan_depth(line: str, depth: int, in_block_comment: bool, language: str) -> Tuple[int, bool]:
+        """Track brace (or def/end) nesting across one line, ignoring strings and comments."""
+        if language in END_KEYWORD_LANGUAGES:
+            code = line.split("#", 1)[0]
+            opened = len(re.findall(r'^\s*(def|class|module|if|unless|while|until|case|begin|for)\b|\bdo\b', code))
+            closed = len(re.findall(r'\bend\b', code))
+            return depth + opened - closed, False
+
+        i = 0
+        quote = None
+        while i < len(line):
+            char = line[i]
+            pair = line[i:i + 2]
+            if in_block_comment:
+                if pair == "*/":
+                    in_block_comment = False
+                    i += 1
+            elif quote:
+                if char == "\\":
+                    i += 1
+                elif char == quote:
+                    quote = None
+            elif pair == "//" or (char == "#" and language == 'php'):
+                break
+            elif pair == "/*":
+                in_block_comment = True
+                i += 1
+            elif char in "\"'`":
+                quote = char
+            elif char in "{(":
+                depth += 1
+            elif char in "})":
+                depth -= 1
+            i += 1
+        return depth, in_block_comment
+
+    @staticmethod
+    def _make_unit(index: int, lines: List[str], start: int, end: int) -> Chunk:
+        code = "\n".join(lines).strip("\n")
+        first = next((line.strip() for line in lines if line.strip() and not line.strip().startswith(("//", "/*", "*", "#"))), "")
+        signature = first.rstrip("{").strip() if first.endswith("{") or "(" in first else ""
+        name_match = re.search(r'(\w+)\s*(?:\(|<|\{|$|:)', first)
+        return Chunk(
+            index=index,
+            name=name_match.group(1) if name_match else f"unit{index}",
+            code=code,
+            start_line=start,
+            end_line=end,
+            signature=signature
+        )
@@ -0,0 +1,34 @@
+"""
+Entry points for CPU-bound work run in the worker processes of
+codeverse.services.cpu_pool. Each process keeps its own analyzer and
+transformer, so their caches survive across tasks until the worker is recycled.
+"""
+import os
+from typing import Dict, Optional
+
+from .analyzer import CodeAnalyzer
+from .transformer import CodeTransformer
+
+_analyzer: Optional[CodeAnalyzer] = None
+_transformer: Optional[CodeTransformer] = None
+
+
+def analyze(source_code: str, language: str) -> Dict:
+    global _analyzer
+    if _analyzer is None:
+        # Off the event loop a large file may take longer than the analyzer's
+        # default budget; the pool's task timeout is the hard stop
+        _analyzer = CodeAnalyzer(time_budget=float(os.getenv('ANALYSIS_TIME_BUDGET_MS', 5000)) / 1000)
+    return _analyzer.extract_patterns(source_code, language)
+
+
+def transform(source_code: str, source_language: str, target_language: str) -> Dict:
+    global _transformer
+    if _transformer is None:
+        _transformer = CodeTransformer()
+    from ..models.schemas import CodeTranslationRequest
+    return _transformer.translate_code(CodeTranslationRequest(
+        source_code=source_code,
+        source_language=source_language,
+        target_language=target_language
+    ))
@@ -0,0 +1,576 @@
+"""
+Incremental parsing for editor sessions.
+
+An IncrementalDocument holds one open file and applies the text edits the
+editor sends (Monaco's 1-based line/column ranges) instead of re-reading the
+whole file. The text is kept as a list of lines, each with the lexer state at
+its end (open brackets, unterminated multi-line string, open block comment)
+and the facts derived from it. After an edit only the changed lines are
+rescanned, and rescanning carries on past them only until a line's end state
+matches what it was before the edit, so typing inside a function touches a
+handful of lines no matter how large the file is. An edit that changes the
+state of everything after it (opening a multi-line string near the top) stops
+after `rescan_budget` lines and leaves the rest to finish_rescan(), which the
+caller can run off the event loop. Line counts and metrics are running totals
+kept up to date by the rescans, so answering after an edit does not walk the file.
+
+Syntax diagnostics come from tree-sitter when one of its language bundles
+(tree_sitter_language_pack or tree_sitter_languages) is installed, reparsing
+incrementally from the previous tree. Without it, Python's top-level block
+around the edit is re-checked with the standard library parser, and other
+languages get bracket matching from the line states.
+"""
+import ast
+import re
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+OPENING = {'(': ')', '[': ']', '{': '}'}
+CLOSING = {')': '(', ']': '[', '}': '{'}
+
+# Python top-level lines that continue the previous statement's block
+PYTHON_CONTINUATION = re.compile(r'(?:else|elif|except|finally)\b')
+# Python lines at column 0 that cannot be inside brackets; an unclosed bracket
+# before one is an error, and lexing starts over there instead of running on
+PYTHON_RESYNC = re.compile(r'(?:(?:async\s+)?def|class|import|from)\s|@\w')
+CHAR_LITERAL = re.compile(r"'(?:\\.[^'\n]{0,8}|[^\\'\n]{1,2})'")
+
+
+@dataclass(frozen=True)
+class LanguageSyntax:
+    line_comments: Tuple[str, ...] = ('//',)
+    block_comment: Optional[Tuple[str, str]] = ('/*', '*/')
+    # Quotes that end at the end of the line / that may span lines; longest first
+    quotes: Tuple[str, ...] = ('"',)
+    multiline_quotes: Tuple[str, ...] = ()
+    # Letters that may prefix a string literal (f"...", rb'...'), as a regex
+    string_prefixes: str = ''
+    # "'" opens a char literal only when one follows (lifetimes, generics)
+    char_literals: bool = True
+    decisions: str = r'\b(?:if|for|while|case|catch)\b|&&|\|\||(?<!\?)\?(?![.?:])'
+    functions: str = r'\bfunction\b'
+
+
+C_FUNCTION = (r'^\s*(?:[\w<>\[\],:*&~]+\s+)+\**(?!(?:if|for|while|switch|catch|return|new|else)\b)'
+              r'[\w:~]+\s*\([^;]*\)\s*(?:const\s*)?(?:throws\s+[\w.,\s]+)?\{?\s*$')
+
+SYNTAX: Dict[str, LanguageSyntax] = {
+    'python': LanguageSyntax(
+        line_comments=('#',), block_comment=None,
+        quotes=("'", '"'), multiline_quotes=('"""', "'''"), string_prefixes=r'[rRbBuUfF]{1,2}', char_literals=False,
+        decisions=r'\b(?:if|elif|for|while|except|and|or|case)\b',
+        functions=r'^\s*(?:async\s+)?def\s'
+    ),
+    'javascript': LanguageSyntax(
+        quotes=("'", '"'), multiline_quotes=('`',), char_literals=False,
+        functions=r'\bfunction\b|=>'
+    ),
+    'typescript': LanguageSyntax(
+        quotes=("'", '"'), multiline_quotes=('`',), char_literals=False,
+        functions=r'\bfunction\b|=>'
+    ),
+    'java': LanguageSyntax(multiline_quotes=('"""',), functions=C_FUNCTION),
+    'kotlin': LanguageSyntax(multiline_quotes=('"""',), decisions=r'\b(?:if|for|while|catch)\b|->|&&|\|\||\?:',
+                             functions=r'\bfun\b'),
+    'swift': LanguageSyntax(multiline_quotes=('"""',), char_literals=False,
+                            decisions=r'\b(?:if|guard|for|while|case|catch)\b|&&|\|\||(?<!\?)\?(?![.?:])',
+                            functions=r'\bfunc\b'),
+    'c': LanguageSyntax(functions=C_FUNCTION),
+    'cpp': LanguageSyntax(functions=C_FUNCTION),
+    'go': LanguageSyntax(multiline_quotes=('`',), decisions=r'\b(?:if|for|case)\b|&&|\|\|',
+                         functions=r'\bfunc\b'),
+    'rust': LanguageSyntax(quotes=(), multiline_quotes=('"',), decisions=r'\b(?:if|for|while|loop)\b|=>|&&|\|\||\?',
+                           functions=r'\bfn\b'),
+    'ruby': LanguageSyntax(
+        line_comments=('#',), block_comment=None, quotes=(), multiline_quotes=("'", '"'), char_literals=False,
+        decisions=r'\b(?:if|elsif|unless|while|until|for|when|rescue|and|or)\b|&&|\|\|',
+        functions=r'^\s*def\b'
+    ),
+    'php': LanguageSyntax(line_comments=('//', '#'), quotes=(), multiline_quotes=("'", '"'), char_literals=False,
+                          decisions=r'\b(?:if|elseif|for|foreach|while|case|catch)\b|&&|\|\||\?(?![?>:])',
+                          functions=r'\bfunction\b'),
+}
+
+# Lexer state at the end of a line: (open brackets, open multi-line quote, inside a block comment)
+State = Tuple[Tuple[str, ...], Optional[str], bool]
+INITIAL_STATE: State = ((), None, False)
+
+
+class EditError(ValueError):
+    """An edit's range does not fit the document (usually the client is out of sync)."""
+
+
+@dataclass
+class TextEdit:
+    """Replace the text between two 1-based (line, column) positions, end exclusive, like a Monaco range."""
+    start_line: int
+    start_column: int
+    end_line: int
+    end_column: int
+    text: str
+
+
+@dataclass
+class _Line:
+    state: State
+    decisions: int
+    functions: int
+    code: bool
+    # (column, message) for brackets that do not match
+    bracket_errors: List[Tuple[int, str]]
+
+
+@lru_cache(maxsize=None)
+def _patterns(syntax: LanguageSyntax) -> Tuple["re.Pattern", Dict[str, "re.Pattern"]]:
+    """Regexes that skip to the next character the lexer cares about, in code and inside each quote."""
+    markers = set('()[]{}')
+    markers.update(marker[0] for marker in syntax.line_comments + syntax.quotes + syntax.multiline_quotes)
+    if syntax.block_comment:
+        markers.add(syntax.block_comment[0][0])
+    if syntax.char_literals:
+        markers.add("'")
+    special = re.compile('[' + ''.join(re.escape(char) for char in sorted(markers)) + ']')
+    quote_ends = {quote: re.compile(r'\\|' + re.escape(quote)) for quote in syntax.quotes + syntax.multiline_quotes}
+    return special, quote_ends
+
+
+def scan_line(line: str, state: State, syntax: LanguageSyntax) -> Tuple[State, str, List[Tuple[int, str]]]:
+    """
+    Lex one line starting from `state`. Returns the state at the end of the line,
+    the line with strings and comments blanked out, and bracket errors.
+    """
+    special, quote_ends = _patterns(syntax)
+    stack, quote, in_comment = state
+    code_parts = []
+    errors = []
+    i, length = 0, len(line)
+    code_start = None if (quote or in_comment) else 0
+    while i < length:
+        if in_comment:
+            end = line.find(syntax.block_comment[1], i)
+            if end < 0:
+                break
+            i = end + len(syntax.block_comment[1])
+            in_comment = False
+            code_start = i
+            continue
+        if quote:
+            quote_end = quote_ends[quote]
+            while True:
+                match = quote_end.search(line, i)
+                if match is None:
+                    i = length
+                    break
+                i = match.end()
+                if match.group() != '\\':
+                    quote = None
+                    code_start = i
+                    break
+                # Skip the escaped character
+                i += 1
+            continue
+
+        match = special.search(line, i)
+        if match is None:
+            break
+        i = match.start()
+        char = line[i]
+        if char in OPENING:
+            stack = stack + (char,)
+        elif char in CLOSING:
+            opener = CLOSING[char]
+            if stack and stack[-1] == opener:
+                stack = stack[:-1]
+            elif opener in stack:
+                # Close what was left open inside, so one typo does not shift everything after it
+                depth = len(stack) - 1 - stack[::-1].index(opener)
+                errors.append((i, f"Unclosed '{stack[-1]}' before '{char}'"))
+                stack = stack[:depth]
+            else:
+                errors.append((i, f"Unmatched '{char}'"))
+        else:
+            if any(line.startswith(marker, i) for marker in syntax.line_comments):
+                code_parts.append(line[code_start:i])
+                code_start = None
+                break
+            if syntax.block_comment and line.startswith(syntax.block_comment[0], i):
+                code_parts.append(line[code_start:i])
+                in_comment = True
+                i += len(syntax.block_comment[0])
+                continue
+            opened = next((q for q in syntax.multiline_quotes + syntax.quotes if line.startswith(q, i)), None)
+            if opened:
+                code_parts.append(line[code_start:i])
+                code_parts.append(' ')
+                quote = opened
+                i += len(opened)
+                continue
+            if char == "'" and syntax.char_literals:
+                match = CHAR_LITERAL.match(line, i)
+                if match:
+                    code_parts.append(line[code_start:i])
+                    i = match.end()
+                    code_start = i
+                    continue
+        i += 1
+
+    if code_start is not None and not quote and not in_comment:
+        code_parts.append(line[code_start:])
+    if quote in syntax.quotes:
+        # A single-line string left open: the lexer recovers on the next line
+        quote = None
+    return (stack, quote, in_comment), ''.join(code_parts), errors
+
+
+@lru_cache(maxsize=None)
+def _tree_sitter_parser(language: str):
+    """A tree-sitter parser for `language`, or None when no grammar bundle is installed."""
+    for module in ('tree_sitter_language_pack', 'tree_sitter_languages'):
+        try:
+            get_parser = __import__(module, fromlist=['get_parser']).get_parser
+        except ImportError:
+            continue
+        try:
+            return get_parser(language)
+        except Exception:
+            return None
+    return None
+
+
+class IncrementalDocument:
+    """One open file: its lines, per-line lexer states and derived facts."""
+
+    def __init__(self, language: str, text: str, max_block_chars: int = 8_000, use_tree_sitter: bool = True,
+                 rescan_budget: Optional[int] = None):
+        language = language.lower()
+        if language not in SYNTAX:
+            raise ValueError(f"Unsupported language: {language}")
+        self.language = language
+        self.syntax = SYNTAX[language]
+        self.max_block_chars = max_block_chars
+        self.rescan_budget = rescan_budget
+        # First line whose info is stale after a rescan stopped at the budget
+        self.pending_rescan: Optional[int] = None
+        # Running totals over self.info: decisions, functions, code lines, lines with bracket errors
+        self._totals = [0, 0, 0, 0]
+        self.version = 0
+        self._decisions = re.compile(self.syntax.decisions)
+        self._functions = re.compile(self.syntax.functions)
+        self.lines: List[str] = []
+        self.info: List[_Line] = []
+        # Python syntax errors found by re-checking top-level blocks, by line index
+        self._block_errors: Dict[int, Tuple[int, str, int]] = {}
+        self._parser = _tree_sitter_parser(language) if use_tree_sitter else None
+        self._tree = None
+        self._line_bytes: List[int] = []
+        self.last_update: Dict = {}
+        self.replace(text)
+
+    @property
+    def parser_name(self) -> str:
+        return "tree-sitter" if self._parser is not None else "builtin"
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+    # Editing
+
+    def replace(self, text: str):
+        """Replace the whole document (open, or resync after the client lost track)."""
+        started = time.perf_counter()
+        self.lines = text.replace('\r\n', '\n').split('\n')
+        self.info = []
+        self._totals = [0, 0, 0, 0]
+        self.pending_rescan = None
+        self._block_errors = {}
+        self._rescan(0, 0, len(self.lines), full=True)
+        if self._parser is not None:
+            self._line_bytes = [len(line.encode('utf-8')) for line in self.lines]
+            self._tree = self._parser.parse(self.text.encode('utf-8'))
+        else:
+            self._check_blocks(0, len(self.lines))
+        self.version += 1
+        self.last_update = {
+            "reparsed_lines": len(self.lines),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 3)
+        }
+
+    def apply_edits(self, edits: List[TextEdit]):
+        """
+        Apply `edits` in order, each against the document as left by the ones
+        before it. Edits from one Monaco change event should be sent from the
+        highest range to the lowest, which makes that equivalent.
+        """
+        started = time.perf_counter()
+        reparsed = 0
+        for edit in edits:
+            reparsed += self._apply(edit)
+        self.version += 1
+        self.last_update = {
+            "reparsed_lines": reparsed,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 3)
+        }
+
+    def finish_rescan(self) -> int:
+        """Rescan the lines a budgeted rescan left stale; returns how many were scanned."""
+        start = self.pending_rescan
+        if start is None:
+            return 0
+        self.pending_rescan = None
+        stop = self._rescan(start, 0, 0)
+        if self._parser is None:
+            self._check_blocks(start, stop)
+        return stop - start
+
+    def _apply(self, edit: TextEdit) -> int:
+        # Later edits would start from stale states; rare enough (one batch
+        # both stopping a rescan and editing again) to finish inline
+        self.finish_rescan()
+        start, end = edit.start_line - 1, edit.end_line - 1
+        if not (0 <= start <= end < len(self.lines)):
+            raise EditError(f"Edit lines {edit.start_line}-{edit.end_line} are outside the document "
+                            f"({len(self.lines)} lines)")
+        if not (1 <= edit.start_column <= len(self.lines[start]) + 1
+                and 1 <= edit.end_column <= len(self.lines[end]) + 1
+                and (start < end or edit.start_column <= edit.end_column)):
+            raise EditError(f"Edit columns {edit.start_column}-{edit.end_column} are outside lines "
+                            f"{edit.start_line}-{edit.end_line}")
+
+        text = edit.text.replace('\r\n', '\n')
+        prefix = self.lines[start][:edit.start_column - 1]
+        suffix = self.lines[end][edit.end_column - 1:]
+        new_lines = (prefix + text + suffix).split('\n')
+        tree_edit = self._tree_edit(start, end, edit, text) if self._parser is not None else None
+
+        self.lines[start:end + 1] = new_lines
+        self._shift_block_errors(start, end, len(new_lines))
+        rescanned_to = self._rescan(start, end - start + 1, len(new_lines), budget=self.rescan_budget)
+        if tree_edit is not None:
+            self._line_bytes[start:end + 1] = [len(line.encode('utf-8')) for line in new_lines]
+            self._tree.edit(**tree_edit)
+            self._tree = self._parser.parse(self.text.encode('utf-8'), self._tree)
+        else:
+            self._check_blocks(start, rescanned_to)
+        return rescanned_to - start
+
+    def _rescan(self, start: int, removed: int, added: int, full: bool = False,
+                budget: Optional[int] = None) -> int:
+        """
+        Recompute line info for the `added` lines that replaced `removed` lines
+        at `start`, then for the lines after them until one ends in the same
+        state as before the edit. Returns the index of the first line left as it
+        was. With a `budget`, stops that many lines past the edit and records
+        where in pending_rescan.
+        """
+        old = self.info
+        scanned = []
+        state = old[start - 1].state if start > 0 else INITIAL_STATE
+        index = start
+        while index < len(self.lines):
+            line_info = self._scan(self.lines[index], state)
+            scanned.append(line_info)
+            state = line_info.state
+            index += 1
+            following = index - (start + added)
+            if not full and following >= 0:
+                # The next line is unchanged; it lexes as before if it starts in the same state
+                before = start + removed + following - 1
+                if state == (old[before].state if before >= 0 else INITIAL_STATE):
+                    self._splice_info(start, start + removed + following, scanned)
+                    return index
+                if budget is not None and following >= budget and index < len(self.lines):
+                    self._splice_info(start, start + removed + following, scanned)
+                    self.pending_rescan = index
+                    return index
+        self._splice_info(start, len(old), scanned)
+        return index
+
+    def _splice_info(self, start: int, stop: int, scanned: List[_Line]):
+        """Replace self.info[start:stop] with `scanned`, keeping the running totals."""
+        for sign, infos in ((-1, self.info[start:stop]), (1, scanned)):
+            for line_info in infos:
+                self._totals[0] += sign * line_info.decisions
+                self._totals[1] += sign * line_info.functions
+                self._totals[2] += sign * line_info.code
+                self._totals[3] += sign * bool(line_info.bracket_errors)
+        self.info[start:stop] = scanned
+
+    def _scan(self, line: str, state: State) -> _Line:
+        if self.language == 'python' and state[0] and state[1] is None and PYTHON_RESYNC.match(line):
+            state = INITIAL_STATE
+        end_state, code, errors = scan_line(line, state, self.syntax)
+        stripped = code.strip()
+        return _Line(
+            state=end_state,
+            decisions=len(self._decisions.findall(code)) if stripped else 0,
+            functions=len(self._functions.findall(code)) if stripped else 0,
+            code=bool(stripped) or (bool(line.strip()) and state[1] is not None),
+            bracket_errors=errors
+        )
+
+    # Tree-sitter
+
+    def _tree_edit(self, start: int, end: int, edit: TextEdit, text: str) -> Dict:
+        """tree-sitter's description of `edit` (byte offsets and byte columns), computed before applying it."""
+        line_start = sum(self._line_bytes[:start]) + start
+        start_column = len(self.lines[start][:edit.start_column - 1].encode('utf-8'))
+        old_end_column = len(self.lines[end][:edit.end_column - 1].encode('utf-8'))
+        inserted = text.split('\n')
+        new_end_row = start + len(inserted) - 1
+        new_end_column = len(inserted[-1].encode('utf-8')) + (start_column if len(inserted) == 1 else 0)
+        start_byte = line_start + start_column
+        return {
+            "start_byte": start_byte,
+            "old_end_byte": line_start + sum(self._line_bytes[start:end]) + (end - start) + old_end_column,
+            "new_end_byte": start_byte + len(text.encode('utf-8')),
+            "start_point": (start, start_column),
+            "old_end_point": (end, old_end_column),
+            "new_end_point": (new_end_row, new_end_column)
+        }
+
+    def _tree_diagnostics(self) -> List[Dict]:
+        diagnostics = []
+        pending = [self._tree.root_node]
+        while pending and len(diagnostics) < 100:
+            node = pending.pop()
+            if node.type == 'ERROR' or node.is_missing:
+                row, column = node.start_point
+                column = len(self.lines[row].encode('utf-8')[:column].decode('utf-8', 'ignore')) if row < len(self.lines) else column
+                message = f"Missing '{node.type}'" if node.is_missing else "Syntax error"
+                diagnostics.append(_diagnostic(row, column, message))
+                continue
+            # Only subtrees that contain an error are worth walking
+            pending.extend(reversed([child for child in node.children if child.has_error or child.is_missing]))
+        return sorted(diagnostics, key=lambda d: (d["line"], d["column"]))
+
+    # Python block checks
+
+    def _shift_block_errors(self, start: int, end: int, added: int):
+        if not self._block_errors:
+            return
+        delta = added - (end - start + 1)
+        shifted = {}
+        for line, error in self._block_errors.items():
+            if line < start:
+                shifted[line] = error
+            elif line > end:
+                shifted[line + delta] = error
+        self._block_errors = shifted
+
+    def _is_block_start(self, index: int, indent: str = '') -> bool:
+        """Whether line `index` starts a statement at `indent` (a new top-level block when indent is '')."""
+        line = self.lines[index]
+        if not line.startswith(indent) or len(line) == len(indent) or line[len(indent)] in ' \t#':
+            return False
+        if PYTHON_CONTINUATION.match(line, len(indent)):
+            return False
+        stack, quote, _ = self.info[index - 1].state if index > 0 else INITIAL_STATE
+        if quote or (stack and not (indent == '' and PYTHON_RESYNC.match(line))):
+            return False
+        # A decorated definition starts at its first decorator
+        previous = index - 1
+        while previous >= 0 and (not self.lines[previous].strip() or self.lines[previous].lstrip().startswith('#')):
+            previous -= 1
+        return previous < 0 or not self.lines[previous].startswith(indent + '@')
+
+    def _check_blocks(self, start: int, stop: int, low: int = 0, high: Optional[int] = None, indent: str = ''):
+        """Re-check the Python blocks at `indent` within lines [low, high) that overlap lines [start, stop)."""
+        if self.language != 'python':
+            return
+        high = len(self.lines) if high is None else high
+        # From the block before: the edit may have split it off and shortened it
+        index = max(low, min(start, high) - 1)
+        while index > low and not self._is_block_start(index, indent):
+            index -= 1
+        while True:
+            block_end = index + 1
+            while block_end < high and not self._is_block_start(block_end, indent):
+                block_end += 1
+            self._check_block(index, block_end, indent)
+            index = block_end
+            if index >= min(stop, high):
+                break
+
+    def _check_block(self, start: int, end: int, indent: str):
+        for line in range(start, end):
+            self._block_errors.pop(line, None)
+        lines = [line[len(indent):] if line.startswith(indent) else line.lstrip(' \t') for line in self.lines[start:end]]
+        source = "\n".join(lines)
+        if len(source) > self.max_block_chars:
+            # Too slow to parse on every keystroke: check the statements inside
+            # it (a class' methods, usually) one by one instead. Only the edited
+            # one is parsed again, the others come from the cache.
+            body = self._body_indent(start, end, indent)
+            if body is not None:
+                self._check_blocks(start + 1, end, start + 1, end, body)
+            return
+        error = _python_syntax_error(source)
+        if error is not None:
+            line, column, message = error
+            line = min(start + line, end - 1)
+            # Kept with the line's offset in the block: the message may refer to
+            # other lines of the block ("... on line 3"), which move with it
+            self._block_errors[line] = (len(indent) + column, message, line - start)
+
+    def _body_indent(self, start: int, end: int, indent: str) -> Optional[str]:
+        for index in range(start + 1, end):
+            line = self.lines[index]
+            stripped = line.lstrip(' \t')
+            stack, quote, _ = self.info[index - 1].state
+            if stripped and not stripped.startswith('#') and not stack and not quote:
+                body = line[:len(line) - len(stripped)]
+                return body if len(body) > len(indent) and body.startswith(indent) else None
+        return None
+
+    # Results
+
+    def diagnostics(self) -> List[Dict]:
+        if self._parser is not None:
+            return self._tree_diagnostics()
+        found = []
+        if self.language == 'python':
+            for line, (column, message, offset) in self._block_errors.items():
+                block_start = line - offset
+                message = re.sub(r'\bline (\d+)', lambda m: f"line {int(m.group(1)) + block_start}", message)
+                found.append(_diagnostic(line, column, message))
+            if found:
+                return sorted(found, key=lambda d: (d["line"], d["column"]))
+        if self._totals[3]:
+            for index, line_info in enumerate(self.info):
+                for column, message in line_info.bracket_errors:
+                    found.append(_diagnostic(index, column, message))
+        stack, quote, in_comment = self.info[-1].state
+        last = len(self.lines) - 1
+        if stack:
+            found.append(_diagnostic(last, len(self.lines[last]), f"{len(stack)} unclosed '{stack[-1]}'"))
+        if quote:
+            found.append(_diagnostic(last, len(self.lines[last]), f"Unterminated string ({quote})"))
+        if in_comment:
+            found.append(_diagnostic(last, len(self.lines[last]), "Unterminated comment"))
+        return found
+
+    def metrics(self) -> Dict:
+        decisions, functions, code_lines, _ = self._totals
+        return {
+            "lines": len(self.lines),
+            "lines_of_code": code_lines,
+            "cyclomatic": 1 + decisions,
+            "functions": functions
+        }
+
+
+@lru_cache(maxsize=4096)
+def _python_syntax_error(source: str) -> Optional[Tuple[int, int, str]]:
+    """(line, column, message) of the first syntax error in `source`, both 0-based, or None."""
+    try:
+        ast.parse(source)
+    except SyntaxError as e:
+        return max(0, (e.lineno or 1) - 1), max(0, (e.offset or 1) - 1), e.msg
+    return None
+
+
+def _diagnostic(line: int, column: int, message: str) -> Dict:
+    return {"line": line + 1, "column": column + 1, "message": message, "severity": "error"}
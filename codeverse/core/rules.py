@@ -0,0 +1,929 @@
+"""
+Token-stream rule engine behind CodeTransformer's offline translations.
+
+Source code is tokenized once (with the lexical conventions in
+codeverse.core.incremental.SYNTAX) and split into logical lines. Each line is
+rewritten in a single left-to-right pass: a token either starts one of the
+pair's patterns (looked up by its text in a precompiled dispatch table) or is
+renamed through the pair's name and operator tables. Strings and comments are
+whole tokens, so rules never touch their contents. A final pass converts
+between indentation and braced blocks.
+
+A language pair is declared as a RuleSet and registered in RULE_SETS.
+Patterns are written as space-separated source tokens:
+
+    name            a literal token; `let|const|var` matches any of them,
+                    a trailing `?` makes it optional (`;?`)
+    $NAME           exactly one name, number or string token
+    *NAME           any balanced run of tokens (possibly empty)
+    <NAME           first element only: the operand just before the match
+                    (`a.b[0]` in `a.b[0].length`)
+    $               end of the line (only a comment may follow)
+
+Templates refer to captures as $NAME; captured tokens are rewritten too.
+
+translate_scored() also rates how much of the source the rules covered, so
+callers can fall back to a better (slower) translator for the rest.
+"""
+import ast
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+from .incremental import CHAR_LITERAL, SYNTAX, LanguageSyntax
+
+Token = Tuple[str, str]
+
+OPERATORS = (
+    '>>>=', '===', '!==', '**=', '//=', '>>=', '<<=', '>>>', '...', '->', '=>', '==', '!=', '<=', '>=',
+    '&&', '||', '++', '--', '+=', '-=', '*=', '/=', '%=', '&=', '|=', '^=', '**', '//', '::', '?.', '??',
+    '<<', '>>', ':='
+)
+# Names that end an operand when walking back from `.length` and the like
+KEYWORDS = frozenset((
+    'return', 'if', 'elif', 'else', 'while', 'for', 'in', 'of', 'not', 'and', 'or', 'is', 'typeof',
+    'new', 'await', 'yield', 'throw', 'case', 'delete', 'void', 'instanceof', 'lambda', 'switch',
+    'catch', 'function', 'class', 'def'
+))
+CLOSE_TO_OPEN = {')': '(', ']': '[', '}': '{'}
+# Dispatch key of patterns that start with $NAME
+ANY_NAME = ''
+
+
+@dataclass(frozen=True, eq=False)
+class RuleSet:
+    """Declarative translation rules for one (source, target) language pair."""
+    source: str
+    target: str
+    # (pattern, template), tried in order for the token that starts the pattern
+    patterns: Tuple[Tuple[str, str], ...] = ()
+    # Renames for name and operator tokens that no pattern consumed
+    names: Dict[str, str] = field(default_factory=dict)
+    operators: Dict[str, str] = field(default_factory=dict)
+    # Source string delimiter -> (target opening, target closing, replacements inside)
+    strings: Dict[str, Tuple[str, str, Tuple[Tuple[str, str], ...]]] = field(default_factory=dict)
+    # Target's line comment prefix, or None to keep comments as they are
+    comment: Optional[str] = None
+    # "braces" turns indented blocks into { } blocks, "indentation" the reverse
+    blocks: Optional[str] = None
+    # Statement terminator to add ("braces") or remove ("indentation")
+    terminator: str = ';'
+    # Keyword put before the first assignment to a name in each function ("braces" only)
+    declaration: Optional[str] = None
+    # Source names and operators the rules cannot translate when no pattern consumes them
+    unsupported: FrozenSet[str] = frozenset()
+    # Python sources only: ast node and operator classes the rules translate;
+    # coverage is then measured on the syntax tree as well
+    nodes: FrozenSet[str] = frozenset()
+    # Source constructs the patterns translate into something that runs but
+    # means something else; each check returns (line, construct) pairs
+    checks: Tuple[Callable[[Sequence[Token]], List[Tuple[int, str]]], ...] = ()
+
+
+def _numbered(tokens: Sequence[Token]) -> List[Tuple[int, str, str]]:
+    """(line, kind, text) for the tokens that are not whitespace or comments."""
+    numbered = []
+    line = 1
+    for kind, text in tokens:
+        if kind not in ('ws', 'nl', 'comment'):
+            numbered.append((line, kind, text))
+        line += text.count('\n')
+    return numbered
+
+
+# A "{" after one of these starts an object literal rather than a block
+LITERAL_CONTEXT = frozenset(('=', '(', ',', ':', '[', 'return', '?', '||', '&&', '??'))
+
+
+def _object_literals(tokens: Sequence[Token]) -> List[Tuple[int, str]]:
+    """Bare-name keys ({a: 1}, {a}) and property access on names bound to a literal (o.a): dicts in Python."""
+    found = []
+    # Per open bracket: [is an object literal, next token is a key]
+    frames: List[List[bool]] = []
+    objects = set()
+    numbered = _numbered(tokens)
+    for index, (line, kind, text) in enumerate(numbered):
+        previous = numbered[index - 1] if index else None
+        top = frames[-1] if frames else None
+        if top is not None:
+            if top[0] and top[1] and kind == 'name':
+                found.append((line, 'object literal with bare keys'))
+            top[1] = False
+        if kind != 'op':
+            continue
+        if text == '{':
+            literal = previous is not None and previous[2] in LITERAL_CONTEXT
+            if literal and previous[2] == '=' and index > 1 and numbered[index - 2][1] == 'name':
+                objects.add(numbered[index - 2][2])
+            frames.append([literal, literal])
+        elif text in '([':
+            frames.append([False, False])
+        elif text in ')]}':
+            if frames:
+                frames.pop()
+        elif text == ',' and top is not None and top[0]:
+            top[1] = True
+        elif (text == '.' and previous is not None and previous[1] == 'name' and previous[2] in objects
+              and (index < 2 or numbered[index - 2][2] != '.')):
+            found.append((line, 'property access on an object'))
+    return found
+
+
+# Operators that truncate to integers in JavaScript but need ints in Python
+BITWISE_OPERATORS = frozenset(('|', '&', '^', '~', '<<', '>>', '>>>'))
+
+
+def _bitwise_division(tokens: Sequence[Token]) -> List[Tuple[int, str]]:
+    """Bitwise operators on a line with `/`: 7 / 2 | 0 truncates in JavaScript, Python raises TypeError on the float."""
+    lines: Dict[int, set] = {}
+    for line, kind, text in _numbered(tokens):
+        if kind == 'op':
+            lines.setdefault(line, set()).add(text)
+    return [(line, 'bitwise operator on a division') for line, operators in sorted(lines.items())
+            if '/' in operators and operators & BITWISE_OPERATORS]
+
+
+def _string_concatenation(tokens: Sequence[Token]) -> List[Tuple[int, str]]:
+    """`+` joining a string literal and something else: JavaScript converts, Python raises TypeError."""
+    found = []
+    numbered = _numbered(tokens)
+    for index in range(1, len(numbered) - 1):
+        line, kind, text = numbered[index]
+        if kind != 'op' or text != '+':
+            continue
+        left, right = numbered[index - 1], numbered[index + 1]
+        if left[1] not in ('name', 'number', 'string') and left[2] not in (')', ']'):
+            # Unary plus
+            continue
+        if (left[1] == 'string') != (right[1] == 'string'):
+            found.append((line, 'string concatenation with a non-string'))
+    return found
+
+
+RULE_SETS: Dict[Tuple[str, str], RuleSet] = {}
+
+
+def register(rule_set: RuleSet):
+    """Add (or replace) the rules for a language pair."""
+    RULE_SETS[(rule_set.source, rule_set.target)] = rule_set
+
+
+register(RuleSet(
+    source='python', target='javascript',
+    patterns=(
+        ('print ( *ARGS )', 'console.log($ARGS)'),
+        ('len ( *X )', '$X.length'),
+        ('def __init__ ( self , *PARAMS ) : $', 'constructor($PARAMS) {'),
+        ('def __init__ ( self ) : $', 'constructor() {'),
+        ('def $NAME ( self , *PARAMS ) : $', '$NAME($PARAMS) {'),
+        ('def $NAME ( self ) : $', '$NAME() {'),
+        ('def $NAME ( *PARAMS ) : $', 'function $NAME($PARAMS) {'),
+        ('class $NAME ( ) : $', 'class $NAME {'),
+        ('class $NAME ( *BASE ) : $', 'class $NAME extends $BASE {'),
+        ('class $NAME : $', 'class $NAME {'),
+        ('if *COND : $', 'if ($COND) {'),
+        ('elif *COND : $', 'else if ($COND) {'),
+        ('else : $', 'else {'),
+        ('while *COND : $', 'while ($COND) {'),
+        ('for $X in range ( *END ) : $', 'for (let $X = 0; $X < $END; $X++) {'),
+        ('for $X in range ( *START , *END ) : $', 'for (let $X = $START; $X < $END; $X++) {'),
+        ('for $KEY , $VALUE in *ITER : $', 'for (const [$KEY, $VALUE] of $ITER) {'),
+        ('for *X in *ITER : $', 'for (const $X of $ITER) {'),
+        ('try : $', 'try {'),
+        ('except *ERROR as $NAME : $', 'catch ($NAME) {'),
+        ('except *ERROR : $', 'catch (e) {'),
+        ('finally : $', 'finally {'),
+        ('raise $ERROR ( *MESSAGE )', 'throw new Error($MESSAGE)'),
+        ('raise *ERROR', 'throw $ERROR'),
+        ('pass $', ''),
+        ('<A // $B', 'Math.floor($A / $B)'),
+        ('is not', '!=='),
+    ),
+    names={
+        'True': 'true', 'False': 'false', 'None': 'null', 'self': 'this',
+        'and': '&&', 'or': '||', 'not': '!', 'is': '===',
+    },
+    strings={'"""': ('`', '`', ()), "'''": ('`', '`', ())},
+    comment='//',
+    blocks='braces',
+    declaration='let',
+    unsupported=frozenset((
+        'in', 'lambda', 'with', 'yield', 'import', 'from', 'global', 'nonlocal', 'assert', 'del', 'async',
+        'await', 'append', 'extend', 'items', 'keys', 'values', 'str', 'int', 'float', 'bool', 'isinstance',
+        'enumerate', 'zip', 'sorted', 'reversed', 'input', 'open', 'dict', 'list', 'set', 'tuple', 'sum', 'min',
+        'max', 'abs', 'format', 'join', 'super', '**', ':=', '@'
+    )),
+    nodes=frozenset((
+        'FunctionDef', 'ClassDef', 'Return', 'Assign', 'AugAssign', 'For', 'While', 'If', 'Expr', 'Pass',
+        'Break', 'Continue', 'Try', 'ExceptHandler', 'Raise', 'BoolOp', 'BinOp', 'UnaryOp', 'Compare', 'Call',
+        'Constant', 'Attribute', 'Subscript', 'Name', 'List', 'Dict',
+        'And', 'Or', 'Not', 'USub', 'UAdd', 'Add', 'Sub', 'Mult', 'Div', 'FloorDiv', 'Mod', 'BitAnd', 'BitOr',
+        'BitXor', 'LShift', 'RShift', 'Eq', 'NotEq', 'Lt', 'LtE', 'Gt', 'GtE', 'Is', 'IsNot'
+    )),
+))
+
+register(RuleSet(
+    source='javascript', target='python',
+    patterns=(
+        ('console . log ( *ARGS )', 'print($ARGS)'),
+        ('<X . length', 'len($X)'),
+        ('function $NAME ( *PARAMS ) { $', 'def $NAME($PARAMS):'),
+        ('constructor ( ) { $', 'def __init__(self):'),
+        ('constructor ( *PARAMS ) { $', 'def __init__(self, $PARAMS):'),
+        ('class $NAME extends $BASE { $', 'class $NAME($BASE):'),
+        ('class $NAME { $', 'class $NAME:'),
+        ('if ( *COND ) { $', 'if $COND:'),
+        ('else if ( *COND ) { $', 'elif $COND:'),
+        ('else { $', 'else:'),
+        ('while ( *COND ) { $', 'while $COND:'),
+        ('for ( let|var $I = *START ; $I < *END ; $I ++ ) { $', 'for $I in range($START, $END):'),
+        ('for ( const|let|var $X of *ITER ) { $', 'for $X in $ITER:'),
+        ('try { $', 'try:'),
+        ('catch ( $NAME ) { $', 'except Exception as $NAME:'),
+        ('finally { $', 'finally:'),
+        ('throw *ERROR', 'raise $ERROR'),
+        ('new $CLASS', '$CLASS'),
+        ('let|const|var $X ;? $', '$X = None'),
+        ('let|const|var', ''),
+        ('<X ++ ;? $', '$X += 1'),
+        ('<X -- ;? $', '$X -= 1'),
+        # Methods: any other name followed by a parameter list and a block
+        ('$NAME ( ) { $', 'def $NAME(self):'),
+        ('$NAME ( *PARAMS ) { $', 'def $NAME(self, $PARAMS):'),
+    ),
+    names={
+        'true': 'True', 'false': 'False', 'null': 'None', 'undefined': 'None', 'this': 'self',
+        'Error': 'Exception'
+    },
+    operators={'===': '==', '!==': '!=', '&&': 'and', '||': 'or', '!': 'not '},
+    checks=(_object_literals, _string_concatenation, _bitwise_division),
+    strings={'`': ('f"""', '"""', (('${', '{'),))},
+    comment='#',
+    blocks='indentation',
+    unsupported=frozenset((
+        '=>', '?', '?.', '??', '...', '++', '--', 'switch', 'case', 'default', 'do', 'typeof', 'instanceof',
+        'delete', 'void', 'async', 'await', 'yield', 'import', 'export', 'require', 'static', 'super', 'push',
+        'map', 'filter', 'reduce', 'forEach', 'slice', 'splice', 'indexOf', 'includes', 'toString', 'JSON',
+        'Math', 'Object', 'Array', 'Promise', 'parseInt', 'parseFloat', 'prototype', 'arguments'
+    )),
+))
+
+
+@dataclass
+class _Pattern:
+    elements: List[Tuple]
+    # Template split into literal text and capture names, alternating
+    template: List[str]
+    # Starts with a <NAME operand capture
+    operand: Optional[str]
+    # For patterns anchored at the end of the line: what the line must end with
+    last: Optional[frozenset]
+
+
+@dataclass
+class CompiledRules:
+    rule_set: RuleSet
+    syntax: LanguageSyntax
+    tokenizer: "re.Pattern"
+    dispatch: Dict[str, List[_Pattern]]
+    # Brackets that continue a logical line over newlines
+    line_brackets: str
+
+
+def tokenizer_for(syntax: LanguageSyntax) -> "re.Pattern":
+    comments = [re.escape(marker) + r'[^\n]*' for marker in syntax.line_comments]
+    if syntax.block_comment:
+        start, end = syntax.block_comment
+        comments.append(re.escape(start) + r'[\s\S]*?(?:' + re.escape(end) + r'|\Z)')
+    strings = []
+    prefix = f'(?:{syntax.string_prefixes})?' if syntax.string_prefixes else ''
+    for quote in sorted(syntax.multiline_quotes + syntax.quotes, key=len, reverse=True):
+        if quote in syntax.multiline_quotes:
+            body, end = r'(?:\\[\s\S]|[^\\])*?', r'(?:' + re.escape(quote) + r'|\Z)'
+        else:
+            body, end = r'(?:\\.|[^\\\n])*?', r'(?:' + re.escape(quote) + r'|(?=\n)|\Z)'
+        strings.append(prefix + re.escape(quote) + body + end)
+    if syntax.char_literals:
+        strings.append(CHAR_LITERAL.pattern)
+    operators = '|'.join(re.escape(operator) for operator in OPERATORS)
+    # A name directly followed by a quote is a string prefix (f"...")
+    name = r'[^\W\d][\w$]*+' + (r'(?![\'"])' if syntax.string_prefixes else '')
+    # Most frequent first; comments and strings still come before operators
+    parts = [
+        r'(?P<ws>[^\S\n]+)',
+        r'(?P<name>' + name + r'|\$[\w$]*)',
+        r'(?P<nl>\r?\n)',
+        r'(?P<number>\d[\w.]*|\.\d\w*)',
+        '(?P<comment>' + '|'.join(comments) + ')' if comments else None,
+        '(?P<string>' + '|'.join(strings) + ')' if strings else None,
+        '(?P<op>' + operators + r'|[^\w\s])',
+    ]
+    return re.compile('|'.join(part for part in parts if part))
+
+
+def tokenize(code: str, tokenizer: "re.Pattern") -> List[Token]:
+    return [(match.lastgroup, match.group()) for match in tokenizer.finditer(code)]
+
+
+def _compile_pattern(pattern: str, template: str) -> _Pattern:
+    elements = []
+    operand = None
+    for index, part in enumerate(pattern.split()):
+        if part == '$':
+            elements.append(('eol',))
+        elif part.startswith('$') and len(part) > 1:
+            elements.append(('one', part[1:]))
+        elif part.startswith('*') and len(part) > 1 and part[1].isalpha():
+            elements.append(('many', part[1:]))
+        elif part.startswith('<') and len(part) > 1 and part[1].isalpha():
+            if index != 0:
+                raise ValueError(f"Operand capture must come first: {pattern!r}")
+            operand = part[1:]
+        else:
+            optional = part.endswith('?') and len(part) > 1
+            text = part[:-1] if optional else part
+            choices = frozenset(text.split('|')) if re.fullmatch(r'\w+(?:\|\w+)+', text) else frozenset((text,))
+            elements.append(('literal', choices, optional))
+    if not elements or elements[0][0] not in ('literal', 'one') or (elements[0][0] == 'literal' and elements[0][2]):
+        raise ValueError(f"Pattern must start with a literal or $NAME (after an optional <operand): {pattern!r}")
+    last = None
+    if len(elements) > 1 and elements[-1][0] == 'eol' and elements[-2][0] == 'literal' and not elements[-2][2]:
+        last = elements[-2][1]
+    return _Pattern(elements, re.split(r'\$([A-Z_]+)', template), operand, last)
+
+
+@lru_cache(maxsize=None)
+def compile_rules(rule_set: RuleSet) -> CompiledRules:
+    """Build the tokenizer and dispatch table for a rule set, once per rule set."""
+    dispatch: Dict[str, List[_Pattern]] = {}
+    for pattern, template in rule_set.patterns:
+        compiled = _compile_pattern(pattern, template)
+        # Patterns starting with $NAME are tried for any name, after the literal ones
+        for text in compiled.elements[0][1] if compiled.elements[0][0] == 'literal' else (ANY_NAME,):
+            dispatch.setdefault(text, []).append(compiled)
+    syntax = SYNTAX[rule_set.source]
+    return CompiledRules(
+        rule_set=rule_set,
+        syntax=syntax,
+        tokenizer=tokenizer_for(syntax),
+        dispatch=dispatch,
+        # Braces are blocks in C-like languages but literals in indented ones
+        line_brackets='([{' if rule_set.blocks == 'braces' else '(['
+    )
+
+
+class _Rewriter:
+    """Applies one language pair's compiled rules to a token list in a single pass."""
+
+    def __init__(self, rules: CompiledRules):
+        self.rules = rules
+        self.rule_set = rules.rule_set
+        # Unsupported tokens left over after the patterns, and the code lines they spoil
+        self.unhandled: List[str] = []
+        self.lines = 0
+        self.missed_lines = 0
+
+    def rewrite_line(self, tokens: Sequence[Token]) -> List[Token]:
+        """rewrite() for one logical line of code, counted for coverage."""
+        before = len(self.unhandled)
+        out = self.rewrite(tokens)
+        self.lines += 1
+        if len(self.unhandled) > before:
+            self.missed_lines += 1
+        return out
+
+    def rewrite(self, tokens: Sequence[Token]) -> List[Token]:
+        out: List[Token] = []
+        index, count = 0, len(tokens)
+        names, operators, unsupported = self.rule_set.names, self.rule_set.operators, self.rule_set.unsupported
+        significant = _significant(tokens)
+        last = significant[-1][1] if significant else None
+        while index < count:
+            kind, text = tokens[index]
+            if kind == 'ws':
+                out.append(tokens[index])
+            elif kind == 'comment':
+                out.append(('comment', self._comment(text)))
+            elif kind == 'string':
+                out.append(('string', self._string(text)))
+            else:
+                end = self._apply_patterns(tokens, index, out, last)
+                if end is not None:
+                    index = end
+                    continue
+                if text in unsupported:
+                    self.unhandled.append(text)
+                if kind == 'name':
+                    out.append((kind, names.get(text, text)))
+                elif kind == 'op':
+                    out.append((kind, operators.get(text, text)))
+                else:
+                    out.append(tokens[index])
+            index += 1
+        return out
+
+    def _apply_patterns(self, tokens: Sequence[Token], index: int, out: List[Token],
+                        last: Optional[str]) -> Optional[int]:
+        kind, text = tokens[index]
+        candidates = self.rules.dispatch.get(text, [])
+        if kind == 'name' and ANY_NAME in self.rules.dispatch:
+            candidates = candidates + self.rules.dispatch[ANY_NAME]
+        for pattern in candidates:
+            if pattern.last is not None and last not in pattern.last:
+                continue
+            operand_start = None
+            if pattern.operand:
+                operand_start = _operand_start(out)
+                if operand_start is None:
+                    continue
+            captures: Dict[str, Sequence[Token]] = {}
+            end = _match(pattern.elements, 0, tokens, index, captures)
+            if end is None:
+                continue
+            values = {name: _join(self.rewrite(captured)).strip() for name, captured in captures.items()}
+            if operand_start is not None:
+                values[pattern.operand] = _join(out[operand_start:]).strip()
+                del out[operand_start:]
+            template = pattern.template
+            out.append(('text', ''.join(
+                part if position % 2 == 0 else values.get(part, '$' + part) for position, part in enumerate(template)
+            )))
+            return end
+        return None
+
+    def _comment(self, text: str) -> str:
+        prefix = self.rule_set.comment
+        if prefix is None:
+            return text
+        syntax = self.rules.syntax
+        if syntax.block_comment and text.startswith(syntax.block_comment[0]):
+            start, end = syntax.block_comment
+            body = text[len(start):]
+            body = body[:-len(end)] if body.endswith(end) else body
+            lines = [line.strip().lstrip('*').strip() for line in body.strip().split('\n')]
+            return '\n'.join(f"{prefix} {line}".rstrip() for line in lines)
+        marker = next(marker for marker in syntax.line_comments if text.startswith(marker))
+        return prefix + text[len(marker):]
+
+    def _string(self, text: str) -> str:
+        for delimiter, (opening, closing, replacements) in self.rule_set.strings.items():
+            if text.startswith(delimiter) and text.endswith(delimiter) and len(text) >= 2 * len(delimiter):
+                body = text[len(delimiter):-len(delimiter)]
+                for old, new in replacements:
+                    body = body.replace(old, new)
+                return opening + body + closing
+        return text
+
+
+def _match(elements: List[Tuple], position: int, tokens: Sequence[Token], index: int,
+           captures: Dict[str, Sequence[Token]]) -> Optional[int]:
+    """Match elements[position:] at tokens[index:]; returns the end index or None."""
+    count = len(tokens)
+    while position < len(elements):
+        while index < count and tokens[index][0] == 'ws':
+            index += 1
+        element = elements[position]
+        kind = element[0]
+        if kind == 'literal':
+            if index < count and tokens[index][1] in element[1] and tokens[index][0] not in ('string', 'comment'):
+                index += 1
+            elif not element[2]:
+                return None
+        elif kind == 'one':
+            if index >= count or tokens[index][0] not in ('name', 'number', 'string') or tokens[index][1] in KEYWORDS:
+                return None
+            if not _capture(captures, element[1], tokens[index:index + 1]):
+                return None
+            index += 1
+        elif kind == 'eol':
+            if any(token[0] not in ('ws', 'comment') for token in tokens[index:]):
+                return None
+        else:
+            # Balanced run: try every end where brackets are balanced, shortest first
+            following = elements[position + 1] if position + 1 < len(elements) else None
+            if following is not None and (following[0] != 'literal' or following[2]):
+                following = None
+            depth = 0
+            end = index
+            while True:
+                if depth == 0 and (following is None or _literal_at(tokens, end, following[1])):
+                    attempt = dict(captures)
+                    if _capture(attempt, element[1], tokens[index:end]):
+                        matched = _match(elements, position + 1, tokens, end, attempt)
+                        if matched is not None:
+                            captures.update(attempt)
+                            return matched
+                if end >= count or tokens[end][0] == 'comment':
+                    return None
+                text = tokens[end][1]
+                if tokens[end][0] == 'op':
+                    if text in '([{':
+                        depth += 1
+                    elif text in ')]}':
+                        depth -= 1
+                        if depth < 0:
+                            return None
+                end += 1
+        position += 1
+    return index
+
+
+def _literal_at(tokens: Sequence[Token], index: int, choices: frozenset) -> bool:
+    """Whether the first non-whitespace token from `index` is one of `choices`."""
+    while index < len(tokens) and tokens[index][0] == 'ws':
+        index += 1
+    return index < len(tokens) and tokens[index][1] in choices
+
+
+def _capture(captures: Dict[str, Sequence[Token]], name: str, tokens: Sequence[Token]) -> bool:
+    """Record a capture; a name used twice in a pattern must capture the same text."""
+    if name in captures:
+        return _join(captures[name]).strip() == _join(tokens).strip()
+    captures[name] = tokens
+    return True
+
+
+def _operand_start(out: List[Token]) -> Optional[int]:
+    """Index in `out` where the operand ending the output starts (a.b, f(x), y[0]), or None."""
+    end = len(out)
+    while end > 0 and out[end - 1][0] == 'ws':
+        end -= 1
+    position = end
+    while position > 0:
+        kind, text = out[position - 1]
+        if kind == 'op' and text in CLOSE_TO_OPEN:
+            depth = 0
+            while position > 0:
+                position -= 1
+                token_text = out[position][1]
+                if out[position][0] == 'op' and token_text in CLOSE_TO_OPEN:
+                    depth += 1
+                elif out[position][0] == 'op' and token_text in '([{':
+                    depth -= 1
+                    if depth == 0:
+                        break
+            continue
+        if kind in ('name', 'number', 'string') and text not in KEYWORDS:
+            position -= 1
+            if position > 0 and out[position - 1][1] == '.':
+                position -= 1
+                continue
+        break
+    return position if position < end else None
+
+
+def _join(tokens: Sequence[Token]) -> str:
+    return ''.join(text for _, text in tokens)
+
+
+def _logical_lines(tokens: List[Token], brackets: str) -> List[List[Token]]:
+    """Split at newlines outside `brackets`; newlines inside stay in the line as whitespace."""
+    lines: List[List[Token]] = [[]]
+    depth = 0
+    for token in tokens:
+        kind, text = token
+        if kind == 'nl':
+            if depth > 0:
+                lines[-1].append(('ws', '\n'))
+            else:
+                lines.append([])
+            continue
+        if kind == 'op':
+            if text in brackets:
+                depth += 1
+            elif text in CLOSE_TO_OPEN and CLOSE_TO_OPEN[text] in brackets and depth > 0:
+                depth -= 1
+        lines[-1].append(token)
+    return lines
+
+
+def _split_line(line: List[Token]) -> Tuple[str, List[Token]]:
+    """(indentation, tokens after it)."""
+    if line and line[0][0] == 'ws':
+        return line[0][1], line[1:]
+    return '', line
+
+
+def _width(indent: str) -> int:
+    return len(indent.expandtabs(4))
+
+
+def _significant(tokens: Sequence[Token]) -> List[Token]:
+    return [token for token in tokens if token[0] not in ('ws', 'comment')]
+
+
+@dataclass
+class _Scope:
+    """A def, class or the module, while translating to braces."""
+    width: int
+    # Names assigned (or bound as parameters) so far
+    assigned: set
+    class_body: bool
+    # Indentation of the body, known from its first line
+    body_indent: Optional[str] = None
+    # Output index where hoisted declarations go, and the line holding them
+    start: int = 0
+    declarations: Optional[int] = None
+
+
+def _hoist(output: List[str], scope: _Scope, keyword: str, name: str):
+    """Declare `name` on a line at the top of `scope`'s body (`let a, b;`)."""
+    if scope.declarations is None:
+        output.insert(scope.start, f"{scope.body_indent}{keyword} {name};")
+        scope.declarations = scope.start
+    else:
+        output[scope.declarations] = output[scope.declarations][:-1] + f", {name};"
+
+
+def _to_braces(lines: List[List[Token]], rewriter: _Rewriter, rule_set: RuleSet) -> List[str]:
+    """Indented blocks -> { } blocks, adding statement terminators and declarations."""
+    terminator = rule_set.terminator
+    output: List[str] = []
+    # Indentation of the lines that opened the blocks still open
+    open_blocks: List[str] = []
+    # Blank and comment-only lines, held back until the next code line shows
+    # whether they belong before or after the braces it closes
+    held: List[Tuple[str, str]] = []
+    # The module and each def/class still open
+    scopes: List[_Scope] = [_Scope(width=-1, assigned=set(), class_body=False, body_indent='')]
+
+    def close_blocks(indent: str, code: str) -> str:
+        """Close the blocks `indent` ends; returns "} " when the last one joins the line (} else {)."""
+        closing = []
+        while open_blocks and _width(open_blocks[-1]) >= _width(indent):
+            closing.append(open_blocks.pop())
+        prefix = ''
+        for block_indent in closing:
+            inside = [(line_indent, text) for line_indent, text in held
+                      if text and _width(line_indent) > _width(block_indent)]
+            output.extend(text for _, text in inside)
+            held[:] = [line for line in held if line not in inside]
+            if block_indent is closing[-1] and re.match(r'(?:else|catch|finally)\b', code):
+                prefix = '} '
+            else:
+                output.append(block_indent + '}')
+        return prefix
+
+    for line in lines:
+        indent, tokens = _split_line(line)
+        if not _significant(tokens):
+            comment = _join(rewriter.rewrite(tokens)).rstrip()
+            held.append((indent, indent + comment.replace('\n', '\n' + indent) if comment else ''))
+            continue
+
+        significant = _significant(tokens)
+        width = _width(indent)
+        while len(scopes) > 1 and scopes[-1].width >= width:
+            scopes.pop()
+        scope = scopes[-1]
+        if scope.body_indent is None:
+            scope.body_indent = indent
+        declare = False
+        if (rule_set.declaration and len(significant) > 1 and significant[0][0] == 'name'
+                and significant[1] == ('op', '=') and significant[0][1] not in KEYWORDS):
+            name = significant[0][1]
+            # Class bodies declare fields, which take no keyword
+            if not scope.class_body and name not in scope.assigned:
+                if width == _width(scope.body_indent):
+                    declare = True
+                else:
+                    # First assigned inside a nested block (if/else, loop, try): a
+                    # declaration there would not be visible after the block, so
+                    # declare it at the top of the function (or module) instead
+                    _hoist(output, scope, rule_set.declaration, name)
+            scope.assigned.add(name)
+        opened = None
+        if significant[0][1] in ('def', 'class'):
+            parameters = {text for kind, text in significant[2:] if kind == 'name'} if significant[0][1] == 'def' else set()
+            opened = _Scope(width=width, assigned=parameters, class_body=significant[0][1] == 'class')
+            scopes.append(opened)
+
+        rewritten = rewriter.rewrite_line(tokens)
+        comment = ''
+        if rewritten and rewritten[-1][0] == 'comment':
+            comment = rewritten.pop()[1]
+        code = _join(rewritten).rstrip()
+        if declare:
+            code = f"{rule_set.declaration} {code}"
+        prefix = close_blocks(indent, code)
+        output.extend(text for _, text in held)
+        held.clear()
+        if not code:
+            # The statement translated to nothing (pass)
+            continue
+        if code.endswith('{'):
+            open_blocks.append(indent)
+        elif terminator and not code.endswith((terminator, '{', ',', ':')) and not code.startswith('@'):
+            code += terminator
+        output.append(indent + prefix + code + (' ' + comment if comment else ''))
+        if opened is not None:
+            opened.start = len(output)
+
+    close_blocks('', '')
+    output.extend(text for _, text in held)
+    return output
+
+
+def _to_indentation(lines: List[List[Token]], rewriter: _Rewriter, rule_set: RuleSet) -> List[str]:
+    """{ } blocks -> indented blocks, dropping closing braces and statement terminators."""
+    terminator = rule_set.terminator
+    output: List[Tuple[str, str, bool]] = []
+    # For each open "{": whether it opened a block (True) or a literal
+    braces: List[bool] = []
+    for line in lines:
+        indent, tokens = _split_line(line)
+        significant = _significant(tokens)
+        # Closing braces of blocks at the start of the line
+        skip = 0
+        while skip < len(tokens) and braces and braces[-1] and (
+                tokens[skip][0] == 'ws' or tokens[skip][1] == '}'):
+            if tokens[skip][1] == '}':
+                braces.pop()
+            skip += 1
+        tokens = tokens[skip:]
+        if not significant:
+            comment = _join(rewriter.rewrite(tokens)).strip()
+            output.append((indent, indent + comment.replace('\n', '\n' + indent) if comment else '', False))
+            continue
+        if not _significant(tokens):
+            continue
+
+        opens_block = _significant(tokens)[-1][1] == '{'
+        rewritten = rewriter.rewrite_line(tokens)
+        comment = ''
+        if rewritten and rewritten[-1][0] == 'comment':
+            comment = rewritten.pop()[1]
+        while rewritten and (rewritten[-1][0] == 'ws' or rewritten[-1][1] == terminator):
+            rewritten.pop()
+        code = _join(rewritten).strip()
+        header = opens_block and code.endswith(':')
+        for kind, text in tokens:
+            if kind == 'op' and text == '{':
+                braces.append(False)
+            elif kind == 'op' and text == '}' and braces:
+                braces.pop()
+        if header:
+            braces[-1] = True
+        if code or comment:
+            output.append((indent, indent + code + (('  ' if code else '') + comment if comment else ''), header))
+
+    result = []
+    for position, (indent, text, header) in enumerate(output):
+        result.append(text)
+        if header:
+            following = next((line_indent for line_indent, line_text, _ in output[position + 1:]
+                              if line_text.strip() and not line_text.lstrip().startswith('#')), None)
+            if following is None or _width(following) <= _width(indent):
+                result.append(indent + '    pass')
+    return result
+
+
+@dataclass(frozen=True)
+class Translation:
+    code: str
+    # Share of the source the rules translated, 0..1
+    coverage: float
+    # Source constructs the rules had no translation for
+    unsupported: Tuple[str, ...] = ()
+
+
+def _translate(code: str, rule_set: RuleSet) -> Tuple[str, _Rewriter, List[Token]]:
+    rules = compile_rules(rule_set)
+    tokens = tokenize(code, rules.tokenizer)
+    lines = _logical_lines(tokens, rules.line_brackets)
+    rewriter = _Rewriter(rules)
+    if rule_set.blocks == 'braces':
+        output = _to_braces(lines, rewriter, rule_set)
+    elif rule_set.blocks == 'indentation':
+        output = _to_indentation(lines, rewriter, rule_set)
+    else:
+        output = [_join(rewriter.rewrite_line(line)) for line in lines]
+    return '\n'.join(output).strip('\n') + ('\n' if code.endswith('\n') else ''), rewriter, tokens
+
+
+def translate(code: str, source: str, target: str) -> Optional[str]:
+    """Translate `code` with the registered rules for the pair, or None if there are none."""
+    rule_set = RULE_SETS.get((source.lower(), target.lower()))
+    if rule_set is None:
+        return None
+    return _translate(code, rule_set)[0]
+
+
+def translate_scored(code: str, source: str, target: str) -> Optional[Translation]:
+    """
+    translate() plus a coverage score: the share of code lines with no
+    construct the rules cannot handle, the share of lines free of constructs
+    the rule set's checks flag, for Python sources also the share of syntax
+    tree nodes the rules translate, and 0 if Python output does not parse.
+    The lowest of these is the score.
+    """
+    rule_set = RULE_SETS.get((source.lower(), target.lower()))
+    if rule_set is None:
+        return None
+    translated, rewriter, tokens = _translate(code, rule_set)
+    unsupported = set(rewriter.unhandled)
+    scores = [1 - rewriter.missed_lines / rewriter.lines if rewriter.lines else 1.0]
+    flagged = set()
+    for check in rule_set.checks:
+        for line, construct in check(tokens):
+            flagged.add(line)
+            unsupported.add(construct)
+    if flagged:
+        scores.append(max(0.0, 1 - len(flagged) / max(rewriter.lines, 1)))
+    if rule_set.nodes:
+        score, missing = _tree_coverage(code, rule_set.nodes)
+        scores.append(score)
+        unsupported.update(missing)
+    if rule_set.target == 'python' and translated.strip():
+        try:
+            ast.parse(translated)
+        except SyntaxError:
+            scores.append(0.0)
+            unsupported.add('invalid output')
+    return Translation(translated, round(min(scores), 4), tuple(sorted(unsupported)))
+
+
+def _tree_coverage(code: str, nodes: FrozenSet[str]) -> Tuple[float, List[str]]:
+    """Share of a Python source's statements and expressions whose constructs are all in `nodes`."""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return 0.0, ['syntax error']
+    # `for k, v in ...` targets are handled by the for patterns
+    loop_targets = {id(node.target) for node in ast.walk(tree) if isinstance(node, ast.For)}
+    classes = {node.name for node in ast.walk(tree) if isinstance(node, ast.ClassDef)}
+    total = covered = 0
+    missing = set()
+    for node in ast.walk(tree):
+        if not isinstance(node, (ast.stmt, ast.expr, ast.excepthandler, ast.keyword, ast.arg)):
+            continue
+        total += 1
+        constructs = [type(node).__name__]
+        if isinstance(node, ast.Tuple) and id(node) in loop_targets:
+            constructs = []
+        if hasattr(node, 'op'):
+            constructs.append(type(node.op).__name__)
+        constructs.extend(type(op).__name__ for op in getattr(node, 'ops', ()))
+        if isinstance(node, ast.Compare) and len(node.ops) > 1:
+            constructs.append('chained comparison')
+        if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.Mult, ast.Add)) and any(
+                _is_sequence(operand) for operand in (node.left, node.right)):
+            # [0] * 3 and "a" * 3 are NaN in JavaScript, [1] + [2] is "12"
+            constructs.append('sequence repetition' if isinstance(node.op, ast.Mult) else 'sequence concatenation')
+        if isinstance(node, ast.Call) and _is_class(node.func, classes):
+            # A() is a TypeError in JavaScript, which needs `new A()`
+            constructs.append('class instantiation')
+        if isinstance(node, ast.Subscript) and _is_negative_index(node.slice):
+            # x[-1] is undefined in JavaScript
+            constructs.append('negative index')
+        if isinstance(node, ast.For) and not _is_iterable_in_js(node.iter):
+            # for...of throws on dicts and other objects that are not arrays or strings
+            constructs.append('iteration over a non-range iterable')
+        if isinstance(node, ast.arg):
+            constructs = ['annotation'] if node.annotation else []
+        if isinstance(node, ast.FunctionDef):
+            if node.decorator_list:
+                constructs.append('decorator')
+            if node.returns:
+                constructs.append('annotation')
+            arguments = node.args
+            if arguments.vararg or arguments.kwarg or arguments.kwonlyargs or arguments.posonlyargs:
+                constructs.append('variadic parameters')
+        if isinstance(node, (ast.For, ast.While, ast.Try)) and node.orelse:
+            constructs.append('else clause')
+        unknown = [construct for construct in constructs if construct not in nodes]
+        if unknown:
+            missing.update(unknown)
+        else:
+            covered += 1
+    return (covered / total if total else 1.0), sorted(missing)
+
+
+def _is_sequence(node: ast.AST) -> bool:
+    """A list, tuple or string literal (where `*` repeats and `+` concatenates in Python)."""
+    if isinstance(node, (ast.List, ast.ListComp, ast.Tuple, ast.JoinedStr)):
+        return True
+    return isinstance(node, ast.Constant) and isinstance(node.value, (str, bytes))
+
+
+def _is_class(func: ast.AST, classes: set) -> bool:
+    """A call target that is a class: defined in the snippet, or named like one (Counter, mod.Path)."""
+    name = func.id if isinstance(func, ast.Name) else func.attr if isinstance(func, ast.Attribute) else ''
+    return name in classes or name[:1].isupper()
+
+
+def _is_negative_index(node: ast.AST) -> bool:
+    if isinstance(node, ast.Slice):
+        return any(bound is not None and _is_negative_index(bound) for bound in (node.lower, node.upper))
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        return True
+    return isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and node.value < 0
+
+
+def _is_iterable_in_js(node: ast.AST) -> bool:
+    """An iterable the for patterns translate faithfully: range(), or a list, tuple or string literal."""
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == 'range':
+        return True
+    return isinstance(node, (ast.List, ast.ListComp, ast.Tuple, ast.JoinedStr)) or (
+        isinstance(node, ast.Constant) and isinstance(node.value, str))
@@ -7,8 +7,21 @@ project_root = str(Path(__file__).parent.parent.absolute())
 if project_root not in sys.path:
     sys.path.append(project_root)
 
-from fastapi import FastAPI, HTTPException
+import logging
+from contextlib import asynccontextmanager
+
+from dotenv import load_dotenv
+
+# Load .env before any module reads its configuration from the environment
+load_dotenv(Path(project_root) / '.env')
+
+# Configured before the services are imported so their startup logs go through it
+from codeverse.services.logging_config import RequestIdMiddleware, fields, logging_manager
+logging_manager.configure()
+
+from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 from codeverse.models.schemas import (
     CompileRequest, CompileResponse,
     TranslateRequest, TranslateResponse,
@@ -16,12 +29,33 @@ from codeverse.models.schemas import (
 )
 from codeverse.services.compiler_service import CompilerService
 from codeverse.services.translation_service import TranslationService
+from codeverse.services.http_clients import http_clients
+from codeverse.services.container import services
+from codeverse.services.cpu_pool import cpu_pool
+from codeverse.services.scheduler import UpstreamOverloaded
+from codeverse.services import metrics
 from codeverse.api.routes import router as api_router
+from codeverse.api.dependencies import get_compiler_service, get_translation_service
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open shared upstream clients and resume migration jobs on startup; clean up on shutdown"""
+    logging_manager.configure()
+    await http_clients.startup()
+    await services.startup()
+    yield
+    await services.shutdown()
+    cpu_pool.shutdown()
+    await http_clients.shutdown()
+    logging_manager.shutdown()
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title="CodeVerse API",
     description="API for compiling and translating code",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -33,6 +67,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route latency and in-flight requests
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Request ids for log lines, echoed back in X-Request-ID
+app.add_middleware(RequestIdMiddleware)
+
+@app.exception_handler(UpstreamOverloaded)
+async def upstream_overloaded_handler(request: Request, exc: UpstreamOverloaded):
+    """Shed load with 503 + Retry-After instead of queueing without bound"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "retry_after": exc.retry_after},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
 # Include API routes
 app.include_router(api_router, prefix="/api")
 
@@ -45,21 +94,31 @@ async def root():
         "version": "1.0.0"
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus metrics"""
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.get("/languages")
-async def get_supported_languages():
+async def get_supported_languages(compiler_service: CompilerService = Depends(get_compiler_service)):
     """Get list of supported programming languages"""
     return {
-        "languages": list(compiler_service.supported_languages.keys())
+        "languages": compiler_service.get_supported_languages()
     }
 
 @app.post("/compile", response_model=CompileResponse)
-async def compile_code(request: CompileRequest):
+async def compile_code(
+    request: CompileRequest,
+    compiler_service: CompilerService = Depends(get_compiler_service)
+):
     """Compile and run code in the specified language"""
     try:
-        print(f"\nReceived compilation request:")
-        print(f"Language: {request.language}")
-        print(f"Input data: {request.stdin}")
-        print(f"Code:\n{request.source_code}")
+        logger.info("Received compilation request", extra=fields(
+            language=request.language, source_chars=len(request.source_code)
+        ))
+        logger.debug("Compilation request payload", extra=fields(
+            source_code=request.source_code, stdin=request.stdin
+        ))
 
         # Ensure stdin is a string and handle empty input
         stdin = "John\n25" if not request.stdin else request.stdin
@@ -68,37 +127,43 @@ async def compile_code(request: CompileRequest):
         compile_request = CompileRequest(
             source_code=request.source_code,
             language=request.language,
-            stdin=stdin
+            stdin=stdin,
+            cache=request.cache
         )
 
         # Pass the CompileRequest object to compile_and_execute
         result = await compiler_service.compile_and_execute(compile_request)
 
-        print(f"Compilation result: {result}")
+        logger.debug("Compilation result", extra=fields(
+            success=result.success, output=result.output, error=result.error
+        ))
         
         # Since result is already a CompileResponse object, just return it
         return result
 
+    except UpstreamOverloaded:
+        raise
     except Exception as e:
-        print(f"Error in compile endpoint: {str(e)}")
+        logger.exception("Error in compile endpoint")
         return CompileResponse(
             success=False,
             error=str(e)
         )
 
 @app.post("/translate", response_model=TranslateResponse)
-async def translate_code(request: TranslateRequest):
+async def translate_code(
+    request: TranslateRequest,
+    translation_service: TranslationService = Depends(get_translation_service)
+):
     """Translate code from one language to another"""
     try:
         result = await translation_service.translate(request)
         return result
+    except UpstreamOverloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-# Initialize services
-compiler_service = CompilerService()
-translation_service = TranslationService()
-
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,25 +1,155 @@
 from pydantic import BaseModel
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
 
 class CompileRequest(BaseModel):
     source_code: str
     language: str
     stdin: str = ""
+    cache: bool = False
 
 class CompileResponse(BaseModel):
     success: bool
     output: Optional[str] = None
     error: Optional[str] = None
+    cached: bool = False
+    compile_time_ms: Optional[float] = None
+    run_time_ms: Optional[float] = None
+    compile_cached: bool = False
+
+class TestCase(BaseModel):
+    stdin: str = ""
+    expected_output: Optional[str] = None
+
+class BatchCompileRequest(BaseModel):
+    source_code: str
+    language: str
+    cases: List[TestCase]
+    max_parallel: Optional[int] = None
+
+class TestCaseResult(BaseModel):
+    index: int
+    success: bool
+    output: Optional[str] = None
+    error: Optional[str] = None
+    exit_code: Optional[int] = None
+    run_time_ms: Optional[float] = None
+    passed: Optional[bool] = None
+
+class BatchCompileResponse(BaseModel):
+    success: bool
+    error: Optional[str] = None
+    results: List[TestCaseResult] = []
+    compile_time_ms: Optional[float] = None
+    compile_cached: bool = False
+    total_time_ms: Optional[float] = None
+    passed: int = 0
+    failed: int = 0
 
 class TranslateRequest(BaseModel):
     source_code: str
     source_language: str
     target_language: str
+    bypass_cache: bool = False
+    # "llm" always asks the model; "tiered" first tries the offline rules
+    # (codeverse.core.rules) and only asks the model if they fall short
+    mode: str = "llm"
+    # Keeps per-unit translations of this document (e.g. an editor session
+    # id) so that re-translating it after an edit only redoes changed units
+    document_id: Optional[str] = None
 
 class TranslateResponse(BaseModel):
     success: bool
     translated_code: Optional[str] = None
     error: Optional[str] = None
+    cached: bool = False
+    usage: Optional[Dict[str, int]] = None
+    provider: Optional[str] = None
+    # Which translator produced the code: "rules" or "llm"
+    tier: Optional[str] = None
+    # Rule coverage of the source (0..1) when the rules served it
+    confidence: Optional[float] = None
+    # Document translations: top-level units in the source, and how many of
+    # them had to be translated (the rest were reused from the last version)
+    units: Optional[int] = None
+    retranslated_units: Optional[int] = None
+
+class BatchTranslateRequest(BaseModel):
+    items: List[TranslateRequest]
+    max_concurrency: Optional[int] = None
+
+class MigrationRequest(BaseModel):
+    source_language: str
+    target_language: str
+    # Either a directory/archive path on the server or an uploaded .zip/.tar(.gz) archive
+    source_path: Optional[str] = None
+    archive_base64: Optional[str] = None
+    archive_name: Optional[str] = None
+
+class AnalyzeRequest(BaseModel):
+    source_code: str
+    language: str
+
+class DetectedPattern(BaseModel):
+    name: str
+    confidence: float
+    locations: List[List[str]] = []
+
+class AnalyzeResponse(BaseModel):
+    success: bool
+    language: str
+    detected_patterns: List[DetectedPattern] = []
+    complexity_metrics: Dict[str, Any] = {}
+    dependencies: List[str] = []
+    # Set when the analysis ran out of time and only some metrics are filled in
+    partial: bool = False
+    cached: bool = False
+    analysis_ms: Optional[float] = None
+    error: Optional[str] = None
+
+class ParseSessionRequest(BaseModel):
+    language: str
+    text: str
+
+class SessionEdit(BaseModel):
+    # 1-based positions, end exclusive, as in a Monaco range
+    start_line: int
+    start_column: int
+    end_line: int
+    end_column: int
+    text: str = ""
+
+class ParseSessionEditRequest(BaseModel):
+    # The session version the edits were made against
+    version: int
+    edits: List[SessionEdit]
+
+class Diagnostic(BaseModel):
+    line: int
+    column: int
+    message: str
+    severity: str = "error"
+
+class ParseSessionResponse(BaseModel):
+    session_id: str
+    language: str
+    version: int
+    parser: str
+    diagnostics: List[Diagnostic] = []
+    metrics: Dict[str, Any] = {}
+    reparsed_lines: int
+    elapsed_ms: float
+
+class EditorJobMessage(BaseModel):
+    # "compile", "translate", "analyze", or "cancel" (every job of the document)
+    type: str
+    # The client's name for the buffer the job is about, e.g. "source"
+    document: str = "source"
+    # Version of the document the code comes from; results are tagged with it
+    version: int = 0
+    # Overrides the server's debounce delay, e.g. 0 for an explicit Run click
+    debounce_ms: Optional[int] = None
+    # Body of the matching HTTP request: CompileRequest, TranslateRequest or AnalyzeRequest
+    request: Dict[str, Any] = {}
 
 # Alias for backward compatibility
 CodeTranslationRequest = TranslateRequest
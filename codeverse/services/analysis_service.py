@@ -0,0 +1,83 @@
+import hashlib
+import os
+from dataclasses import asdict
+from typing import Dict
+
+from codeverse.core import cpu_tasks
+from codeverse.models.schemas import AnalyzeRequest, AnalyzeResponse, CodeTranslationRequest
+from codeverse.services import metrics
+from codeverse.services.cache import LRUCache
+from codeverse.services.cpu_pool import CPUTaskTimeout, cpu_pool
+
+
+class AnalysisService:
+    """
+    Static analysis and rule-based transformation, run on the CPU worker pool.
+
+    Results are cached here, in the API process, by content hash, so repeated
+    requests skip the pool entirely; each worker keeps its own parse cache too.
+    """
+
+    def __init__(self, pool=None):
+        self.pool = pool or cpu_pool
+        self.cache = LRUCache(max_entries=int(os.getenv('ANALYSIS_CACHE_SIZE', 256)))
+        self.max_source_chars = int(os.getenv('ANALYSIS_MAX_SOURCE_CHARS', 2_000_000))
+
+    def validate_request(self, source_code: str) -> str:
+        """Return an error message for unacceptable input, or an empty string."""
+        if not source_code or not source_code.strip():
+            return "Source code cannot be empty"
+        if len(source_code) > self.max_source_chars:
+            return f"Source code is too large ({len(source_code)} characters, the limit is {self.max_source_chars})"
+        return ""
+
+    @staticmethod
+    def _cache_key(*parts: str) -> str:
+        return hashlib.sha256("\0".join(parts).encode('utf-8')).hexdigest()
+
+    async def analyze(self, request: AnalyzeRequest) -> AnalyzeResponse:
+        language = request.language.lower()
+        key = self._cache_key("analyze", language, request.source_code)
+        cached = self.cache.get(key)
+        metrics.cache_requests.labels("analysis", "hit" if cached is not None else "miss").inc()
+        if cached is not None:
+            return cached.model_copy(update={"cached": True})
+
+        try:
+            result = await self.pool.run("analyze", cpu_tasks.analyze, request.source_code, language)
+        except CPUTaskTimeout as e:
+            return AnalyzeResponse(success=False, language=language, error=str(e))
+
+        failed = 'errors' in result and not result.get('partial')
+        response = AnalyzeResponse(
+            success=not failed,
+            language=language,
+            detected_patterns=[asdict(pattern) for pattern in result.get('detected_patterns', [])],
+            complexity_metrics=result.get('complexity_metrics', {}),
+            dependencies=result.get('dependencies', []),
+            partial=result.get('partial', False),
+            analysis_ms=result.get('analysis_ms'),
+            error=result.get('errors')
+        )
+        # Syntax errors are cached too: the same code fails the same way
+        self.cache.set(key, response)
+        return response
+
+    async def transform(self, request: CodeTranslationRequest) -> Dict:
+        """Rule-based (non-LLM) translation with CodeTransformer."""
+        source_language = request.source_language.lower()
+        target_language = request.target_language.lower()
+        key = self._cache_key("transform", source_language, target_language, request.source_code)
+        cached = self.cache.get(key)
+        metrics.cache_requests.labels("transform", "hit" if cached is not None else "miss").inc()
+        if cached is not None:
+            return cached
+
+        result = await self.pool.run(
+            "transform", cpu_tasks.transform, request.source_code, source_language, target_language
+        )
+        self.cache.set(key, result)
+        return result
+
+    def stats(self) -> Dict:
+        return {"cache": self.cache.stats(), "pool": self.pool.stats()}
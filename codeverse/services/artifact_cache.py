@@ -0,0 +1,154 @@
+import asyncio
+import glob
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from typing import Dict, List, Optional
+
+from codeverse.services import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class ArtifactCache:
+    """
+    Size-bounded on-disk cache of compiled programs (binaries, .class files).
+
+    Each entry is a directory named after a hash of the prepared source, the
+    compiler version and the compile command. Entries are evicted least recently
+    used first (by directory mtime) once the total size exceeds `max_bytes`.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._sizes: Optional[Dict[str, int]] = None
+
+    @staticmethod
+    def make_key(language: str, source: str, compiler_version: str, command: List[str]) -> str:
+        material = json.dumps([language, source, compiler_version, command])
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    @staticmethod
+    def _dir_size(path: str) -> int:
+        total = 0
+        for dirpath, _, filenames in os.walk(path):
+            for filename in filenames:
+                try:
+                    total += os.path.getsize(os.path.join(dirpath, filename))
+                except OSError:
+                    pass
+        return total
+
+    def _index(self) -> Dict[str, int]:
+        # Built lazily from whatever a previous process left on disk
+        if self._sizes is None:
+            os.makedirs(self.root, exist_ok=True)
+            self._sizes = {
+                entry: self._dir_size(os.path.join(self.root, entry))
+                for entry in os.listdir(self.root)
+                if not entry.startswith('.')
+            }
+        return self._sizes
+
+    def _restore(self, key: str, workdir: str) -> bool:
+        path = self._entry_path(key)
+        with self._lock:
+            if key not in self._index() or not os.path.isdir(path):
+                return False
+            os.utime(path)
+
+        for filename in os.listdir(path):
+            target = os.path.join(workdir, filename)
+            shutil.copy2(os.path.join(path, filename), target)
+        return True
+
+    def _store(self, key: str, workdir: str, patterns: List[str]):
+        files = []
+        for pattern in patterns:
+            files.extend(glob.glob(os.path.join(workdir, pattern)))
+        if not files:
+            return
+
+        with self._lock:
+            index = self._index()
+            if key in index:
+                return
+            staging = tempfile.mkdtemp(prefix='.staging-', dir=self.root)
+
+        for path in files:
+            shutil.copy2(path, os.path.join(staging, os.path.basename(path)))
+        size = self._dir_size(staging)
+
+        with self._lock:
+            try:
+                os.rename(staging, self._entry_path(key))
+            except OSError:
+                # Another run stored the same artifact first
+                shutil.rmtree(staging, ignore_errors=True)
+                return
+            index[key] = size
+            self._evict(index)
+
+    def _evict(self, index: Dict[str, int]):
+        total = sum(index.values())
+        if total <= self.max_bytes:
+            return
+
+        def last_used(entry):
+            try:
+                return os.path.getmtime(self._entry_path(entry))
+            except OSError:
+                return 0.0
+
+        for entry in sorted(index, key=last_used):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(self._entry_path(entry), ignore_errors=True)
+            total -= index.pop(entry)
+            self.evictions += 1
+
+    async def restore(self, key: str, workdir: str) -> bool:
+        """Copy a cached build into `workdir`. Returns False on a miss."""
+        try:
+            found = await asyncio.to_thread(self._restore, key, workdir)
+        except OSError as e:
+            logger.warning("Artifact cache read error: %s", e)
+            found = False
+        if found:
+            self.hits += 1
+        else:
+            self.misses += 1
+        metrics.cache_requests.labels("artifact", "hit" if found else "miss").inc()
+        return found
+
+    async def store(self, key: str, workdir: str, patterns: List[str]):
+        """Save the files in `workdir` matching `patterns` as a cached build."""
+        try:
+            await asyncio.to_thread(self._store, key, workdir, patterns)
+        except OSError as e:
+            logger.warning("Artifact cache write error: %s", e)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            index = self._index()
+            return {
+                "root": self.root,
+                "entries": len(index),
+                "bytes": sum(index.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
@@ -1,14 +1,18 @@
 import os
-from pathlib import Path
-import httpx
-from typing import Dict, Any
-import json
-import asyncio
-from codeverse.models.schemas import CompileRequest, CompileResponse
+import time
+from codeverse.models.schemas import (
+    CompileRequest, CompileResponse,
+    BatchCompileRequest, BatchCompileResponse, TestCaseResult
+)
+from codeverse.services import metrics
+from codeverse.services.execution_cache import execution_cache
+from codeverse.services.execution_backends import ExecutionResult, create_execution_backend
+from codeverse.services.scheduler import BATCH, UpstreamOverloaded, request_priority
+from codeverse.services.singleflight import execution_flights
 
 class CompilerService:
     def __init__(self):
-        self.base_url = "https://emkc.org/api/v2/piston"
+        self.base_url = os.getenv('PISTON_URL', "https://emkc.org/api/v2/piston")
         self.headers = {
             'Content-Type': 'application/json'
         }
@@ -26,6 +30,16 @@ class CompilerService:
             'php': 'php'
         }
 
+        # Where programs actually run (Piston by default, see EXECUTION_BACKEND)
+        self.backend = create_execution_backend(self.base_url, self.language_versions)
+        self.execution_cache = execution_cache
+        # Identical runs arriving while one is in flight share its result
+        self.inflight = execution_flights
+
+        # Limits for multi-testcase runs
+        self.batch_max_cases = int(os.getenv('BATCH_MAX_CASES', 100))
+        self.batch_max_parallel = int(os.getenv('BATCH_MAX_PARALLEL', 8))
+
     def _get_language_specific_imports(self, language: str) -> str:
         """Get language-specific import statements and boilerplate."""
         imports = {
@@ -124,89 +138,71 @@ int main() {{
         return code
 
     async def compile_and_execute(self, request: CompileRequest) -> CompileResponse:
-        """Compile and execute code using the Piston API."""
+        """Compile and execute code using the configured execution backend."""
+        stages = metrics.compile_stage_seconds
         try:
+            started = time.perf_counter()
             language = request.language.lower()
             if language not in self.language_versions:
+                stages.labels("validation", "other").observe(time.perf_counter() - started)
                 return CompileResponse(
                     success=False,
                     error=f"Language {request.language} is not supported",
                     output="",
                     language=request.language
                 )
+            stages.labels("validation", language).observe(time.perf_counter() - started)
 
             # Prepare code with proper input handling
-            prepared_code = self._prepare_code_with_input(
-                request.source_code,
-                language,
-                request.stdin
-            )
-
-            # Create submission for Piston API
-            submission_data = {
-                "language": self.language_versions[language],
-                "version": "*",
-                "files": [{
-                    "content": prepared_code
-                }],
-                "stdin": request.stdin,
-                "args": []
-            }
-
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/execute",
-                    json=submission_data,
-                    headers=self.headers,
-                    timeout=30.0
+            with stages.labels("prepare", language).time():
+                prepared_code = self._prepare_code_with_input(
+                    request.source_code,
+                    language,
+                    request.stdin
                 )
-                
-                if response.status_code != 200:
-                    return CompileResponse(
-                        success=False,
-                        error=f"API Error: {response.text}",
-                        output="",
-                        language=request.language
-                    )
 
-                result = response.json()
-                
-                # Check for runtime output
-                if result.get("ran", False):
-                    output = result.get("output", "")
-                    if output:
-                        return CompileResponse(
-                            success=True,
-                            error="",
-                            output=output.strip(),
-                            language=request.language
+            version = "*"
+            cache_key = None
+            if request.cache:
+                with stages.labels("cache_lookup", language).time():
+                    version = await self.backend.resolve_version(language)
+                    cached = None
+                    if version != "*":
+                        cache_key = self.execution_cache.make_key(
+                            prepared_code, request.stdin, language, f"{self.backend.name}:{version}"
                         )
-                
-                # Check for compilation error
-                if result.get("compile_error"):
-                    return CompileResponse(
-                        success=False,
-                        error=f"Compilation Error: {result['compile_error']}",
-                        output="",
-                        language=request.language
+                        cached = self.execution_cache.get(cache_key)
+                if cached is not None:
+                    return CompileResponse(**cached, cached=True)
+
+            with stages.labels("upstream", language).time():
+                if self.execution_cache.is_nondeterministic(request.source_code, language):
+                    result = await self.backend.execute(language, prepared_code, request.stdin, version)
+                else:
+                    flight_key = self.execution_cache.make_key(
+                        prepared_code, request.stdin, language, f"{self.backend.name}:{version}"
                     )
-                
-                # Check for runtime error
-                if result.get("run_error"):
-                    return CompileResponse(
-                        success=False,
-                        error=f"Runtime Error: {result['run_error']}",
-                        output="",
-                        language=request.language
+                    result = await self.inflight.do(
+                        flight_key,
+                        lambda: self.backend.execute(language, prepared_code, request.stdin, version)
                     )
 
-                return CompileResponse(
-                    success=True,
-                    error="",
-                    output=result.get("output", "").strip(),
-                    language=request.language
-                )
+            with stages.labels("postprocess", language).time():
+                compile_response = self._build_response(result, request.language)
+
+                # Successful runs and compile errors are deterministic for a given
+                # program; runtime errors may be timeouts or resource limits.
+                if cache_key and (compile_response.success or result.compile_failed):
+                    self.execution_cache.set(
+                        cache_key,
+                        compile_response.model_dump(exclude={"cached"}),
+                        self.execution_cache.ttl_for(request.source_code, language)
+                    )
 
+            return compile_response
+
+        except UpstreamOverloaded:
+            raise
         except Exception as e:
             return CompileResponse(
                 success=False,
@@ -215,6 +211,122 @@ int main() {{
                 language=request.language
             )
 
+    async def execute_batch(self, request: BatchCompileRequest) -> BatchCompileResponse:
+        """Compile a program once and run it against every test case."""
+        started = time.perf_counter()
+        language = request.language.lower()
+        if language not in self.language_versions:
+            return BatchCompileResponse(success=False, error=f"Language {request.language} is not supported")
+        if not request.cases:
+            return BatchCompileResponse(success=False, error="At least one test case is required")
+        if len(request.cases) > self.batch_max_cases:
+            return BatchCompileResponse(
+                success=False,
+                error=f"Too many test cases ({len(request.cases)}), the limit is {self.batch_max_cases}"
+            )
+
+        try:
+            prepared_code = self._prepare_code_with_input(request.source_code, language)
+            parallelism = min(request.max_parallel or self.batch_max_parallel, self.batch_max_parallel)
+            with request_priority(BATCH):
+                results = await self.backend.execute_many(
+                    language,
+                    prepared_code,
+                    [case.stdin for case in request.cases],
+                    parallelism=parallelism
+                )
+        except UpstreamOverloaded:
+            raise
+        except Exception as e:
+            return BatchCompileResponse(success=False, error=str(e))
+
+        case_results = []
+        for index, (case, result) in enumerate(zip(request.cases, results)):
+            response = self._build_response(result, request.language)
+            passed = None
+            if case.expected_output is not None:
+                passed = response.success and (
+                    self._normalize_output(response.output) == self._normalize_output(case.expected_output)
+                )
+            case_results.append(TestCaseResult(
+                index=index,
+                success=response.success,
+                output=response.output,
+                error=response.error,
+                exit_code=result.exit_code,
+                run_time_ms=response.run_time_ms,
+                passed=passed
+            ))
+
+        first = results[0]
+        if first.compile_failed:
+            return BatchCompileResponse(
+                success=False,
+                error=f"Compilation Error: {first.compile_output}",
+                compile_time_ms=self._to_ms(first.compile_time),
+                total_time_ms=self._to_ms(time.perf_counter() - started)
+            )
+
+        return BatchCompileResponse(
+            success=True,
+            results=case_results,
+            compile_time_ms=self._to_ms(first.compile_time),
+            compile_cached=first.compile_cached,
+            total_time_ms=self._to_ms(time.perf_counter() - started),
+            passed=sum(1 for case in case_results if case.passed is True),
+            failed=sum(1 for case in case_results if case.passed is False)
+        )
+
+    @staticmethod
+    def _normalize_output(output: str) -> str:
+        """Compare outputs ignoring trailing whitespace and line ending style."""
+        lines = (output or "").replace('\r\n', '\n').split('\n')
+        return '\n'.join(line.rstrip() for line in lines).strip()
+
+    def _build_response(self, result: ExecutionResult, language: str) -> CompileResponse:
+        """Turn a backend ExecutionResult into a CompileResponse."""
+        timings = {
+            "compile_time_ms": self._to_ms(result.compile_time),
+            "run_time_ms": self._to_ms(result.run_time),
+            "compile_cached": result.compile_cached
+        }
+
+        # Check for compilation error
+        if result.compile_failed:
+            return CompileResponse(
+                success=False,
+                error=f"Compilation Error: {result.compile_output}",
+                output="",
+                language=language,
+                **timings
+            )
+
+        # Check for runtime error
+        if result.run_failed:
+            if result.timed_out or result.signal == "SIGXCPU":
+                reason = "Time limit exceeded"
+            else:
+                reason = result.stderr or result.signal or f"exited with code {result.exit_code}"
+            return CompileResponse(
+                success=False,
+                error=f"Runtime Error: {reason}",
+                output=result.stdout.strip(),
+                language=language,
+                **timings
+            )
+
+        return CompileResponse(
+            success=True,
+            error="",
+            output=result.output.strip(),
+            language=language,
+            **timings
+        )
+
+    @staticmethod
+    def _to_ms(seconds):
+        return round(seconds * 1000, 3) if seconds is not None else None
+
     def get_supported_languages(self) -> list:
         """Get list of supported programming languages"""
         return list(self.language_versions.keys())
@@ -0,0 +1,82 @@
+import os
+from typing import Optional
+
+from codeverse.services.analysis_service import AnalysisService
+from codeverse.services.compiler_service import CompilerService
+from codeverse.services.migration_service import MANIFEST_NAME, MigrationService, migration_root
+from codeverse.services.session_service import ParseSessionService
+from codeverse.services.translation_service import TranslationService
+
+
+class ServiceContainer:
+    """
+    Shared, lazily built services for the whole app.
+
+    Nothing is constructed at import time: each service is built on first use
+    and the same instance is handed to the root endpoints and the /api router
+    (through the FastAPI dependencies in codeverse.api.dependencies), so a
+    worker holds one copy of each and starts without an LLM API key until a
+    translation is actually requested. Set PRELOAD_SERVICES=true to build
+    everything during startup instead.
+    """
+
+    def __init__(self):
+        self._translation_service: Optional[TranslationService] = None
+        self._compiler_service: Optional[CompilerService] = None
+        self._migration_service: Optional[MigrationService] = None
+        self._analysis_service: Optional[AnalysisService] = None
+        self._parse_session_service: Optional[ParseSessionService] = None
+
+    @property
+    def translation_service(self) -> TranslationService:
+        if self._translation_service is None:
+            self._translation_service = TranslationService()
+        return self._translation_service
+
+    @property
+    def compiler_service(self) -> CompilerService:
+        if self._compiler_service is None:
+            self._compiler_service = CompilerService()
+        return self._compiler_service
+
+    @property
+    def migration_service(self) -> MigrationService:
+        if self._migration_service is None:
+            self._migration_service = MigrationService(self.translation_service)
+        return self._migration_service
+
+    @property
+    def analysis_service(self) -> AnalysisService:
+        if self._analysis_service is None:
+            self._analysis_service = AnalysisService()
+        return self._analysis_service
+
+    @property
+    def parse_session_service(self) -> ParseSessionService:
+        if self._parse_session_service is None:
+            self._parse_session_service = ParseSessionService()
+        return self._parse_session_service
+
+    async def startup(self):
+        """Resume interrupted migrations; builds services only if there are any (or when preloading)."""
+        if os.getenv('PRELOAD_SERVICES', 'false').lower() == 'true':
+            self.preload()
+        root = migration_root()
+        if self._migration_service is not None or (root.is_dir() and any(root.glob(f'*/{MANIFEST_NAME}'))):
+            await self.migration_service.resume()
+
+    async def shutdown(self):
+        if self._migration_service is not None:
+            await self._migration_service.shutdown()
+
+    def preload(self):
+        """Build every service and warm lazily imported modules."""
+        self.compiler_service
+        self.migration_service
+        self.analysis_service
+        self.parse_session_service
+        # Otherwise imported by the first Python analysis
+        import libcst  # noqa: F401
+
+
+services = ServiceContainer()
@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+from codeverse.services import metrics
+from codeverse.services.http_clients import _env_float, _env_int
+from codeverse.services.scheduler import UpstreamOverloaded
+
+logger = logging.getLogger(__name__)
+
+
+class CPUTaskTimeout(Exception):
+    """Raised when a task runs past its timeout; the worker running it is killed."""
+
+
+class CPUWorkerPool:
+    """
+    Runs CPU-bound functions (parsing, analysis, regex rewriting) in worker processes.
+
+    The event loop only awaits a future, so a long analysis does not hold up
+    other requests on the worker. At most `max_workers` tasks run at once and
+    up to `max_queue` more wait their turn; beyond that tasks are shed with
+    UpstreamOverloaded (503 + Retry-After). The timeout covers execution only,
+    not time spent queued.
+
+    ProcessPoolExecutor cannot cancel a running task, so a timeout replaces the
+    whole pool and kills its processes; other tasks that were running on it
+    are retried once on the new pool. Workers are also replaced after
+    `max_tasks_per_worker` tasks to bound memory held by parser caches and
+    fragmentation. The processes are started on first use, not at import.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int, task_timeout: float,
+                 max_tasks_per_worker: int):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max_queue
+        self.task_timeout = task_timeout
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.completed = 0
+        self.timeouts = 0
+        self.restarts = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots = asyncio.Semaphore(self.max_workers)
+        self._pending = 0
+        self._running = 0
+        self._average_seconds = 0.5
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                # Forking a process with a running event loop and threads is unsafe
+                mp_context=multiprocessing.get_context("spawn"),
+                max_tasks_per_child=self.max_tasks_per_worker or None
+            )
+        return self._executor
+
+    def _recycle(self, executor: ProcessPoolExecutor):
+        """Throw away `executor` (if still current), killing its processes."""
+        if executor is self._executor:
+            self._executor = None
+            self.restarts += 1
+        # There is no public API to stop a running task
+        for process in list((getattr(executor, "_processes", None) or {}).values()):
+            if process.is_alive():
+                process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def retry_after(self) -> float:
+        queued = max(0, self._pending - self._running)
+        return (queued / self.max_workers + 1) * self._average_seconds
+
+    async def run(self, task: str, fn: Callable, *args, timeout: Optional[float] = None) -> Any:
+        """Run `fn(*args)` in a worker process. `task` names it in metrics."""
+        if self._pending >= self.max_workers + self.max_queue:
+            metrics.cpu_tasks.labels(self.name, task, "rejected").inc()
+            raise UpstreamOverloaded(self.name, self.retry_after())
+
+        self._pending += 1
+        try:
+            async with self._slots:
+                self._running += 1
+                try:
+                    return await self._execute(task, fn, args, timeout or self.task_timeout)
+                finally:
+                    self._running -= 1
+        finally:
+            self._pending -= 1
+
+    async def _execute(self, task: str, fn: Callable, args: tuple, timeout: float, retry: bool = True) -> Any:
+        executor = self._get_executor()
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(executor.submit(fn, *args)), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            metrics.cpu_tasks.labels(self.name, task, "timeout").inc()
+            logger.warning("%s task %s timed out after %.1fs, restarting the pool", self.name, task, timeout)
+            self._recycle(executor)
+            raise CPUTaskTimeout(f"{task} did not finish within {timeout:g}s")
+        except BrokenProcessPool:
+            # Another task's timeout (or a crashed worker) took the pool down
+            self._recycle(executor)
+            if retry:
+                return await self._execute(task, fn, args, timeout, retry=False)
+            metrics.cpu_tasks.labels(self.name, task, "error").inc()
+            raise
+        except Exception:
+            metrics.cpu_tasks.labels(self.name, task, "error").inc()
+            raise
+
+        elapsed = time.perf_counter() - started
+        self.completed += 1
+        self._average_seconds = 0.8 * self._average_seconds + 0.2 * elapsed
+        metrics.cpu_tasks.labels(self.name, task, "ok").inc()
+        metrics.cpu_task_seconds.labels(self.name, task).observe(elapsed)
+        return result
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict:
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "running": self._running,
+            "queued": max(0, self._pending - self._running),
+            "completed": self.completed,
+            "timeouts": self.timeouts,
+            "restarts": self.restarts,
+            "started": self._executor is not None
+        }
+
+
+cpu_pool = CPUWorkerPool(
+    "cpu",
+    max_workers=_env_int("CPU_POOL_WORKERS", min(4, os.cpu_count() or 1)),
+    max_queue=_env_int("CPU_POOL_MAX_QUEUE", 32),
+    task_timeout=_env_float("CPU_POOL_TASK_TIMEOUT", 30.0),
+    max_tasks_per_worker=_env_int("CPU_POOL_MAX_TASKS_PER_WORKER", 200)
+)
+
+
+def _collect_cpu_pool_metrics():
+    stats = cpu_pool.stats()
+    metrics.cpu_pool_running.labels(cpu_pool.name).set(stats["running"])
+    metrics.cpu_pool_queued.labels(cpu_pool.name).set(stats["queued"])
+
+
+metrics.registry.on_collect(_collect_cpu_pool_metrics)
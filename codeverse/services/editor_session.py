@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import os
+import uuid
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from codeverse.models.schemas import AnalyzeRequest, CodeTranslationRequest, CompileRequest, EditorJobMessage
+from codeverse.services import metrics
+from codeverse.services.scheduler import UpstreamOverloaded
+
+logger = logging.getLogger(__name__)
+
+
+class EditorJobError(Exception):
+    """A job message that cannot be run (bad request body, unsupported language, ...)."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        self.retry_after = retry_after
+        super().__init__(message)
+
+
+class EditorSession:
+    """
+    Compile, translate and analyze jobs multiplexed over one editor WebSocket.
+
+    Jobs are keyed by (document, kind). Each waits EDITOR_WS_DEBOUNCE_MS
+    before it starts, and a newer job for the same key replaces it: a job
+    still waiting is dropped, one already running is cancelled, which stops
+    its LLM call or execution unless an identical request is waiting on the
+    same call. Every frame sent back carries the kind, document and version
+    of its job, so the client can ignore anything older than its latest
+    version.
+
+    Frames: {"type": "result", "result": ...}, {"type": "error", "error": ...}
+    and {"type": "cancelled"}; translations also stream {"type": "token",
+    "content": ...} frames before their result. Large documents are
+    translated incrementally instead (see TranslationService._translate_document),
+    so a re-translation after an edit only redoes the chunks that changed.
+    """
+
+    KINDS = ('compile', 'translate', 'analyze')
+
+    def __init__(self, send: Callable[[Dict], Awaitable[None]], services):
+        self.id = uuid.uuid4().hex
+        self.services = services
+        self.debounce = float(os.getenv('EDITOR_WS_DEBOUNCE_MS', 300)) / 1000
+        self.max_debounce = float(os.getenv('EDITOR_WS_MAX_DEBOUNCE_MS', 5000)) / 1000
+        self._send_frame = send
+        # Frames from concurrent jobs must not interleave on the socket
+        self._send_lock = asyncio.Lock()
+        # (document, kind) -> the job's task and the tags of its frames
+        self.jobs: Dict[Tuple[str, str], Tuple[asyncio.Task, Dict]] = {}
+
+    async def submit(self, message: EditorJobMessage):
+        if message.type == 'cancel':
+            for key, (_, frame) in list(self.jobs.items()):
+                if key[0] == message.document:
+                    self._cancel(key, "cancelled")
+                    await self.send({"type": "cancelled", **frame})
+            return
+
+        frame = {"kind": message.type, "document": message.document, "version": message.version}
+        try:
+            job = self._job(message, frame)
+        except EditorJobError as e:
+            metrics.editor_jobs.labels(message.type if message.type in self.KINDS else "other", "invalid").inc()
+            await self.send({"type": "error", **frame, "error": str(e)})
+            return
+
+        key = (message.document, message.type)
+        if key in self.jobs:
+            self._cancel(key, "superseded")
+        delay = self.debounce if message.debounce_ms is None else message.debounce_ms / 1000
+        task = asyncio.create_task(self._run(key, job, frame, min(max(delay, 0), self.max_debounce)))
+        self.jobs[key] = (task, frame)
+
+    def close(self):
+        """Cancel every job; the connection is gone."""
+        for key in list(self.jobs):
+            self._cancel(key, "cancelled")
+
+    def _cancel(self, key: Tuple[str, str], outcome: str):
+        task, _ = self.jobs.pop(key, (None, None))
+        if task is not None and not task.done():
+            task.cancel()
+            metrics.editor_jobs.labels(key[1], outcome).inc()
+
+    async def _run(self, key: Tuple[str, str], job: Callable[[], Awaitable[None]], frame: Dict, delay: float):
+        try:
+            if delay:
+                await asyncio.sleep(delay)
+            await job()
+            metrics.editor_jobs.labels(frame["kind"], "completed").inc()
+        except asyncio.CancelledError:
+            raise
+        except EditorJobError as e:
+            metrics.editor_jobs.labels(frame["kind"], "error").inc()
+            retry = {} if e.retry_after is None else {"retry_after": e.retry_after}
+            await self.send({"type": "error", **frame, "error": str(e), **retry})
+        except UpstreamOverloaded as e:
+            metrics.editor_jobs.labels(frame["kind"], "error").inc()
+            await self.send({"type": "error", **frame, "error": str(e), "retry_after": e.retry_after})
+        except Exception as e:
+            logger.exception("Editor %s job failed", frame["kind"])
+            metrics.editor_jobs.labels(frame["kind"], "error").inc()
+            await self.send({"type": "error", **frame, "error": str(e)})
+        finally:
+            if self.jobs.get(key, (None,))[0] is asyncio.current_task():
+                del self.jobs[key]
+
+    async def send(self, frame: Dict):
+        async with self._send_lock:
+            try:
+                await self._send_frame(frame)
+            except Exception:
+                # The client went away; the receive loop notices and closes the session
+                logger.debug("Could not send an editor frame", exc_info=True)
+
+    def _job(self, message: EditorJobMessage, frame: Dict) -> Callable[[], Awaitable[None]]:
+        """Validate the message now and return the coroutine function that runs it."""
+        if message.type not in self.KINDS:
+            raise EditorJobError(f"Unknown message type '{message.type}'. Supported types: {[*self.KINDS, 'cancel']}")
+        try:
+            if message.type == 'compile':
+                return self._compile_job(CompileRequest(**message.request), frame)
+            if message.type == 'translate':
+                return self._translate_job(CodeTranslationRequest(**message.request), message, frame)
+            return self._analyze_job(AnalyzeRequest(**message.request), frame)
+        except EditorJobError:
+            raise
+        except Exception as e:
+            # Validation errors, or a service that cannot start (no API key)
+            raise EditorJobError(str(e))
+
+    def _compile_job(self, request: CompileRequest, frame: Dict) -> Callable[[], Awaitable[None]]:
+        if not request.source_code.strip():
+            raise EditorJobError("Source code cannot be empty")
+        compiler_service = self.services.compiler_service
+
+        async def run():
+            result = await compiler_service.compile_and_execute(request)
+            await self.send({"type": "result", **frame, "result": result.model_dump()})
+        return run
+
+    def _translate_job(self, request: CodeTranslationRequest, message: EditorJobMessage,
+                       frame: Dict) -> Callable[[], Awaitable[None]]:
+        translation_service = self.services.translation_service
+        error = translation_service.validate_request(request)
+        if error:
+            raise EditorJobError(error)
+        request.document_id = request.document_id or f"{self.id}:{message.document}"
+
+        async def run():
+            async for event in translation_service.translate_stream(request):
+                kind = event.pop("type")
+                if kind == "token":
+                    await self.send({"type": "token", **frame, "content": event["content"]})
+                elif kind == "error":
+                    raise EditorJobError(event["error"], event.get("retry_after"))
+                else:
+                    await self.send({"type": "result", **frame, "result": event})
+        return run
+
+    def _analyze_job(self, request: AnalyzeRequest, frame: Dict) -> Callable[[], Awaitable[None]]:
+        analysis_service = self.services.analysis_service
+        error = analysis_service.validate_request(request.source_code)
+        if error:
+            raise EditorJobError(error)
+
+        async def run():
+            result = await analysis_service.analyze(request)
+            await self.send({"type": "result", **frame, "result": result.model_dump()})
+        return run
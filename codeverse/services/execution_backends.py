@@ -0,0 +1,593 @@
+import asyncio
+import logging
+import os
+import re
+import resource
+import shutil
+import signal
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional
+
+from codeverse.services.artifact_cache import ArtifactCache
+from codeverse.services.http_clients import http_clients
+from codeverse.services.resilience import upstreams
+from codeverse.services.scheduler import UpstreamOverloaded, retry_after_seconds
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutionError(Exception):
+    """Raised when a backend cannot run a program at all (as opposed to the program failing)."""
+
+
+@dataclass
+class ExecutionResult:
+    language: str
+    version: str
+    stdout: str = ""
+    stderr: str = ""
+    exit_code: Optional[int] = None
+    signal: Optional[str] = None
+    compile_output: str = ""
+    compile_exit_code: Optional[int] = None
+    timed_out: bool = False
+    # Seconds spent in each stage; compile_cached means a cached build was reused
+    compile_time: Optional[float] = None
+    run_time: Optional[float] = None
+    compile_cached: bool = False
+
+    @property
+    def output(self) -> str:
+        return self.stdout + self.stderr
+
+    @property
+    def compile_failed(self) -> bool:
+        return self.compile_exit_code is not None and self.compile_exit_code != 0
+
+    @property
+    def run_failed(self) -> bool:
+        return self.timed_out or bool(self.signal) or (self.exit_code or 0) != 0
+
+
+class ExecutionBackend(ABC):
+    """Runs a prepared program for one of the languages in CompilerService.language_versions."""
+
+    name = "base"
+
+    @abstractmethod
+    async def resolve_version(self, language: str) -> str:
+        """Concrete runtime/compiler version for a language, or "*" if unknown."""
+
+    @abstractmethod
+    async def execute(self, language: str, code: str, stdin: str = "", version: str = "*") -> ExecutionResult:
+        """Compile (if needed) and run a program."""
+
+    async def execute_many(
+        self,
+        language: str,
+        code: str,
+        stdins: List[str],
+        version: str = "*",
+        parallelism: int = 4
+    ) -> List[ExecutionResult]:
+        """
+        Run one program against several stdin inputs, at most `parallelism` at once.
+
+        Backends that can compile once and reuse the build override this; the
+        default simply fans out independent executions.
+        """
+        limit = asyncio.Semaphore(max(1, parallelism))
+
+        async def run_case(stdin: str) -> ExecutionResult:
+            async with limit:
+                return await self.execute(language, code, stdin, version)
+
+        return list(await asyncio.gather(*(run_case(stdin) for stdin in stdins)))
+
+    async def aclose(self):
+        pass
+
+
+class PistonBackend(ExecutionBackend):
+    """Executes code on a Piston server (the public emkc.org instance by default)."""
+
+    name = "piston"
+
+    def __init__(self, base_url: str, language_versions: Dict[str, str]):
+        self.base_url = base_url
+        self.language_versions = language_versions
+        self.headers = {
+            'Content-Type': 'application/json'
+        }
+        self.runtimes_ttl = 3600.0
+        self._runtime_versions: Dict[str, str] = {}
+        self._runtimes_fetched_at: Optional[float] = None
+        self._runtimes_lock = asyncio.Lock()
+        self.upstream = upstreams["piston"]
+        self.scheduler = self.upstream.scheduler
+
+    @staticmethod
+    def _version_key(version: str) -> tuple:
+        return tuple(int(part) if part.isdigit() else 0 for part in version.split('.'))
+
+    def _runtimes_stale(self) -> bool:
+        return (
+            self._runtimes_fetched_at is None
+            or time.monotonic() - self._runtimes_fetched_at > self.runtimes_ttl
+        )
+
+    async def resolve_version(self, language: str) -> str:
+        if self._runtimes_stale():
+            async with self._runtimes_lock:
+                if self._runtimes_stale():
+                    await self._fetch_runtimes()
+
+        return self._runtime_versions.get(language, "*")
+
+    async def _fetch_runtimes(self):
+        try:
+            client = http_clients.get("piston")
+            response = await self.upstream.request(
+                lambda: client.get(f"{self.base_url}/runtimes", headers=self.headers)
+            )
+            if response.status_code != 200:
+                return
+            runtimes = response.json()
+        except Exception as e:
+            logger.warning("Could not fetch Piston runtimes: %s", e)
+            return
+
+        versions = {}
+        for language, piston_name in self.language_versions.items():
+            candidates = [
+                runtime['version'] for runtime in runtimes
+                if runtime.get('language') == piston_name or piston_name in runtime.get('aliases', [])
+            ]
+            if candidates:
+                versions[language] = max(candidates, key=self._version_key)
+
+        self._runtime_versions = versions
+        self._runtimes_fetched_at = time.monotonic()
+
+    async def execute(self, language: str, code: str, stdin: str = "", version: str = "*") -> ExecutionResult:
+        submission_data = {
+            "language": self.language_versions[language],
+            "version": version,
+            "files": [{
+                "content": code
+            }],
+            "stdin": stdin,
+            "args": []
+        }
+
+        client = http_clients.get("piston")
+        # Runs are sandboxed and side-effect free, so they are safe to retry and hedge
+        response = await self.upstream.request(
+            lambda: client.post(f"{self.base_url}/execute", json=submission_data, headers=self.headers)
+        )
+
+        if response.status_code == 429:
+            retry_after = retry_after_seconds(response.headers)
+            self.scheduler.backoff(retry_after)
+            raise UpstreamOverloaded(self.scheduler.name, retry_after, "rate limited upstream")
+        if response.status_code != 200:
+            raise ExecutionError(f"API Error: {response.text}")
+
+        result = response.json()
+        run_stage = result.get("run") or {}
+        compile_stage = result.get("compile") or {}
+
+        def wall_seconds(stage):
+            # Only newer Piston releases report per-stage wall_time (in ms)
+            wall_time = stage.get("wall_time")
+            return wall_time / 1000.0 if wall_time is not None else None
+
+        return ExecutionResult(
+            language=language,
+            version=result.get("version", version),
+            stdout=run_stage.get("stdout", ""),
+            stderr=run_stage.get("stderr", ""),
+            exit_code=run_stage.get("code"),
+            signal=run_stage.get("signal"),
+            compile_output=compile_stage.get("output", ""),
+            compile_exit_code=compile_stage.get("code"),
+            compile_time=wall_seconds(compile_stage),
+            run_time=wall_seconds(run_stage)
+        )
+
+
+def _java_main_class(code: str) -> str:
+    match = re.search(r'public\s+(?:final\s+)?class\s+(\w+)', code)
+    return match.group(1) if match else "Main"
+
+
+# How to build and run each language locally. `{src}` is the source file name and
+# `{main}` the Java main class. `artifacts` are the build outputs kept in the
+# artifact cache. `address_space` toggles RLIMIT_AS; runtimes that reserve large
+# virtual mappings (JVM, V8, Go) are limited with RLIMIT_DATA instead.
+LOCAL_TOOLCHAINS = {
+    'python': {
+        'source': 'main.py',
+        'run': ['python3', '{src}'],
+        'version': ['python3', '--version'],
+    },
+    'javascript': {
+        'source': 'main.js',
+        'run': ['node', '{src}'],
+        'version': ['node', '--version'],
+        'address_space': False,
+    },
+    'java': {
+        'source': '{main}.java',
+        'compile': ['javac', '-encoding', 'UTF-8', '{src}'],
+        'artifacts': ['*.class'],
+        'run': ['java', '-Xss64m', '-XX:+UseSerialGC', '-cp', '.', '{main}'],
+        'version': ['javac', '-version'],
+        'address_space': False,
+    },
+    'cpp': {
+        'source': 'main.cpp',
+        'compile': ['g++', '-O2', '-std=c++17', '-o', 'main', '{src}'],
+        'artifacts': ['main'],
+        'run': ['./main'],
+        'version': ['g++', '-dumpfullversion'],
+    },
+    'c': {
+        'source': 'main.c',
+        'compile': ['gcc', '-O2', '-std=c11', '-o', 'main', '{src}', '-lm'],
+        'artifacts': ['main'],
+        'run': ['./main'],
+        'version': ['gcc', '-dumpfullversion'],
+    },
+    'ruby': {
+        'source': 'main.rb',
+        'run': ['ruby', '{src}'],
+        'version': ['ruby', '--version'],
+    },
+    'go': {
+        'source': 'main.go',
+        'compile': ['go', 'build', '-o', 'main', '{src}'],
+        'artifacts': ['main'],
+        'run': ['./main'],
+        'version': ['go', 'version'],
+        'address_space': False,
+    },
+    'rust': {
+        'source': 'main.rs',
+        'compile': ['rustc', '-O', '-o', 'main', '{src}'],
+        'artifacts': ['main'],
+        'run': ['./main'],
+        'version': ['rustc', '--version'],
+    },
+    'php': {
+        'source': 'main.php',
+        'run': ['php', '{src}'],
+        'version': ['php', '--version'],
+    },
+}
+
+
+@dataclass
+class ResourceLimits:
+    cpu_seconds: int = 5
+    memory_bytes: int = 512 * 1024 * 1024
+    file_size_bytes: int = 16 * 1024 * 1024
+    max_processes: int = 64
+    wall_seconds: float = 10.0
+    output_bytes: int = 64 * 1024
+
+    def apply(self, address_space: bool = True):
+        """Set rlimits in the child process (used as preexec_fn)."""
+        resource.setrlimit(resource.RLIMIT_CPU, (self.cpu_seconds, self.cpu_seconds + 1))
+        memory_limit = resource.RLIMIT_AS if address_space else resource.RLIMIT_DATA
+        resource.setrlimit(memory_limit, (self.memory_bytes, self.memory_bytes))
+        resource.setrlimit(resource.RLIMIT_FSIZE, (self.file_size_bytes, self.file_size_bytes))
+        resource.setrlimit(resource.RLIMIT_NPROC, (self.max_processes, self.max_processes))
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+
+@dataclass
+class ProcessResult:
+    stdout: str
+    stderr: str
+    exit_code: Optional[int]
+    signal: Optional[str]
+    timed_out: bool = False
+
+
+class LocalBackend(ExecutionBackend):
+    """
+    Executes code in local subprocesses.
+
+    Every run gets its own scratch directory and rlimits (CPU, memory, file size,
+    process count), and at most `workers` programs run at once. RLIMIT_NPROC counts
+    every process of the user, so run the server as a dedicated user.
+    """
+
+    name = "local"
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        run_limits: Optional[ResourceLimits] = None,
+        compile_limits: Optional[ResourceLimits] = None,
+        scratch_root: Optional[str] = None
+    ):
+        self.workers = workers or int(os.getenv('LOCAL_EXECUTION_WORKERS', 0)) or os.cpu_count() or 1
+        self.run_limits = run_limits or ResourceLimits(
+            cpu_seconds=int(os.getenv('LOCAL_EXECUTION_CPU_SECONDS', 5)),
+            memory_bytes=int(os.getenv('LOCAL_EXECUTION_MEMORY_MB', 512)) * 1024 * 1024,
+            max_processes=int(os.getenv('LOCAL_EXECUTION_MAX_PROCESSES', 64)),
+            wall_seconds=float(os.getenv('LOCAL_EXECUTION_TIMEOUT', 10.0))
+        )
+        # Compilers (rustc, go, javac) need far more headroom than the programs they build
+        self.compile_limits = compile_limits or ResourceLimits(
+            cpu_seconds=30,
+            memory_bytes=2048 * 1024 * 1024,
+            file_size_bytes=256 * 1024 * 1024,
+            max_processes=256,
+            wall_seconds=60.0,
+            output_bytes=64 * 1024
+        )
+        self.scratch_root = scratch_root or os.getenv('LOCAL_EXECUTION_ROOT') or tempfile.gettempdir()
+        self.artifact_cache = ArtifactCache(
+            root=os.getenv('ARTIFACT_CACHE_DIR') or os.path.join(self.scratch_root, 'codeverse-artifacts'),
+            max_bytes=int(os.getenv('ARTIFACT_CACHE_MAX_MB', 1024)) * 1024 * 1024
+        )
+        self.go_cache = os.getenv('LOCAL_EXECUTION_GOCACHE') or os.path.join(self.scratch_root, 'codeverse-gocache')
+        self._slots = asyncio.Semaphore(self.workers)
+        self._versions: Dict[str, str] = {}
+
+    def _toolchain(self, language: str) -> Dict:
+        toolchain = LOCAL_TOOLCHAINS.get(language)
+        if toolchain is None:
+            raise ExecutionError(f"Language {language} is not supported by the local backend")
+        return toolchain
+
+    async def resolve_version(self, language: str) -> str:
+        if language in self._versions:
+            return self._versions[language]
+
+        toolchain = self._toolchain(language)
+        version = "*"
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *toolchain['version'],
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT
+            )
+            output, _ = await asyncio.wait_for(process.communicate(), timeout=10)
+            match = re.search(r'\d+(?:\.\d+)+', output.decode('utf-8', 'replace'))
+            if process.returncode == 0 and match:
+                version = match.group(0)
+        except (OSError, asyncio.TimeoutError) as e:
+            logger.warning("Could not resolve local %s version: %s", language, e)
+
+        self._versions[language] = version
+        return version
+
+    def _environment(self, workdir: str) -> Dict[str, str]:
+        home = os.path.expanduser('~')
+        env = {
+            'PATH': os.environ.get('PATH', '/usr/local/bin:/usr/bin:/bin'),
+            'HOME': workdir,
+            'TMPDIR': workdir,
+            'LANG': 'C.UTF-8',
+            # Shared so the Go standard library is not rebuilt on every run
+            'GOCACHE': self.go_cache,
+            'GOPATH': os.path.join(workdir, '.gopath'),
+            # rustup shims locate their toolchains relative to the real home directory
+            'RUSTUP_HOME': os.environ.get('RUSTUP_HOME', os.path.join(home, '.rustup')),
+            'CARGO_HOME': os.environ.get('CARGO_HOME', os.path.join(home, '.cargo')),
+        }
+        for name in ('JAVA_HOME', 'GOROOT'):
+            if name in os.environ:
+                env[name] = os.environ[name]
+        return env
+
+    @staticmethod
+    def _format_command(command: List[str], source: str, main_class: str) -> List[str]:
+        return [part.format(src=source, main=main_class) for part in command]
+
+    async def _run_process(
+        self,
+        command: List[str],
+        workdir: str,
+        stdin: str,
+        limits: ResourceLimits,
+        address_space: bool = True
+    ) -> ProcessResult:
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *command,
+                cwd=workdir,
+                env=self._environment(workdir),
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                preexec_fn=lambda: limits.apply(address_space),
+                start_new_session=True
+            )
+        except FileNotFoundError:
+            raise ExecutionError(f"'{command[0]}' is not installed on this host")
+
+        async def feed_stdin():
+            try:
+                if stdin:
+                    process.stdin.write(stdin.encode('utf-8'))
+                    await process.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                process.stdin.close()
+
+        async def read_capped(stream) -> bytes:
+            # Keep only the first `output_bytes`; kill runaway writers
+            data = bytearray()
+            while True:
+                chunk = await stream.read(65536)
+                if not chunk:
+                    break
+                data.extend(chunk)
+                if len(data) > limits.output_bytes:
+                    self._kill(process)
+                    break
+            return bytes(data[:limits.output_bytes])
+
+        timed_out = False
+        readers = asyncio.gather(feed_stdin(), read_capped(process.stdout), read_capped(process.stderr))
+        try:
+            _, stdout, stderr = await asyncio.wait_for(readers, timeout=limits.wall_seconds)
+            await process.wait()
+        except asyncio.TimeoutError:
+            timed_out = True
+            self._kill(process)
+            await process.wait()
+            stdout, stderr = b"", b""
+
+        exit_code = process.returncode
+        signal_name = None
+        if exit_code is not None and exit_code < 0:
+            signal_name = signal.Signals(-exit_code).name
+            exit_code = None
+
+        return ProcessResult(
+            stdout=stdout.decode('utf-8', 'replace'),
+            stderr=stderr.decode('utf-8', 'replace'),
+            exit_code=exit_code,
+            signal=signal_name,
+            timed_out=timed_out
+        )
+
+    @staticmethod
+    def _kill(process):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    async def _make_workdir(self) -> str:
+        return await asyncio.to_thread(tempfile.mkdtemp, prefix="codeverse-run-", dir=self.scratch_root)
+
+    async def _build(
+        self,
+        toolchain: Dict,
+        language: str,
+        code: str,
+        version: str,
+        workdir: str,
+        source: str,
+        main_class: str
+    ) -> ExecutionResult:
+        """Write the source into `workdir` and compile it (or restore a cached build)."""
+        with open(os.path.join(workdir, source), 'w', encoding='utf-8') as f:
+            f.write(code)
+
+        result = ExecutionResult(language=language, version=version)
+        if 'compile' not in toolchain:
+            return result
+
+        address_space = toolchain.get('address_space', True)
+        compile_command = self._format_command(toolchain['compile'], source, main_class)
+        artifact_key = self.artifact_cache.make_key(language, code, version, compile_command)
+        started = time.perf_counter()
+        if await self.artifact_cache.restore(artifact_key, workdir):
+            result.compile_cached = True
+            result.compile_exit_code = 0
+        else:
+            compiled = await self._run_process(
+                compile_command, workdir, "", self.compile_limits, address_space
+            )
+            result.compile_output = compiled.stdout + compiled.stderr
+            result.compile_exit_code = 1 if compiled.timed_out else (
+                compiled.exit_code if compiled.exit_code is not None else 1
+            )
+            # Only builds against a known compiler version are safe to reuse
+            if not result.compile_failed and version != "*":
+                await self.artifact_cache.store(artifact_key, workdir, toolchain['artifacts'])
+        result.compile_time = time.perf_counter() - started
+        return result
+
+    async def _run(
+        self,
+        toolchain: Dict,
+        build: ExecutionResult,
+        workdir: str,
+        stdin: str,
+        source: str,
+        main_class: str
+    ) -> ExecutionResult:
+        """Run a built program in `workdir`."""
+        started = time.perf_counter()
+        ran = await self._run_process(
+            self._format_command(toolchain['run'], source, main_class),
+            workdir, stdin, self.run_limits, toolchain.get('address_space', True)
+        )
+        return replace(
+            build,
+            stdout=ran.stdout,
+            stderr=ran.stderr,
+            exit_code=ran.exit_code,
+            signal=ran.signal,
+            timed_out=ran.timed_out,
+            run_time=time.perf_counter() - started
+        )
+
+    async def execute(self, language: str, code: str, stdin: str = "", version: str = "*") -> ExecutionResult:
+        results = await self.execute_many(language, code, [stdin], version)
+        return results[0]
+
+    async def execute_many(
+        self,
+        language: str,
+        code: str,
+        stdins: List[str],
+        version: str = "*",
+        parallelism: Optional[int] = None
+    ) -> List[ExecutionResult]:
+        """Compile once, then run every stdin case in its own copy of the build directory."""
+        toolchain = self._toolchain(language)
+        if version == "*":
+            version = await self.resolve_version(language)
+
+        main_class = _java_main_class(code) if language == 'java' else "Main"
+        source = toolchain['source'].format(main=main_class)
+
+        build_dir = await self._make_workdir()
+        try:
+            async with self._slots:
+                build = await self._build(toolchain, language, code, version, build_dir, source, main_class)
+                if build.compile_failed:
+                    return [replace(build) for _ in stdins]
+                # A single run can use the build directory directly
+                if len(stdins) == 1:
+                    return [await self._run(toolchain, build, build_dir, stdins[0], source, main_class)]
+
+            limit = asyncio.Semaphore(max(1, parallelism or self.workers))
+
+            async def run_case(stdin: str) -> ExecutionResult:
+                async with limit, self._slots:
+                    run_dir = await self._make_workdir()
+                    try:
+                        await asyncio.to_thread(shutil.copytree, build_dir, run_dir, dirs_exist_ok=True)
+                        return await self._run(toolchain, build, run_dir, stdin, source, main_class)
+                    finally:
+                        await asyncio.to_thread(shutil.rmtree, run_dir, True)
+
+            return list(await asyncio.gather(*(run_case(stdin) for stdin in stdins)))
+        finally:
+            await asyncio.to_thread(shutil.rmtree, build_dir, True)
+
+
+def create_execution_backend(base_url: str, language_versions: Dict[str, str],
+                             name: Optional[str] = None) -> ExecutionBackend:
+    """Create the execution backend selected by `name` or the EXECUTION_BACKEND env var."""
+    name = (name or os.getenv('EXECUTION_BACKEND') or 'piston').lower()
+    if name == 'piston':
+        return PistonBackend(base_url, language_versions)
+    if name == 'local':
+        return LocalBackend()
+    raise ValueError(f"Unknown execution backend '{name}'")
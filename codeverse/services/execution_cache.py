@@ -0,0 +1,89 @@
+import hashlib
+import json
+import os
+import re
+from typing import Dict, Optional
+
+from codeverse.services import metrics
+from codeverse.services.cache import LRUCache
+
+# Source-level markers of nondeterministic programs (randomness, clocks, entropy).
+# These are checked against the user's code, not the prepared program, because the
+# boilerplate we prepend (e.g. `import random` for Python) is not a signal by itself.
+NONDETERMINISM_MARKERS = {
+    'python': r'\brandom\b|\btime\b|\bdatetime\b|\buuid\b|\bsecrets\b|\burandom\b|\bthreading\b',
+    'javascript': r'Math\.random|\bDate\b|performance\.now|\bcrypto\b|process\.hrtime',
+    'java': r'\bRandom\b|Math\.random|currentTimeMillis|nanoTime|\bLocalDate(Time)?\b|\bInstant\b|\bUUID\b|\bThread\b',
+    'cpp': r'\brand\s*\(|\bsrand\b|\btime\s*\(|\bchrono\b|random_device|\bmt19937\b|\bclock\s*\(|\bthread\b',
+    'c': r'\brand\s*\(|\bsrand\b|\btime\s*\(|\bclock\s*\(|\bpthread',
+    'ruby': r'\brand\b|\bRandom\b|\bTime\.now\b|\bSecureRandom\b|\bThread\b',
+    'go': r'math/rand|crypto/rand|time\.Now|time\.Since|\bgo\s+func\b',
+    'rust': r'\brand::|SystemTime|Instant::now|thread::spawn',
+    'php': r'\b(mt_|random_)?rand\s*\(|\bmicrotime\b|\btime\s*\(|\bdate\s*\(|\buniqid\b',
+}
+
+_compiled_markers = {
+    language: re.compile(pattern) for language, pattern in NONDETERMINISM_MARKERS.items()
+}
+
+
+class ExecutionCache:
+    """
+    Memoizes Piston results for deterministic programs.
+
+    Keyed on the prepared program, stdin, language and resolved runtime version.
+    Programs that look nondeterministic are skipped unless a short TTL is
+    configured for them.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, ttl: Optional[float] = None,
+                 nondeterministic_ttl: Optional[float] = None):
+        self.ttl = ttl if ttl is not None else float(os.getenv('EXECUTION_CACHE_TTL', 3600))
+        self.nondeterministic_ttl = (
+            nondeterministic_ttl if nondeterministic_ttl is not None
+            else float(os.getenv('EXECUTION_CACHE_NONDETERMINISTIC_TTL', 0))
+        )
+        self.entries = LRUCache(
+            max_entries=max_entries or int(os.getenv('EXECUTION_CACHE_ENTRIES', 2048)),
+            ttl=self.ttl
+        )
+        self.skipped = 0
+
+    @staticmethod
+    def make_key(prepared_code: str, stdin: str, language: str, version: str) -> str:
+        material = json.dumps([prepared_code, stdin or "", language, version])
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def is_nondeterministic(source_code: str, language: str) -> bool:
+        pattern = _compiled_markers.get(language.lower())
+        return bool(pattern and pattern.search(source_code))
+
+    def ttl_for(self, source_code: str, language: str) -> Optional[float]:
+        """TTL to cache this program with, or None if it must not be cached."""
+        if self.is_nondeterministic(source_code, language):
+            return self.nondeterministic_ttl or None
+        return self.ttl
+
+    def get(self, key: str) -> Optional[Dict]:
+        value = self.entries.get(key)
+        metrics.cache_requests.labels("execution", "miss" if value is None else "hit").inc()
+        return value
+
+    def set(self, key: str, value: Dict, ttl: Optional[float]):
+        if ttl is None:
+            self.skipped += 1
+            return
+        self.entries.set(key, value, ttl=ttl)
+
+    def stats(self) -> Dict:
+        stats = self.entries.stats()
+        stats.update({
+            "ttl": self.ttl,
+            "nondeterministic_ttl": self.nondeterministic_ttl,
+            "skipped_nondeterministic": self.skipped
+        })
+        return stats
+
+
+execution_cache = ExecutionCache()
@@ -0,0 +1,95 @@
+import os
+from typing import Dict
+
+import httpx
+
+try:
+    import h2  # noqa: F401  (needed by httpx for HTTP/2)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+class HTTPClientManager:
+    """
+    Owns one long-lived, pooled httpx.AsyncClient per upstream (Piston, Groq, Ollama).
+
+    Clients are created lazily on first use so the services keep working outside
+    of the FastAPI app, and are opened/closed explicitly by the app lifespan.
+    """
+
+    def __init__(self):
+        # Per-upstream timeouts, in seconds. The read timeout is what used to be
+        # the hard-coded 30s on every request.
+        self.upstreams = {
+            "piston": {
+                "connect_timeout": _env_float("PISTON_CONNECT_TIMEOUT", 5.0),
+                "timeout": _env_float("PISTON_TIMEOUT", 30.0),
+            },
+            "groq": {
+                "connect_timeout": _env_float("GROQ_CONNECT_TIMEOUT", 5.0),
+                "timeout": _env_float("GROQ_TIMEOUT", 30.0),
+            },
+            # Local CPU inference is slow, so the read timeout is generous
+            "ollama": {
+                "connect_timeout": _env_float("OLLAMA_CONNECT_TIMEOUT", 2.0),
+                "timeout": _env_float("OLLAMA_TIMEOUT", 300.0),
+            },
+        }
+        self.max_connections = _env_int("CODEVERSE_HTTP_MAX_CONNECTIONS", 100)
+        self.max_keepalive_connections = _env_int("CODEVERSE_HTTP_MAX_KEEPALIVE", 20)
+        self.keepalive_expiry = _env_float("CODEVERSE_HTTP_KEEPALIVE_EXPIRY", 30.0)
+        self.http2 = _env_bool("CODEVERSE_HTTP2", True) and HTTP2_AVAILABLE
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def _create_client(self, upstream: str) -> httpx.AsyncClient:
+        config = self.upstreams[upstream]
+        timeout = httpx.Timeout(config["timeout"], connect=config["connect_timeout"])
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+        return httpx.AsyncClient(timeout=timeout, limits=limits, http2=self.http2)
+
+    def get(self, upstream: str) -> httpx.AsyncClient:
+        """Get the shared client for an upstream, creating it if needed."""
+        if upstream not in self.upstreams:
+            raise KeyError(f"Unknown upstream '{upstream}'")
+        client = self._clients.get(upstream)
+        if client is None or client.is_closed:
+            client = self._create_client(upstream)
+            self._clients[upstream] = client
+        return client
+
+    async def startup(self):
+        """Open a client for every configured upstream."""
+        for upstream in self.upstreams:
+            self.get(upstream)
+
+    async def shutdown(self):
+        """Close all clients and release their pooled connections."""
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            await client.aclose()
+
+
+http_clients = HTTPClientManager()
@@ -0,0 +1,342 @@
+import json
+import logging
+import os
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+
+from codeverse.services import metrics
+from codeverse.services.http_clients import _env_float, http_clients
+from codeverse.services.resilience import upstreams
+from codeverse.services.scheduler import UpstreamOverloaded, retry_after_seconds
+from codeverse.services.streaming import parse_sse_data
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderError(Exception):
+    """The provider answered, but with an error instead of a completion."""
+
+
+@dataclass
+class Completion:
+    content: str
+    provider: str
+    model: str
+    usage: Optional[Dict[str, int]] = None
+
+
+class LLMProvider(ABC):
+    """
+    A chat completion backend. Calls go through the provider's upstream
+    scheduler and resilience layer (see scheduler.py and resilience.py).
+    """
+
+    def __init__(self, name: str, model: str, url: str, cost_per_1k_tokens: float, expected_latency: float):
+        self.name = name
+        self.model = model
+        self.url = url
+        self.cost_per_1k_tokens = cost_per_1k_tokens
+        self.expected_latency = expected_latency
+        self.upstream = upstreams[name]
+        self.scheduler = self.upstream.scheduler
+        self.headers = {"Content-Type": "application/json"}
+
+    @abstractmethod
+    def _payload(self, messages: list, sampling: Dict, stream: bool) -> Dict:
+        """Request body for a chat completion."""
+
+    @abstractmethod
+    def _parse_completion(self, data: Dict) -> Tuple[str, Optional[Dict[str, int]]]:
+        """(content, usage) from a non-streamed response body."""
+
+    @abstractmethod
+    def _parse_stream_line(self, line: str) -> Optional[str]:
+        """Content delta from one line of a streamed response, if any."""
+
+    @staticmethod
+    def estimate_tokens(messages: list, sampling: Dict) -> int:
+        # Roughly 4 characters per token for the prompt, plus the full completion budget
+        return sum(len(message["content"]) for message in messages) // 4 + sampling.get("max_tokens", 0)
+
+    def _raise_if_rate_limited(self, response: httpx.Response):
+        """Turn a 429 into a pause for everyone plus UpstreamOverloaded for this caller."""
+        if response.status_code == 429:
+            retry_after = retry_after_seconds(response.headers)
+            self.scheduler.backoff(retry_after)
+            raise UpstreamOverloaded(self.name, retry_after, "rate limited upstream")
+
+    async def complete(self, messages: list, sampling: Dict) -> Completion:
+        payload = self._payload(messages, sampling, stream=False)
+        estimated_tokens = self.estimate_tokens(messages, sampling)
+        client = http_clients.get(self.name)
+        response = await self.upstream.request(
+            lambda: client.post(self.url, headers=self.headers, json=payload),
+            tokens=estimated_tokens
+        )
+        self._raise_if_rate_limited(response)
+        if response.status_code != 200:
+            raise ProviderError(f"API Error: {response.text}")
+
+        content, usage = self._parse_completion(response.json())
+        self.scheduler.record_tokens(estimated_tokens, (usage or {}).get("total_tokens"))
+        if usage:
+            metrics.llm_tokens.labels(self.name, "prompt").inc(usage.get("prompt_tokens", 0))
+            metrics.llm_tokens.labels(self.name, "completion").inc(usage.get("completion_tokens", 0))
+        return Completion(content=content, provider=self.name, model=self.model, usage=usage)
+
+    async def stream(self, messages: list, sampling: Dict) -> AsyncIterator[str]:
+        """Yield content deltas. Streams are not retried or hedged, only guarded."""
+        payload = self._payload(messages, sampling, stream=True)
+        client = http_clients.get(self.name)
+        async with self.upstream.guard(tokens=self.estimate_tokens(messages, sampling)):
+            async with client.stream("POST", self.url, headers=self.headers, json=payload) as response:
+                self.upstream.observe(response)
+                self._raise_if_rate_limited(response)
+                if response.status_code != 200:
+                    error_text = (await response.aread()).decode("utf-8", "replace")
+                    raise ProviderError(f"API Error: {error_text}")
+
+                async for line in response.aiter_lines():
+                    content = self._parse_stream_line(line)
+                    if content:
+                        yield content
+
+
+class GroqProvider(LLMProvider):
+    """Groq's OpenAI-compatible chat completions API."""
+
+    def __init__(self, api_key: str, model: str, url: str, cost_per_1k_tokens: float, expected_latency: float):
+        super().__init__("groq", model, url, cost_per_1k_tokens, expected_latency)
+        self.headers["Authorization"] = f"Bearer {api_key.strip()}"
+
+    def _payload(self, messages: list, sampling: Dict, stream: bool) -> Dict:
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": sampling["temperature"],
+            "max_tokens": sampling["max_tokens"],
+            "top_p": sampling["top_p"],
+            "stream": stream
+        }
+        if sampling.get("stop"):
+            payload["stop"] = sampling["stop"]
+        return payload
+
+    def _parse_completion(self, data: Dict) -> Tuple[str, Optional[Dict[str, int]]]:
+        usage = data.get('usage')
+        if usage is not None:
+            # Groq adds timings (queue_time, total_time, ...) as floats; keep the token counts
+            usage = {name: int(usage.get(name, 0)) for name in ("prompt_tokens", "completion_tokens", "total_tokens")}
+        return data['choices'][0]['message']['content'], usage
+
+    def _parse_stream_line(self, line: str) -> Optional[str]:
+        chunk = parse_sse_data(line)
+        if not chunk or not chunk.get("choices"):
+            return None
+        return chunk["choices"][0].get("delta", {}).get("content")
+
+
+class OllamaProvider(LLMProvider):
+    """A local Ollama server (see scripts/setup_ollama.py), using its native /api/chat."""
+
+    def __init__(self, base_url: str, model: str, cost_per_1k_tokens: float, expected_latency: float):
+        super().__init__("ollama", model, f"{base_url.rstrip('/')}/api/chat", cost_per_1k_tokens, expected_latency)
+
+    def _payload(self, messages: list, sampling: Dict, stream: bool) -> Dict:
+        options = {
+            "temperature": sampling["temperature"],
+            "top_p": sampling["top_p"],
+            "num_predict": sampling["max_tokens"]
+        }
+        if sampling.get("stop"):
+            options["stop"] = sampling["stop"]
+        return {"model": self.model, "messages": messages, "stream": stream, "options": options}
+
+    def _parse_completion(self, data: Dict) -> Tuple[str, Optional[Dict[str, int]]]:
+        prompt_tokens = data.get("prompt_eval_count", 0)
+        completion_tokens = data.get("eval_count", 0)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+        return data.get("message", {}).get("content", ""), usage
+
+    def _parse_stream_line(self, line: str) -> Optional[str]:
+        if not line.strip():
+            return None
+        chunk = json.loads(line)
+        if chunk.get("error"):
+            raise ProviderError(f"API Error: {chunk['error']}")
+        return chunk.get("message", {}).get("content")
+
+
+class ProviderHealth:
+    """Exponentially weighted moving averages of a provider's latency and error rate."""
+
+    def __init__(self, expected_latency: float, alpha: float):
+        self.alpha = alpha
+        self.latency = expected_latency
+        self.error_rate = 0.0
+        self.successes = 0
+        self.errors = 0
+
+    def record_success(self, seconds: float):
+        self.successes += 1
+        self.latency += self.alpha * (seconds - self.latency)
+        self.error_rate -= self.alpha * self.error_rate
+
+    def record_error(self):
+        self.errors += 1
+        self.error_rate += self.alpha * (1.0 - self.error_rate)
+
+
+class LLMRouter:
+    """
+    Picks a provider per request and fails over to the next one.
+
+    Providers are ranked by expected completion time (latency EWMA, scaled up
+    by how busy and how error-prone the provider is, plus any rate-limit pause)
+    plus a cost term. When a provider is overloaded, rate-limited, its breaker
+    is open or it returns an error, the request moves on to the next provider.
+    """
+
+    def __init__(self, providers: List[LLMProvider], alpha: float = 0.2, cost_weight: float = 1000.0):
+        if not providers:
+            raise ValueError("At least one LLM provider is required")
+        self.providers = providers
+        self.cost_weight = cost_weight
+        self.health = {provider.name: ProviderHealth(provider.expected_latency, alpha) for provider in providers}
+        self.failovers = 0
+
+    @property
+    def models(self) -> str:
+        """Identifies the provider set, for keys of requests that any provider may serve."""
+        return ",".join(f"{provider.name}:{provider.model}" for provider in self.providers)
+
+    def cache_model(self, provider_name: str) -> Optional[str]:
+        """Identifies the model behind a completion in translation cache keys (None if not configured)."""
+        for provider in self.providers:
+            if provider.name == provider_name:
+                return f"{provider.name}:{provider.model}"
+        return None
+
+    def score(self, provider: LLMProvider, estimated_tokens: int) -> float:
+        health = self.health[provider.name]
+        admission = provider.scheduler.stats()
+        busy = (admission["active"] + admission["queued"]) / admission["max_concurrency"]
+        expected = health.latency * (1.0 + busy) + admission["paused_for"]
+        expected /= max(0.05, 1.0 - health.error_rate)
+        if provider.upstream.breaker.state == "open":
+            expected += provider.upstream.breaker.recovery_time
+        cost = provider.cost_per_1k_tokens * estimated_tokens / 1000.0
+        return expected + self.cost_weight * cost
+
+    def ranked(self, messages: list, sampling: Dict) -> List[LLMProvider]:
+        tokens = LLMProvider.estimate_tokens(messages, sampling)
+        return sorted(self.providers, key=lambda provider: self.score(provider, tokens))
+
+    async def complete(self, messages: list, sampling: Dict) -> Completion:
+        """
+        The first completion a provider returns. If all fail, an overload is
+        raised in preference to other errors, so callers can retry later.
+        """
+        last_error: Optional[Exception] = None
+        overloaded: Optional[UpstreamOverloaded] = None
+        for attempt, provider in enumerate(self.ranked(messages, sampling)):
+            if attempt:
+                self.failovers += 1
+            started = time.monotonic()
+            try:
+                completion = await provider.complete(messages, sampling)
+            except (UpstreamOverloaded, ProviderError, httpx.HTTPError) as e:
+                self.health[provider.name].record_error()
+                logger.warning("LLM provider %s failed: %s", provider.name, e)
+                last_error = e
+                if isinstance(e, UpstreamOverloaded):
+                    overloaded = overloaded or e
+                continue
+            self.health[provider.name].record_success(time.monotonic() - started)
+            return completion
+        raise overloaded or last_error
+
+    async def stream(self, messages: list, sampling: Dict) -> AsyncIterator[Tuple[str, str]]:
+        """
+        Yield (provider name, content delta). Fails over only until the first
+        delta has been yielded; after that an error is raised to the caller.
+        As in complete(), an overload is preferred when every provider fails.
+        """
+        last_error: Optional[Exception] = None
+        overloaded: Optional[UpstreamOverloaded] = None
+        for attempt, provider in enumerate(self.ranked(messages, sampling)):
+            if attempt:
+                self.failovers += 1
+            started = time.monotonic()
+            emitted = False
+            try:
+                async for content in provider.stream(messages, sampling):
+                    emitted = True
+                    yield provider.name, content
+            except (UpstreamOverloaded, ProviderError, httpx.HTTPError) as e:
+                self.health[provider.name].record_error()
+                if emitted:
+                    raise
+                logger.warning("LLM provider %s failed: %s", provider.name, e)
+                last_error = e
+                if isinstance(e, UpstreamOverloaded):
+                    overloaded = overloaded or e
+                continue
+            self.health[provider.name].record_success(time.monotonic() - started)
+            return
+        raise overloaded or last_error
+
+    def stats(self) -> Dict:
+        return {
+            "failovers": self.failovers,
+            "providers": [
+                {
+                    "name": provider.name,
+                    "model": provider.model,
+                    "latency_ewma_ms": round(self.health[provider.name].latency * 1000, 3),
+                    "error_rate_ewma": round(self.health[provider.name].error_rate, 4),
+                    "successes": self.health[provider.name].successes,
+                    "errors": self.health[provider.name].errors,
+                    "cost_per_1k_tokens": provider.cost_per_1k_tokens
+                }
+                for provider in self.providers
+            ]
+        }
+
+
+def create_llm_router(groq_api_key: Optional[str]) -> LLMRouter:
+    """Build the router from LLM_PROVIDERS (comma separated, default "groq"; e.g. "groq,ollama")."""
+    names = [name.strip().lower() for name in os.getenv('LLM_PROVIDERS', 'groq').split(',') if name.strip()]
+    providers: List[LLMProvider] = []
+    for name in names:
+        if name == 'groq':
+            providers.append(GroqProvider(
+                groq_api_key,
+                model=os.getenv('GROQ_MODEL', 'mixtral-8x7b-32768'),
+                url=os.getenv('GROQ_BASE_URL', 'https://api.groq.com/openai/v1/chat/completions'),
+                cost_per_1k_tokens=_env_float('GROQ_COST_PER_1K_TOKENS', 0.00024),
+                expected_latency=_env_float('GROQ_EXPECTED_LATENCY', 2.0)
+            ))
+        elif name == 'ollama':
+            providers.append(OllamaProvider(
+                os.getenv('OLLAMA_URL', 'http://localhost:11434'),
+                model=os.getenv('OLLAMA_MODEL', 'codellama'),
+                cost_per_1k_tokens=_env_float('OLLAMA_COST_PER_1K_TOKENS', 0.0),
+                expected_latency=_env_float('OLLAMA_EXPECTED_LATENCY', 30.0)
+            ))
+        else:
+            raise ValueError(f"Unknown LLM provider '{name}' in LLM_PROVIDERS")
+
+    return LLMRouter(
+        providers,
+        alpha=_env_float('LLM_ROUTER_EWMA_ALPHA', 0.2),
+        cost_weight=_env_float('LLM_ROUTER_COST_WEIGHT', 1000.0)
+    )
@@ -0,0 +1,209 @@
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+import uuid
+import zlib
+from typing import Any, Dict, Optional
+
+from codeverse.services import metrics
+
+request_id_var = contextvars.ContextVar("codeverse_request_id", default=None)
+
+# Attributes every LogRecord has; anything else came in through `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def fields(**values) -> Dict[str, Any]:
+    """Structured fields for a log call: `logger.info("msg", extra=fields(language=lang))`."""
+    return {"fields": values}
+
+
+def _truncate(value: Any, limit: int) -> Any:
+    if isinstance(value, str) and limit and len(value) > limit:
+        return f"{value[:limit]}... [{len(value)} chars]"
+    if isinstance(value, (list, tuple)):
+        return [_truncate(item, limit) for item in value]
+    if isinstance(value, dict):
+        return {key: _truncate(item, limit) for key, item in value.items()}
+    return value
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamps records with the current request id and drops a sample of low-level logs."""
+
+    def __init__(self, sample_rate: float = 1.0):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        request_id = request_id_var.get()
+        record.request_id = request_id
+        if self.sample_rate >= 1.0 or record.levelno >= logging.WARNING:
+            return True
+        # Sample whole requests rather than individual lines, so a kept request
+        # has all of its log lines
+        if request_id:
+            return (zlib.crc32(request_id.encode()) % 10000) < self.sample_rate * 10000
+        return random.random() < self.sample_rate
+
+
+class StructuredFormatter(logging.Formatter):
+    """One JSON object (or key=value line) per record; long field values are truncated."""
+
+    def __init__(self, output: str = "text", max_field_chars: int = 500):
+        super().__init__()
+        self.output = output
+        self.max_field_chars = max_field_chars
+
+    def format(self, record: logging.LogRecord) -> str:
+        values = dict(getattr(record, "fields", None) or {})
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and key not in ("fields", "request_id"):
+                values[key] = value
+        values = _truncate(values, self.max_field_chars)
+        message = _truncate(record.getMessage(), self.max_field_chars)
+        timestamp = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z"
+
+        if self.output == "json":
+            entry = {
+                "ts": timestamp,
+                "level": record.levelname,
+                "logger": record.name,
+                "message": message,
+                "request_id": getattr(record, "request_id", None),
+                **values
+            }
+            if record.exc_info:
+                entry["exc_info"] = self.formatException(record.exc_info)
+            elif record.exc_text:
+                entry["exc_info"] = record.exc_text
+            return json.dumps(entry, default=str)
+
+        request_id = getattr(record, "request_id", None)
+        parts = [timestamp, record.levelname, record.name]
+        if request_id:
+            parts.append(f"[{request_id}]")
+        parts.append(message)
+        parts.extend(f"{key}={json.dumps(value, default=str)}" for key, value in values.items())
+        line = " ".join(parts)
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        elif record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking or erroring when the queue is full."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Make the record safe to hand to the listener thread. The base class
+        folds the traceback into the message, where StructuredFormatter would
+        truncate it; here the message is merged with its args and the traceback
+        rendered into exc_text, which the formatter prints in full.
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            # Tracebacks hold frames; do not keep them alive in the queue
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.log_records_dropped.inc()
+
+
+class LoggingManager:
+    """
+    Configures the `codeverse` logger tree from the environment.
+
+    Records are put on a bounded queue by the calling thread and written to
+    stderr by a background QueueListener, so request handlers never block on
+    I/O. Settings:
+
+        LOG_LEVEL            DEBUG, INFO (default), WARNING, ERROR
+        LOG_FORMAT           text (default) or json
+        LOG_MAX_FIELD_CHARS  truncate longer strings (default 500, 0 = never)
+        LOG_SAMPLE_RATE      fraction of requests whose INFO/DEBUG lines are kept (default 1.0)
+        LOG_QUEUE_SIZE       records buffered before new ones are dropped (default 10000)
+    """
+
+    def __init__(self):
+        self.listener: Optional[logging.handlers.QueueListener] = None
+
+    def configure(self):
+        if self.listener is not None:
+            return
+
+        level = os.getenv("LOG_LEVEL", "INFO").upper()
+        formatter = StructuredFormatter(
+            output=os.getenv("LOG_FORMAT", "text").lower(),
+            max_field_chars=int(os.getenv("LOG_MAX_FIELD_CHARS", 500))
+        )
+        stream_handler = logging.StreamHandler(sys.stderr)
+        stream_handler.setFormatter(formatter)
+
+        log_queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", 10000)))
+        queue_handler = DroppingQueueHandler(log_queue)
+        queue_handler.addFilter(RequestContextFilter(float(os.getenv("LOG_SAMPLE_RATE", 1.0))))
+
+        logger = logging.getLogger("codeverse")
+        logger.setLevel(level)
+        logger.handlers = [queue_handler]
+        logger.propagate = False
+
+        self.listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        self.listener.start()
+
+    def shutdown(self):
+        """Flush queued records and stop the listener thread."""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+
+class RequestIdMiddleware:
+    """ASGI middleware giving each request an id (from X-Request-ID or generated) for its log lines."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", []):
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:64]
+                break
+        request_id = request_id or uuid.uuid4().hex[:16]
+        token = request_id_var.set(request_id)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id_var.reset(token)
+
+
+logging_manager = LoggingManager()
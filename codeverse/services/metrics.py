@@ -0,0 +1,335 @@
+import bisect
+import time
+from typing import Callable, Dict, List, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+    suffix = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """Child metric for one combination of label values (positional, in labelnames order)."""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            child = self._children[key] = self._new_child()
+        return child
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name}{self.suffix} {self.documentation}",
+            f"# TYPE {self.name}{self.suffix} {self.kind}",
+            *self._samples()
+        ]
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+    suffix = "_total"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self._children[()].inc(amount)
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}_total{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+            for key, child in self._children.items()
+        ]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+    def set(self, value: float):
+        self._children[()].set(value)
+
+    def inc(self, amount: float = 1.0):
+        self._children[()].inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._children[()].dec(amount)
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+            for key, child in self._children.items()
+        ]
+
+
+class _Timer:
+    __slots__ = ("child", "started")
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.started)
+        return False
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self) -> _Timer:
+        """Context manager that observes the duration of its block, in seconds."""
+        return _Timer(self)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self._children[()].observe(value)
+
+    def time(self) -> _Timer:
+        return self._children[()].time()
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Minimal in-process metrics in the Prometheus text exposition format.
+
+    Updates are plain attribute arithmetic on the event loop thread, so
+    recording a sample costs about as much as a dict lookup. Callbacks added
+    with `on_collect` refresh gauges from live state just before rendering.
+    """
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def on_collect(self, callback: Callable[[], None]):
+        self._collectors.append(callback)
+
+    def render(self) -> str:
+        for callback in self._collectors:
+            callback()
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route HTTP latency and requests in flight."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        http_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_in_flight.dec()
+            http_request_seconds.labels(scope["method"], self._route(scope), str(status["code"])).observe(
+                time.perf_counter() - started
+            )
+
+    @staticmethod
+    def _route(scope) -> str:
+        """Matched route template, so ids in paths don't explode the label set."""
+        template = getattr(scope.get("route"), "path", None)
+        if template is None:
+            return "unmatched"
+        # Depending on the FastAPI version the template may lack the router's
+        # prefix; take the prefix from the same number of leading path segments
+        parts = scope["path"].split("/")
+        prefix = "/".join(parts[:max(1, len(parts) - template.count("/"))])
+        return prefix + template
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+registry = MetricsRegistry()
+
+http_in_flight = registry.gauge(
+    "codeverse_http_requests_in_flight", "HTTP requests currently being handled"
+)
+http_request_seconds = registry.histogram(
+    "codeverse_http_request_duration_seconds", "HTTP request latency by route",
+    ("method", "route", "status")
+)
+compile_stage_seconds = registry.histogram(
+    "codeverse_compile_stage_seconds", "Time spent in each stage of a compile request",
+    ("stage", "language")
+)
+translate_stage_seconds = registry.histogram(
+    "codeverse_translate_stage_seconds", "Time spent in each stage of a translation request",
+    ("stage", "source_language", "target_language")
+)
+translate_tiers = registry.counter(
+    "codeverse_translate_tiers", "Tiered translations by the tier that served them",
+    ("tier", "source_language", "target_language")
+)
+translate_document_units = registry.counter(
+    "codeverse_translate_document_units", "Top-level units of document translations, reused or re-translated",
+    ("outcome",)
+)
+upstream_request_seconds = registry.histogram(
+    "codeverse_upstream_request_duration_seconds", "Latency of individual upstream HTTP attempts",
+    ("upstream",)
+)
+upstream_responses = registry.counter(
+    "codeverse_upstream_responses", "Upstream responses by status code (\"error\" for transport failures)",
+    ("upstream", "status")
+)
+upstream_in_flight = registry.gauge(
+    "codeverse_upstream_in_flight", "Upstream calls holding a scheduler slot", ("upstream",)
+)
+upstream_queued = registry.gauge(
+    "codeverse_upstream_queued", "Upstream calls waiting for a scheduler slot", ("upstream",)
+)
+upstream_shed = registry.counter(
+    "codeverse_upstream_shed", "Requests rejected by admission control", ("upstream", "reason")
+)
+llm_tokens = registry.counter(
+    "codeverse_llm_tokens", "LLM tokens reported by providers", ("provider", "kind")
+)
+cache_requests = registry.counter(
+    "codeverse_cache_requests", "Cache lookups by result", ("cache", "result")
+)
+coalesced_requests = registry.counter(
+    "codeverse_coalesced_requests", "Requests that joined an identical in-flight call", ("kind",)
+)
+log_records_dropped = registry.counter(
+    "codeverse_log_records_dropped", "Log records dropped because the log queue was full"
+)
+cpu_tasks = registry.counter(
+    "codeverse_cpu_tasks", "Tasks run on the CPU worker pool by outcome", ("pool", "task", "outcome")
+)
+cpu_task_seconds = registry.histogram(
+    "codeverse_cpu_task_duration_seconds", "Execution time of CPU pool tasks", ("pool", "task")
+)
+cpu_pool_running = registry.gauge(
+    "codeverse_cpu_pool_running", "CPU pool tasks currently executing", ("pool",)
+)
+cpu_pool_queued = registry.gauge(
+    "codeverse_cpu_pool_queued", "CPU pool tasks waiting for a worker", ("pool",)
+)
+parse_session_update_seconds = registry.histogram(
+    "codeverse_parse_session_update_seconds", "Time to apply an update to an editor parse session",
+    ("language", "kind"), buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+)
+editor_jobs = registry.counter(
+    "codeverse_editor_jobs", "Editor WebSocket jobs by outcome", ("kind", "outcome")
+)
@@ -0,0 +1,486 @@
+import asyncio
+import base64
+import io
+import json
+import logging
+import os
+import shutil
+import tarfile
+import time
+import uuid
+import zipfile
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from codeverse.core.analyzer import CodeAnalyzer
+from codeverse.models.schemas import TranslateRequest
+from codeverse.services.scheduler import BATCH, UpstreamOverloaded, request_priority
+
+logger = logging.getLogger(__name__)
+
+project_root = Path(__file__).parent.parent.parent
+default_migration_root = project_root / '.codeverse_migrations'
+
+
+def migration_root(root: Optional[str] = None) -> Path:
+    """Directory holding migration jobs (MIGRATION_ROOT, by default .codeverse_migrations)."""
+    return Path(root or os.getenv('MIGRATION_ROOT') or default_migration_root)
+
+
+# Source file extensions per language; the first one is used for translated output
+LANGUAGE_EXTENSIONS = {
+    'python': ['.py'],
+    'javascript': ['.js', '.mjs', '.cjs', '.jsx'],
+    'typescript': ['.ts', '.tsx'],
+    'java': ['.java'],
+    'cpp': ['.cpp', '.cc', '.cxx', '.hpp', '.hh', '.h'],
+    'c': ['.c', '.h'],
+    'ruby': ['.rb'],
+    'php': ['.php'],
+    'go': ['.go'],
+    'rust': ['.rs'],
+    'swift': ['.swift'],
+    'kotlin': ['.kt'],
+}
+
+IGNORED_DIRECTORIES = {
+    '.git', '.hg', '.svn', 'node_modules', '__pycache__', '.venv', 'venv',
+    'target', 'build', 'dist', 'vendor', '.idea', '.vscode'
+}
+
+MANIFEST_NAME = 'manifest.json'
+
+
+def _python_module_name(path: str) -> str:
+    parts = list(Path(path).with_suffix('').parts)
+    if parts and parts[-1] == '__init__':
+        parts = parts[:-1]
+    return '.'.join(parts)
+
+
+class MigrationError(Exception):
+    """Raised for invalid migration jobs (bad source path, archive, languages)."""
+
+
+class MigrationService:
+    """
+    Translates whole source trees as background jobs.
+
+    The files' import graph is built with CodeAnalyzer, and files are translated
+    as soon as all of their local dependencies are done, so leaves go first and
+    independent branches run in parallel. Each job lives in its own directory
+    with a manifest that is rewritten after every file, so completed files are
+    kept across restarts and unfinished jobs resume on startup.
+    """
+
+    def __init__(self, translation_service, root: Optional[str] = None, max_parallel: Optional[int] = None):
+        self.translation_service = translation_service
+        self.analyzer = CodeAnalyzer()
+        self.root = migration_root(root)
+        self.max_parallel = max_parallel or int(os.getenv('MIGRATION_MAX_PARALLEL', 4))
+        # source_path imports are refused unless they are confined to this directory
+        self.source_root = os.getenv('MIGRATION_SOURCE_ROOT')
+        # Limits checked before an archive is extracted
+        self.max_archive_bytes = int(os.getenv('MIGRATION_MAX_ARCHIVE_BYTES', 200 * 1024 * 1024))
+        self.max_archive_members = int(os.getenv('MIGRATION_MAX_ARCHIVE_MEMBERS', 20000))
+        self.jobs: Dict[str, Dict] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    # Job lifecycle
+
+    async def create_job(
+        self,
+        source_language: str,
+        target_language: str,
+        source_path: Optional[str] = None,
+        archive_base64: Optional[str] = None,
+        archive_name: Optional[str] = None
+    ) -> Dict:
+        """Copy or extract the sources, build the dependency graph and start translating."""
+        source_language = source_language.lower()
+        target_language = target_language.lower()
+        supported = self.translation_service.supported_languages
+        for language in (source_language, target_language):
+            if language not in supported or language not in LANGUAGE_EXTENSIONS:
+                raise MigrationError(f"Language '{language}' is not supported")
+        if bool(source_path) == bool(archive_base64):
+            raise MigrationError("Provide exactly one of source_path or archive_base64")
+
+        job_id = uuid.uuid4().hex
+        job_dir = self.root / job_id
+        source_dir = job_dir / 'source'
+        try:
+            await asyncio.to_thread(
+                self._import_sources, source_dir, source_language, source_path, archive_base64, archive_name
+            )
+            files = await asyncio.to_thread(self._build_graph, source_dir, source_language, target_language)
+            if not files:
+                raise MigrationError(f"No {source_language} source files found")
+        except Exception:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            raise
+
+        now = time.time()
+        job = {
+            "job_id": job_id,
+            "status": "pending",
+            "source_language": source_language,
+            "target_language": target_language,
+            "created_at": now,
+            "updated_at": now,
+            "files": files
+        }
+        self.jobs[job_id] = job
+        await self._save(job)
+        self._start(job)
+        return self.job_summary(job_id)
+
+    async def resume(self):
+        """Restart jobs that were still pending or running when the server stopped."""
+        if not self.root.is_dir():
+            return
+        for manifest_path in self.root.glob(f'*/{MANIFEST_NAME}'):
+            try:
+                job = json.loads(manifest_path.read_text(encoding='utf-8'))
+            except (OSError, ValueError) as e:
+                logger.warning("Skipping unreadable migration manifest %s: %s", manifest_path, e)
+                continue
+            self.jobs[job['job_id']] = job
+            if job['status'] in ('pending', 'running'):
+                self._start(job)
+
+    async def shutdown(self):
+        """Cancel running jobs; their manifests already record finished files."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def _start(self, job: Dict):
+        # Migrations are background work and yield to interactive requests
+        with request_priority(BATCH):
+            task = asyncio.create_task(self._run_job(job))
+        self._tasks[job['job_id']] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job['job_id'], None))
+
+    def job_summary(self, job_id: str, include_files: bool = False) -> Optional[Dict]:
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+
+        counts = {"pending": 0, "running": 0, "done": 0, "failed": 0}
+        for entry in job['files'].values():
+            counts[entry['status']] += 1
+        summary = {
+            "job_id": job_id,
+            "status": job['status'],
+            "source_language": job['source_language'],
+            "target_language": job['target_language'],
+            "created_at": job['created_at'],
+            "updated_at": job['updated_at'],
+            "total_files": len(job['files']),
+            "progress": round(counts['done'] / len(job['files']), 4) if job['files'] else 1.0,
+            "files_by_status": counts,
+            "output_dir": str(self.root / job_id / 'output')
+        }
+        if include_files:
+            summary["files"] = job['files']
+        return summary
+
+    def list_jobs(self) -> List[Dict]:
+        return [self.job_summary(job_id) for job_id in self.jobs]
+
+    # Importing sources
+
+    def _import_sources(self, source_dir: Path, language: str, source_path: Optional[str],
+                        archive_base64: Optional[str], archive_name: Optional[str]):
+        source_dir.mkdir(parents=True)
+        if archive_base64:
+            try:
+                data = base64.b64decode(archive_base64, validate=True)
+            except ValueError:
+                raise MigrationError("archive_base64 is not valid base64")
+            if len(data) > self.max_archive_bytes:
+                raise MigrationError(f"Archive is too large ({len(data)} bytes, the limit is {self.max_archive_bytes})")
+            self._extract_archive(io.BytesIO(data), archive_name or '', source_dir)
+            return
+
+        if not self.source_root:
+            raise MigrationError(
+                "source_path is disabled on this server (MIGRATION_SOURCE_ROOT is not set); upload an archive instead"
+            )
+        path = Path(source_path).expanduser().resolve()
+        if not path.is_relative_to(Path(self.source_root).resolve()):
+            raise MigrationError(f"source_path must be inside {self.source_root}")
+        if path.is_dir():
+            extensions = tuple(LANGUAGE_EXTENSIONS[language])
+            shutil.copytree(
+                path, source_dir, dirs_exist_ok=True,
+                ignore=lambda directory, names: [
+                    name for name in names
+                    if name in IGNORED_DIRECTORIES
+                    or (os.path.isfile(os.path.join(directory, name)) and not name.endswith(extensions))
+                ]
+            )
+        elif path.is_file():
+            with open(path, 'rb') as f:
+                self._extract_archive(f, path.name, source_dir)
+        else:
+            raise MigrationError(f"source_path '{source_path}' does not exist")
+
+    def _check_archive_size(self, name: str, members: int, total_bytes: int):
+        """Refuse archives that would unpack to too many files or bytes."""
+        if members > self.max_archive_members:
+            raise MigrationError(
+                f"Archive '{name}' has too many members ({members}, the limit is {self.max_archive_members})"
+            )
+        if total_bytes > self.max_archive_bytes:
+            raise MigrationError(
+                f"Archive '{name}' unpacks to {total_bytes} bytes, the limit is {self.max_archive_bytes}"
+            )
+
+    def _extract_archive(self, fileobj, name: str, destination: Path):
+        destination = destination.resolve()
+        if zipfile.is_zipfile(fileobj):
+            fileobj.seek(0)
+            with zipfile.ZipFile(fileobj) as archive:
+                infos = archive.infolist()
+                self._check_archive_size(name, len(infos), sum(info.file_size for info in infos))
+                for member in archive.namelist():
+                    if not (destination / member).resolve().is_relative_to(destination):
+                        raise MigrationError(f"Archive member '{member}' escapes the extraction directory")
+                archive.extractall(destination)
+            return
+
+        fileobj.seek(0)
+        try:
+            with tarfile.open(fileobj=fileobj, mode='r:*') as archive:
+                members = []
+                total_bytes = 0
+                # Count while reading the index so a huge archive stops early
+                for member in archive:
+                    members.append(member)
+                    total_bytes += member.size if member.isfile() else 0
+                    self._check_archive_size(name, len(members), total_bytes)
+                archive.extractall(destination, members=members, filter='data')
+        except (tarfile.TarError, OSError) as e:
+            raise MigrationError(f"Could not extract archive '{name}': {e}")
+
+    # Dependency graph
+
+    def _build_graph(self, source_dir: Path, source_language: str, target_language: str) -> Dict[str, Dict]:
+        extensions = tuple(LANGUAGE_EXTENSIONS[source_language])
+        paths = sorted(
+            path.relative_to(source_dir).as_posix()
+            for path in source_dir.rglob('*')
+            if path.is_file() and path.name.endswith(extensions)
+            and not IGNORED_DIRECTORIES.intersection(path.relative_to(source_dir).parts)
+        )
+        known = set(paths)
+        modules = self._module_index(paths, source_language)
+        stems: Dict[str, List[str]] = {}
+        for path in paths:
+            stems.setdefault(Path(path).stem, []).append(path)
+
+        files = {}
+        outputs: Set[str] = set()
+        for path in paths:
+            code = (source_dir / path).read_text(encoding='utf-8', errors='replace')
+            try:
+                imports = self.analyzer.extract_dependencies(code, source_language)
+            except Exception as e:
+                logger.debug("Could not extract dependencies from %s: %s", path, e)
+                imports = []
+
+            dependencies = []
+            for name in imports:
+                for resolved in self._resolve_dependency(path, name, source_language, known, modules, stems):
+                    if resolved != path and resolved not in dependencies:
+                        dependencies.append(resolved)
+
+            files[path] = {
+                "status": "pending",
+                "dependencies": dependencies,
+                "output": self._output_path(path, target_language, outputs),
+                "error": None,
+                "elapsed_ms": None
+            }
+        return files
+
+    @staticmethod
+    def _module_index(paths: List[str], language: str) -> Dict[str, List[str]]:
+        """Map dotted module names (and their suffixes) to files, for Python/Java/Kotlin."""
+        index: Dict[str, List[str]] = {}
+        if language not in ('python', 'java', 'kotlin'):
+            return index
+        for path in paths:
+            if language == 'python':
+                parts = _python_module_name(path).split('.')
+            else:
+                parts = list(Path(path).with_suffix('').parts)
+            # Register every suffix so "pkg.mod" finds "src/pkg/mod.py"
+            for start in range(len(parts)):
+                index.setdefault('.'.join(parts[start:]), []).append(path)
+        return index
+
+    @staticmethod
+    def _resolve_dependency(path: str, name: str, language: str, known: Set[str],
+                            modules: Dict[str, List[str]], stems: Dict[str, List[str]]) -> List[str]:
+        """Resolve one import of `path` to local files; external imports resolve to nothing."""
+        directory = os.path.dirname(path)
+
+        if language == 'python':
+            if name.startswith('.'):
+                level = len(name) - len(name.lstrip('.'))
+                package = directory.split('/') if directory else []
+                package = package[:len(package) - (level - 1)] if level > 1 else package
+                remainder = name.lstrip('.')
+                dotted = '.'.join(package + ([remainder] if remainder else []))
+                # `from .x import y` may name a module or just an attribute of a package
+                for candidate in (dotted, '.'.join(package)):
+                    matches = [p for p in modules.get(candidate, []) if _python_module_name(p) == candidate]
+                    if matches:
+                        return matches[:1]
+                return []
+            matches = modules.get(name, [])
+            return matches if len(matches) == 1 else []
+
+        if language in ('java', 'kotlin'):
+            name = name[:-2] if name.endswith('.*') else name
+            matches = modules.get(name, [])
+            return matches if len(matches) == 1 else []
+
+        if name.startswith('.') or '/' in name:
+            base = os.path.normpath(os.path.join(directory, name)).replace(os.sep, '/')
+            candidates = [base, name]
+            for extension in LANGUAGE_EXTENSIONS.get(language, []):
+                candidates += [base + extension, f"{base}/index{extension}", f"{base}/mod{extension}"]
+            for candidate in candidates:
+                if candidate in known:
+                    return [candidate]
+            if language == 'go':
+                # Go imports a package (a directory) by its module path
+                package_dir = name.rstrip('/').split('/')[-1]
+                return sorted(p for p in known if os.path.basename(os.path.dirname(p)) == package_dir)
+
+        # Fall back to a unique file with the same name (e.g. `#include "util.h"`, `mod util;`)
+        stem = Path(name.replace('::', '/').replace('\\', '/').split('/')[-1]).stem
+        matches = stems.get(stem, [])
+        return matches if len(matches) == 1 else []
+
+    @staticmethod
+    def _output_path(path: str, target_language: str, taken: Set[str]) -> str:
+        source = Path(path)
+        output = source.with_suffix(LANGUAGE_EXTENSIONS[target_language][0]).as_posix()
+        if output in taken:
+            # e.g. util.c and util.h both translating to util.py
+            output = source.with_name(
+                f"{source.stem}_{source.suffix.lstrip('.')}{LANGUAGE_EXTENSIONS[target_language][0]}"
+            ).as_posix()
+        taken.add(output)
+        return output
+
+    # Scheduling
+
+    async def _run_job(self, job: Dict):
+        files = job['files']
+        finished = {path for path, entry in files.items() if entry['status'] == 'done'}
+        pending = set(files) - finished
+        for path in pending:
+            files[path]['status'] = 'pending'
+
+        # Prefer files that unblock the most others
+        dependents = {path: 0 for path in files}
+        for entry in files.values():
+            for dependency in entry['dependencies']:
+                dependents[dependency] += 1
+
+        job['status'] = 'running'
+        await self._save(job)
+        running: Dict[asyncio.Task, str] = {}
+        try:
+            while pending or running:
+                ready = [
+                    path for path in pending
+                    if all(dependency in finished for dependency in files[path]['dependencies'])
+                ]
+                if not ready and not running:
+                    # Dependency cycle: break it at the file with the fewest unmet dependencies
+                    ready = [min(pending, key=lambda p: (
+                        sum(1 for d in files[p]['dependencies'] if d not in finished), p
+                    ))]
+                ready.sort(key=lambda p: (-dependents[p], p))
+
+                for path in ready[:self.max_parallel - len(running)]:
+                    pending.discard(path)
+                    files[path]['status'] = 'running'
+                    running[asyncio.create_task(self._translate_file(job, path))] = path
+
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    finished.add(running.pop(task))
+                await self._save(job)
+        except asyncio.CancelledError:
+            for task in running:
+                task.cancel()
+            raise
+
+        failed = any(entry['status'] == 'failed' for entry in files.values())
+        job['status'] = 'completed_with_errors' if failed else 'completed'
+        await self._save(job)
+
+    async def _translate_file(self, job: Dict, path: str):
+        entry = job['files'][path]
+        job_dir = self.root / job['job_id']
+        started = time.perf_counter()
+        try:
+            code = (job_dir / 'source' / path).read_text(encoding='utf-8', errors='replace')
+            if not code.strip():
+                translated = ""
+            else:
+                request = TranslateRequest(
+                    source_code=code,
+                    source_language=job['source_language'],
+                    target_language=job['target_language']
+                )
+                while True:
+                    try:
+                        result = await self.translation_service.translate(request)
+                        break
+                    except UpstreamOverloaded as e:
+                        # Back off instead of failing the file
+                        await asyncio.sleep(e.retry_after)
+                if not result.success:
+                    raise MigrationError(result.error or "Translation failed")
+                translated = result.translated_code
+
+            output = job_dir / 'output' / entry['output']
+            await asyncio.to_thread(self._write_output, output, translated)
+            entry['status'] = 'done'
+            entry['error'] = None
+        except asyncio.CancelledError:
+            entry['status'] = 'pending'
+            raise
+        except Exception as e:
+            entry['status'] = 'failed'
+            entry['error'] = str(e)
+        entry['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 3)
+
+    @staticmethod
+    def _write_output(path: Path, content: str):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content + ("\n" if content and not content.endswith("\n") else ""), encoding='utf-8')
+
+    async def _save(self, job: Dict):
+        job['updated_at'] = time.time()
+        manifest = self.root / job['job_id'] / MANIFEST_NAME
+        data = json.dumps(job, indent=2)
+        await asyncio.to_thread(self._atomic_write, manifest, data)
+
+    @staticmethod
+    def _atomic_write(path: Path, data: str):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix('.tmp')
+        tmp_path.write_text(data, encoding='utf-8')
+        os.replace(tmp_path, path)
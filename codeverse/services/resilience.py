@@ -0,0 +1,306 @@
+import asyncio
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+import httpx
+
+from codeverse.services import metrics
+from codeverse.services.http_clients import _env_bool, _env_float, _env_int
+from codeverse.services.scheduler import UpstreamOverloaded, UpstreamScheduler, schedulers
+
+# Upstream statuses worth retrying; 429 is left to the scheduler's backoff
+RETRYABLE_STATUSES = {500, 502, 503, 504}
+
+
+class CircuitOpen(UpstreamOverloaded):
+    """Raised without calling the upstream while its circuit breaker is open."""
+
+    def __init__(self, upstream: str, retry_after: float):
+        super().__init__(upstream, retry_after, "circuit open")
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    closed: calls go through; `failure_threshold` failures in a row open it.
+    open: calls fail fast with CircuitOpen for `recovery_time` seconds.
+    half_open: a single probe call is let through; success closes the
+    breaker, failure opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_time: float = 30.0):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_time = recovery_time
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+        self._probing = False
+
+    def before_call(self):
+        if self.state == "open":
+            remaining = self.opened_at + self.recovery_time - time.monotonic()
+            if remaining > 0:
+                self.rejected += 1
+                metrics.upstream_shed.labels(self.name, "circuit_open").inc()
+                raise CircuitOpen(self.name, remaining)
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self._probing:
+                self.rejected += 1
+                metrics.upstream_shed.labels(self.name, "circuit_open").inc()
+                raise CircuitOpen(self.name, 1)
+            self._probing = True
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self.state = "closed"
+        self._probing = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+    def abandon(self):
+        """Release the half-open probe if the call ended without a verdict (e.g. cancelled)."""
+        self._probing = False
+
+    def stats(self) -> Dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected
+        }
+
+
+class LatencyTracker:
+    """Sliding window of recent successful call latencies, in seconds."""
+
+    def __init__(self, window: int = 200):
+        self.samples = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class ResilientUpstream:
+    """
+    Retry, hedging and circuit breaking for calls to one upstream.
+
+    Every attempt takes a slot from the upstream's scheduler. Transport errors
+    and 5xx responses are retried up to `max_retries` times with full-jitter
+    exponential backoff. Once enough latency samples exist, an attempt still
+    running after the `hedge_quantile` latency (at least `hedge_min_delay`)
+    gets a duplicate request, and whichever good response arrives first wins.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        scheduler: UpstreamScheduler,
+        max_retries: int = 2,
+        backoff_base: float = 0.2,
+        backoff_max: float = 5.0,
+        hedge: bool = True,
+        hedge_quantile: float = 0.95,
+        hedge_min_delay: float = 0.5,
+        hedge_min_samples: int = 20,
+        failure_threshold: int = 5,
+        recovery_time: float = 30.0
+    ):
+        self.name = name
+        self.scheduler = scheduler
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker = CircuitBreaker(name, failure_threshold, recovery_time)
+        self.latency = LatencyTracker()
+
+        self.calls = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failures = 0
+
+    @staticmethod
+    def _is_failure(response: Optional[httpx.Response]) -> bool:
+        return response is None or response.status_code in RETRYABLE_STATUSES
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def hedge_delay(self) -> Optional[float]:
+        if not self.hedge or len(self.latency.samples) < self.hedge_min_samples:
+            return None
+        return max(self.hedge_min_delay, self.latency.quantile(self.hedge_quantile))
+
+    async def request(
+        self,
+        send: Callable[[], Awaitable[httpx.Response]],
+        tokens: int = 0
+    ) -> httpx.Response:
+        """
+        Run `send` (an idempotent request) with retries and hedging.
+
+        Returns the response (possibly a 4xx, or a 5xx once retries are used up)
+        or raises the last transport error.
+        """
+        self.calls += 1
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            response, error = None, None
+            try:
+                response = await self._attempt(send, tokens)
+            except httpx.TransportError as e:
+                error = e
+            finally:
+                self.breaker.abandon()
+
+            if not self._is_failure(response):
+                self.breaker.record_success()
+                return response
+
+            self.breaker.record_failure()
+            self.failures += 1
+            if attempt >= self.max_retries:
+                if error is not None:
+                    raise error
+                return response
+
+            attempt += 1
+            self.retries += 1
+            await asyncio.sleep(self._backoff(attempt))
+
+    async def _attempt(self, send, tokens: int) -> httpx.Response:
+        async def timed_send() -> Tuple[httpx.Response, float]:
+            async with self.scheduler.slot(tokens=tokens):
+                started = time.monotonic()
+                try:
+                    response = await send()
+                except httpx.TransportError:
+                    metrics.upstream_responses.labels(self.name, "error").inc()
+                    raise
+                elapsed = time.monotonic() - started
+                metrics.upstream_responses.labels(self.name, str(response.status_code)).inc()
+                metrics.upstream_request_seconds.labels(self.name).observe(elapsed)
+                return response, elapsed
+
+        def finish(result: Tuple[httpx.Response, float]) -> httpx.Response:
+            response, elapsed = result
+            if not self._is_failure(response):
+                self.latency.record(elapsed)
+            return response
+
+        primary = asyncio.create_task(timed_send())
+        delay = self.hedge_delay()
+        hedge = None
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait({primary}, timeout=delay)
+                if not done:
+                    self.hedges += 1
+                    hedge = asyncio.create_task(timed_send())
+            if hedge is None:
+                return finish(await primary)
+
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and not self._is_failure(task.result()[0]):
+                        if task is hedge:
+                            self.hedge_wins += 1
+                        return finish(task.result())
+            # Neither copy produced a good response; report the primary's outcome
+            return finish(primary.result())
+        finally:
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    @asynccontextmanager
+    async def guard(self, tokens: int = 0):
+        """
+        Circuit breaking and admission for calls that cannot be retried or
+        hedged, such as streamed responses. Report the status with `observe`.
+        """
+        self.calls += 1
+        self.breaker.before_call()
+        try:
+            async with self.scheduler.slot(tokens=tokens):
+                yield
+        except httpx.TransportError:
+            metrics.upstream_responses.labels(self.name, "error").inc()
+            self.failures += 1
+            self.breaker.record_failure()
+            raise
+        finally:
+            self.breaker.abandon()
+
+    def observe(self, response: httpx.Response):
+        metrics.upstream_responses.labels(self.name, str(response.status_code)).inc()
+        if self._is_failure(response):
+            self.failures += 1
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def stats(self) -> Dict:
+        p50 = self.latency.quantile(0.5)
+        p95 = self.latency.quantile(0.95)
+        return {
+            "breaker": self.breaker.stats(),
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "latency_p50_ms": round(p50 * 1000, 3) if p50 is not None else None,
+            "latency_p95_ms": round(p95 * 1000, 3) if p95 is not None else None
+        }
+
+
+def _upstream_from_env(name: str, prefix: str, hedge_min_delay: float, hedge: bool = True) -> ResilientUpstream:
+    return ResilientUpstream(
+        name,
+        schedulers[name],
+        max_retries=_env_int(f"{prefix}_MAX_RETRIES", 2),
+        backoff_base=_env_float(f"{prefix}_RETRY_BASE_DELAY", 0.2),
+        backoff_max=_env_float(f"{prefix}_RETRY_MAX_DELAY", 5.0),
+        hedge=_env_bool(f"{prefix}_HEDGE", hedge),
+        hedge_quantile=_env_float(f"{prefix}_HEDGE_QUANTILE", 0.95),
+        hedge_min_delay=_env_float(f"{prefix}_HEDGE_MIN_DELAY", hedge_min_delay),
+        failure_threshold=_env_int(f"{prefix}_BREAKER_FAILURES", 5),
+        recovery_time=_env_float(f"{prefix}_BREAKER_RECOVERY", 30.0)
+    )
+
+
+upstreams = {
+    "piston": _upstream_from_env("piston", "PISTON", 0.5),
+    "groq": _upstream_from_env("groq", "GROQ", 2.0),
+    # Hedging against a single local server would only compete with itself
+    "ollama": _upstream_from_env("ollama", "OLLAMA", 30.0, hedge=False),
+}
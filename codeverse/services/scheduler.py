@@ -0,0 +1,269 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from codeverse.services import metrics
+from codeverse.services.http_clients import _env_float, _env_int
+
+# Lower values are served first
+INTERACTIVE = 0
+BATCH = 1
+
+_request_priority = contextvars.ContextVar("codeverse_request_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def request_priority(priority: int):
+    """Run upstream calls made inside the block (and tasks created in it) at `priority`."""
+    token = _request_priority.set(priority)
+    try:
+        yield
+    finally:
+        _request_priority.reset(token)
+
+
+class UpstreamOverloaded(Exception):
+    """Raised when a request is shed instead of queued; maps to 503 + Retry-After."""
+
+    def __init__(self, upstream: str, retry_after: float, reason: str = "queue is full"):
+        self.upstream = upstream
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(f"{upstream} is overloaded ({reason}), retry after {self.retry_after}s")
+
+
+class TokenBucket:
+    """
+    Classic token bucket refilled continuously at `rate` per second.
+
+    `reserve` always debits and returns how long the caller has to wait for its
+    share, so callers that reserve in order are also released in order.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        self._refill()
+        # A single request larger than the bucket would otherwise wait forever
+        self.tokens -= min(amount, self.capacity)
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def refund(self, amount: float):
+        """Give back (or, with a negative amount, take) tokens after the fact."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def delay(self) -> float:
+        """Seconds until the bucket is back in credit."""
+        self._refill()
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class UpstreamScheduler:
+    """
+    Admission control for one upstream API.
+
+    A request first takes one of `max_concurrency` slots, waiting in a bounded
+    priority queue if none is free (interactive before batch, FIFO within a
+    priority). When the queue is full, or a request has waited `max_wait`
+    seconds (`batch_max_wait` for batch work, which has no user waiting on
+    each call), it is rejected with UpstreamOverloaded rather than piling up.
+    Holding a slot, it then waits for the request-rate and token-rate buckets,
+    and for any pause imposed by an upstream 429. The request bucket holds
+    `request_burst` requests, so a fan-out up to that size is not spread out
+    at the sustained rate.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        requests_per_second: float = 0.0,
+        tokens_per_minute: float = 0.0,
+        max_queue: int = 100,
+        max_wait: float = 30.0,
+        batch_max_wait: Optional[float] = None,
+        request_burst: float = 0.0
+    ):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.batch_max_wait = max_wait if batch_max_wait is None else batch_max_wait
+        self.requests_per_second = requests_per_second
+        self.tokens_per_minute = tokens_per_minute
+        # A zero rate disables that bucket
+        self.request_bucket = (
+            TokenBucket(requests_per_second, max(1.0, requests_per_second, request_burst))
+            if requests_per_second > 0 else None
+        )
+        self.token_bucket = (
+            TokenBucket(tokens_per_minute / 60.0, tokens_per_minute) if tokens_per_minute > 0 else None
+        )
+
+        self._active = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._paused_until = 0.0
+
+        self.admitted = 0
+        self.shed = 0
+        self.timed_out = 0
+        self.throttled = 0
+
+    @asynccontextmanager
+    async def slot(self, tokens: int = 0, priority: Optional[int] = None):
+        """Hold an upstream slot for the duration of the block."""
+        if priority is None:
+            priority = _request_priority.get()
+        await self._acquire(priority)
+        try:
+            await self._wait_for_rate(tokens)
+            self.admitted += 1
+            yield
+        finally:
+            self._release()
+
+    async def _acquire(self, priority: int):
+        if self._active < self.max_concurrency and not self._waiters:
+            self._active += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self.shed += 1
+            metrics.upstream_shed.labels(self.name, "queue_full").inc()
+            raise UpstreamOverloaded(self.name, self.retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        max_wait = self.batch_max_wait if priority >= BATCH else self.max_wait
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=max_wait or None)
+        except asyncio.TimeoutError:
+            if future.done():
+                # The slot was handed over just as the wait timed out
+                return
+            future.cancel()
+            self._discard(future)
+            self.timed_out += 1
+            metrics.upstream_shed.labels(self.name, "queue_timeout").inc()
+            raise UpstreamOverloaded(self.name, self.retry_after(), "queue wait timed out")
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release()
+            else:
+                future.cancel()
+                self._discard(future)
+            raise
+
+    def _discard(self, future: asyncio.Future):
+        self._waiters = [entry for entry in self._waiters if entry[2] is not future]
+        heapq.heapify(self._waiters)
+
+    def _release(self):
+        # Hand the slot straight to the next waiter so nobody can jump the queue
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._active -= 1
+
+    async def _wait_for_rate(self, tokens: int):
+        delay = self._paused_until - time.monotonic()
+        if self.request_bucket:
+            delay = max(delay, self.request_bucket.reserve(1))
+        if self.token_bucket and tokens:
+            delay = max(delay, self.token_bucket.reserve(tokens))
+        if delay > 0:
+            self.throttled += 1
+            await asyncio.sleep(delay)
+
+    def record_tokens(self, estimated: int, actual: Optional[int]):
+        """Correct the token bucket once the upstream reports real usage."""
+        if self.token_bucket and actual is not None:
+            self.token_bucket.refund(estimated - actual)
+
+    def backoff(self, seconds: float):
+        """Pause new requests after the upstream itself answered 429."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def retry_after(self) -> float:
+        """Rough estimate of when a rejected request would get through."""
+        rate = self.requests_per_second or float(self.max_concurrency)
+        delay = (len(self._waiters) + 1) / rate
+        delay = max(delay, self._paused_until - time.monotonic())
+        if self.token_bucket:
+            delay = max(delay, self.token_bucket.delay())
+        return delay
+
+    def stats(self) -> Dict:
+        return {
+            "active": self._active,
+            "queued": len(self._waiters),
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "requests_per_second": self.requests_per_second,
+            "tokens_per_minute": self.tokens_per_minute,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "timed_out": self.timed_out,
+            "throttled": self.throttled,
+            "paused_for": round(max(0.0, self._paused_until - time.monotonic()), 3)
+        }
+
+
+def retry_after_seconds(headers, default: float = 1.0) -> float:
+    """Read a Retry-After header given in seconds, falling back to `default`."""
+    value = headers.get("retry-after")
+    try:
+        return float(value) if value else default
+    except ValueError:
+        return default
+
+
+def _scheduler_from_env(name: str, prefix: str, concurrency: int, rps: float, tpm: float,
+                        burst: float = 0.0) -> UpstreamScheduler:
+    return UpstreamScheduler(
+        name,
+        max_concurrency=_env_int(f"{prefix}_MAX_CONCURRENCY", concurrency),
+        requests_per_second=_env_float(f"{prefix}_REQUESTS_PER_SECOND", rps),
+        tokens_per_minute=_env_float(f"{prefix}_TOKENS_PER_MINUTE", tpm),
+        max_queue=_env_int(f"{prefix}_MAX_QUEUE", 100),
+        max_wait=_env_float(f"{prefix}_MAX_QUEUE_WAIT", 30.0),
+        batch_max_wait=_env_float(f"{prefix}_BATCH_MAX_QUEUE_WAIT", 600.0),
+        request_burst=_env_float(f"{prefix}_REQUEST_BURST", burst)
+    )
+
+
+# Defaults follow the public Piston instance (5 req/s) and Groq's free tier
+# (30 req/min, which may all be spent at once); the token budget is off unless
+# configured. A local Ollama server generates one completion at a time.
+schedulers = {
+    "piston": _scheduler_from_env("piston", "PISTON", 5, 5.0, 0.0),
+    "groq": _scheduler_from_env("groq", "GROQ", 4, 0.5, 0.0, burst=30.0),
+    "ollama": _scheduler_from_env("ollama", "OLLAMA", 1, 0.0, 0.0),
+}
+
+
+def _collect_scheduler_metrics():
+    for name, scheduler in schedulers.items():
+        stats = scheduler.stats()
+        metrics.upstream_in_flight.labels(name).set(stats["active"])
+        metrics.upstream_queued.labels(name).set(stats["queued"])
+
+
+metrics.registry.on_collect(_collect_scheduler_metrics)
@@ -0,0 +1,171 @@
+import asyncio
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict
+
+from codeverse.core.incremental import SYNTAX, EditError, IncrementalDocument, TextEdit
+from codeverse.models.schemas import ParseSessionEditRequest, ParseSessionRequest, ParseSessionResponse
+from codeverse.services import metrics
+from codeverse.services.cache import LRUCache
+
+
+class SessionError(Exception):
+    """Raised for unusable session requests (unsupported language, oversized text)."""
+
+
+class SessionNotFound(SessionError):
+    pass
+
+
+class SessionConflict(SessionError):
+    """The client's edits do not apply to the server's copy; it should resend the whole text."""
+
+
+@dataclass
+class _Session:
+    document: IncrementalDocument
+    # Held while the document is being updated, including off-loop rescans
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+class ParseSessionService:
+    """
+    Editor sessions that keep a parsed copy of the open file server-side.
+
+    The editor opens a session with the full text and then sends only its
+    edits; each update re-lexes the changed lines and re-checks the syntax of
+    the statement around them (see codeverse.core.incremental) and answers
+    with fresh diagnostics and metrics, typically in a millisecond or two
+    even for files of several thousand lines, so it runs inline on the event
+    loop rather than on the CPU pool. An edit that changes how the rest of the
+    file lexes (opening a multi-line string or comment) re-lexes at most
+    PARSE_SESSION_RESCAN_LINES lines inline and finishes in a thread.
+
+    A full parse costs about a microsecond per character, so opening or
+    resyncing a text longer than PARSE_SESSION_INLINE_CHARS runs in a thread,
+    and an edit batch inserting more than that is refused with a conflict so
+    the client resends the text that way. Texts over PARSE_SESSION_MAX_CHARS
+    are refused outright: past it even a small edit overruns the loop budget.
+
+    Sessions live in memory in this worker. Idle ones expire after
+    PARSE_SESSION_IDLE_TTL seconds and the least recently used are dropped
+    beyond PARSE_SESSION_MAX; a client that gets 404 simply opens a new one.
+    """
+
+    def __init__(self):
+        self.sessions = LRUCache(
+            max_entries=int(os.getenv('PARSE_SESSION_MAX', 200)),
+            ttl=float(os.getenv('PARSE_SESSION_IDLE_TTL', 1800))
+        )
+        self.max_chars = int(os.getenv('PARSE_SESSION_MAX_CHARS', 400_000))
+        self.inline_chars = int(os.getenv('PARSE_SESSION_INLINE_CHARS', 10_000))
+        self.max_block_chars = int(os.getenv('PARSE_SESSION_MAX_BLOCK_CHARS', 8000))
+        self.max_diagnostics = int(os.getenv('PARSE_SESSION_MAX_DIAGNOSTICS', 100))
+        self.rescan_lines = int(os.getenv('PARSE_SESSION_RESCAN_LINES', 1000))
+
+    def _new_document(self, request: ParseSessionRequest) -> IncrementalDocument:
+        language = request.language.lower()
+        if language not in SYNTAX:
+            raise SessionError(f"Language '{request.language}' is not supported. Supported languages: {sorted(SYNTAX)}")
+        if len(request.text) > self.max_chars:
+            raise SessionError(f"Text is too large ({len(request.text)} characters, the limit is {self.max_chars})")
+        return IncrementalDocument(language, request.text, max_block_chars=self.max_block_chars,
+                                   rescan_budget=self.rescan_lines)
+
+    async def _build(self, request: ParseSessionRequest) -> IncrementalDocument:
+        if len(request.text) <= self.inline_chars:
+            return self._new_document(request)
+        return await asyncio.to_thread(self._new_document, request)
+
+    def _get(self, session_id: str) -> _Session:
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise SessionNotFound(f"Session '{session_id}' not found or expired")
+        # Reset the idle timer
+        self.sessions.set(session_id, session)
+        return session
+
+    def _response(self, session_id: str, document: IncrementalDocument, kind: str) -> ParseSessionResponse:
+        started = time.perf_counter()
+        diagnostics = document.diagnostics()[:self.max_diagnostics]
+        document_metrics = document.metrics()
+        elapsed_ms = document.last_update["elapsed_ms"] + (time.perf_counter() - started) * 1000
+        if kind != "get":
+            metrics.parse_session_update_seconds.labels(document.language, kind).observe(elapsed_ms / 1000)
+        return ParseSessionResponse(
+            session_id=session_id,
+            language=document.language,
+            version=document.version,
+            parser=document.parser_name,
+            diagnostics=diagnostics,
+            metrics=document_metrics,
+            reparsed_lines=document.last_update["reparsed_lines"],
+            elapsed_ms=round(elapsed_ms, 3)
+        )
+
+    async def open(self, request: ParseSessionRequest) -> ParseSessionResponse:
+        document = await self._build(request)
+        session_id = uuid.uuid4().hex
+        self.sessions.set(session_id, _Session(document))
+        return self._response(session_id, document, "open")
+
+    async def replace(self, session_id: str, request: ParseSessionRequest) -> ParseSessionResponse:
+        """Swap in a full new text (and possibly language), e.g. to resync after a conflict."""
+        session = self._get(session_id)
+        async with session.lock:
+            document = await self._build(request)
+            # The session may have expired or been closed while a large text was parsed in a thread
+            self._get(session_id)
+            # Keep versions increasing so stale edits from before the swap are refused
+            document.version = session.document.version + 1
+            session.document = document
+            return self._response(session_id, document, "open")
+
+    async def edit(self, session_id: str, request: ParseSessionEditRequest) -> ParseSessionResponse:
+        session = self._get(session_id)
+        async with session.lock:
+            return await self._edit(session_id, session.document, request)
+
+    async def _edit(self, session_id: str, document: IncrementalDocument,
+                    request: ParseSessionEditRequest) -> ParseSessionResponse:
+        if request.version != document.version:
+            raise SessionConflict(
+                f"Edits are based on version {request.version} but the session is at version {document.version}"
+            )
+        inserted = sum(len(edit.text) for edit in request.edits)
+        if inserted > self.inline_chars:
+            # A large paste costs as much as a full parse; take the off-loop path
+            document.version += 1
+            raise SessionConflict(f"Edits insert {inserted} characters; resend the full text")
+        try:
+            document.apply_edits([TextEdit(**edit.model_dump()) for edit in request.edits])
+        except EditError as e:
+            # Earlier edits of the batch may have been applied; refuse further
+            # edits until the client resends the full text
+            document.version += 1
+            raise SessionConflict(f"{e}; resend the full text")
+        if document.pending_rescan is not None:
+            started = time.perf_counter()
+            reparsed = await asyncio.to_thread(document.finish_rescan)
+            document.last_update["reparsed_lines"] += reparsed
+            document.last_update["elapsed_ms"] += (time.perf_counter() - started) * 1000
+        size = sum(map(len, document.lines)) + len(document.lines) - 1
+        if size > self.max_chars:
+            self.sessions.delete(session_id)
+            raise SessionError(f"Text is too large ({size} characters, the limit is {self.max_chars})")
+        return self._response(session_id, document, "edit")
+
+    async def get(self, session_id: str) -> ParseSessionResponse:
+        session = self._get(session_id)
+        # Wait out an edit whose rescan is finishing in a thread
+        async with session.lock:
+            return self._response(session_id, session.document, "get")
+
+    def close(self, session_id: str):
+        self._get(session_id)
+        self.sessions.delete(session_id)
+
+    def stats(self) -> Dict:
+        return {"sessions": self.sessions.stats()}
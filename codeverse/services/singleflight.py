@@ -0,0 +1,66 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+from codeverse.services import metrics
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into one execution.
+
+    The first caller for a key (the leader) starts the call as its own task;
+    callers arriving while it is in flight wait for the same task and get the
+    same result or exception. A caller that is cancelled only stops waiting;
+    the call itself is cancelled once nobody is waiting for it any more.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[str, int] = {}
+        self.leaders = 0
+        self.collapsed = 0
+
+    async def do(self, key: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.create_task(call())
+            self._calls[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(lambda _: self._forget(key, task))
+        else:
+            self.collapsed += 1
+            metrics.coalesced_requests.labels(self.name).inc()
+
+        self._waiters[key] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and self._waiters.get(key) == 1:
+                task.cancel()
+            raise
+        finally:
+            if key in self._waiters and self._calls.get(key) is task:
+                self._waiters[key] -= 1
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if not task.cancelled():
+            task.exception()  # mark retrieved in case every waiter gave up
+        if self._calls.get(key) is task:
+            del self._calls[key]
+            del self._waiters[key]
+
+    def stats(self) -> Dict:
+        total = self.leaders + self.collapsed
+        return {
+            "in_flight": len(self._calls),
+            "upstream_calls": self.leaders,
+            "collapsed": self.collapsed,
+            "collapse_rate": round(self.collapsed / total, 4) if total else 0.0
+        }
+
+
+# Shared across service instances, like the result caches
+translation_flights = SingleFlight("translations")
+execution_flights = SingleFlight("executions")
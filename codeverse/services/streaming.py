@@ -0,0 +1,80 @@
+import json
+from typing import Dict, Optional
+
+
+class CodeFenceStripper:
+    """
+    Strips Markdown code fences from a token stream as it arrives.
+
+    Text is processed line by line. If the first non-blank line opens a fence
+    (```lang) it is dropped, everything up to the closing fence is emitted, and
+    anything after the closing fence is discarded. Partial lines are emitted
+    early unless they could still turn out to be a fence.
+    """
+
+    def __init__(self):
+        self.state = "start"  # start -> plain | fenced -> done
+        self._line = ""
+        self._emitted = 0  # chars of the current partial line already emitted
+
+    def feed(self, text: str) -> str:
+        out = []
+        self._line += text
+        while "\n" in self._line:
+            line, self._line = self._line.split("\n", 1)
+            out.append(self._complete_line(line))
+            self._emitted = 0
+        out.append(self._partial_line())
+        return "".join(out)
+
+    def finish(self) -> str:
+        """Flush whatever is left of the last line."""
+        line, self._line = self._line, ""
+        if self.state == "done" or line.strip().startswith("```"):
+            return ""
+        if self.state == "start" and not line.strip():
+            return ""
+        return line[self._emitted:]
+
+    def _complete_line(self, line: str) -> str:
+        is_fence = line.strip().startswith("```")
+        if self.state == "start":
+            if not line.strip():
+                return ""
+            if is_fence:
+                self.state = "fenced"
+                return ""
+            self.state = "plain"
+        elif is_fence:
+            # A fence inside plain text opens the code block, a fence inside
+            # the code block closes it
+            self.state = "fenced" if self.state == "plain" else "done"
+            return ""
+        if self.state == "done":
+            return ""
+        return line[self._emitted:] + "\n"
+
+    def _partial_line(self) -> str:
+        if self.state == "done" or self.state == "start":
+            return ""
+        stripped = self._line.lstrip()
+        if not stripped or stripped.startswith("`"):
+            return ""
+        chunk = self._line[self._emitted:]
+        self._emitted = len(self._line)
+        return chunk
+
+
+def parse_sse_data(line: str) -> Optional[Dict]:
+    """Parse one `data:` line of an OpenAI-compatible chat completion stream."""
+    if not line.startswith("data:"):
+        return None
+    data = line[len("data:"):].strip()
+    if not data or data == "[DONE]":
+        return None
+    return json.loads(data)
+
+
+def format_sse(event: Dict) -> str:
+    """Format an event dict as a Server-Sent Events frame."""
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
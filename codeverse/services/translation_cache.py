@@ -0,0 +1,172 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from codeverse.services import metrics
+from codeverse.services.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+project_root = Path(__file__).parent.parent.parent
+default_cache_path = project_root / '.codeverse_cache' / 'translations.sqlite3'
+
+
+def normalize_source(source_code: str) -> str:
+    """Normalize code so whitespace-only differences hit the same cache entry."""
+    lines = source_code.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    return '\n'.join(line.rstrip() for line in lines).strip('\n')
+
+
+class TranslationCache:
+    """
+    Two-tier cache for translation results.
+
+    A bounded in-memory LRU sits in front of a persistent SQLite file. Entries are
+    content-addressed by a hash of the normalized source, the language pair, the
+    model and its sampling parameters, so any change to those misses the cache.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        memory_entries: Optional[int] = None,
+        disk_entries: Optional[int] = None,
+        ttl: Optional[float] = None
+    ):
+        self.path = Path(path or os.getenv('TRANSLATION_CACHE_PATH') or default_cache_path)
+        self.ttl = ttl if ttl is not None else float(os.getenv('TRANSLATION_CACHE_TTL', 7 * 24 * 3600))
+        self.disk_entries = disk_entries or int(os.getenv('TRANSLATION_CACHE_DISK_ENTRIES', 50000))
+        self.memory = LRUCache(
+            max_entries=memory_entries or int(os.getenv('TRANSLATION_CACHE_MEMORY_ENTRIES', 1024)),
+            ttl=self.ttl
+        )
+        self.disk_hits = 0
+        self.disk_misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    @staticmethod
+    def make_key(
+        source_code: str,
+        source_language: str,
+        target_language: str,
+        model: str,
+        sampling: Dict
+    ) -> str:
+        material = json.dumps({
+            "source": normalize_source(source_code),
+            "source_language": source_language.lower(),
+            "target_language": target_language.lower(),
+            "model": model,
+            "sampling": sampling
+        }, sort_keys=True)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS translations_accessed ON translations (accessed_at)")
+            self._conn = conn
+        return self._conn
+
+    def _disk_get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value, created_at FROM translations WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if now - created_at > self.ttl:
+                conn.execute("DELETE FROM translations WHERE key = ?", (key,))
+                conn.commit()
+                return None
+            conn.execute("UPDATE translations SET accessed_at = ? WHERE key = ?", (now, key))
+            conn.commit()
+            return value
+
+    def _disk_set(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO translations (key, value, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+            # Drop expired rows, then the least recently used ones beyond the size cap
+            conn.execute("DELETE FROM translations WHERE created_at < ?", (now - self.ttl,))
+            conn.execute(
+                "DELETE FROM translations WHERE key IN ("
+                "SELECT key FROM translations ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.disk_entries,)
+            )
+            conn.commit()
+
+    async def get(self, key: str) -> Optional[str]:
+        """Look up a translated snippet, promoting disk hits into memory."""
+        value = self.memory.get(key)
+        if value is not None:
+            metrics.cache_requests.labels("translation_memory", "hit").inc()
+            return value
+
+        try:
+            value = await asyncio.to_thread(self._disk_get, key)
+        except sqlite3.Error as e:
+            logger.warning("Translation cache read error: %s", e)
+            value = None
+
+        if value is None:
+            self.disk_misses += 1
+            metrics.cache_requests.labels("translation_disk", "miss").inc()
+            return None
+
+        self.disk_hits += 1
+        metrics.cache_requests.labels("translation_disk", "hit").inc()
+        self.memory.set(key, value)
+        return value
+
+    async def set(self, key: str, value: str):
+        """Store a translated snippet in both tiers."""
+        self.memory.set(key, value)
+        try:
+            await asyncio.to_thread(self._disk_set, key, value)
+        except sqlite3.Error as e:
+            logger.warning("Translation cache write error: %s", e)
+
+    def stats(self) -> Dict:
+        return {
+            "memory": self.memory.stats(),
+            "disk": {
+                "path": str(self.path),
+                "max_entries": self.disk_entries,
+                "hits": self.disk_hits,
+                "misses": self.disk_misses
+            },
+            "ttl": self.ttl
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+translation_cache = TranslationCache()
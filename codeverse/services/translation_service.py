@@ -1,23 +1,36 @@
 import os
 from pathlib import Path
-from dotenv import load_dotenv
-import json
-import httpx
-from codeverse.models.schemas import CodeTranslationRequest, TranslationResult
+import asyncio
+import logging
+import time
+from dataclasses import replace
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from codeverse.models.schemas import CodeTranslationRequest, TranslationResult, LLMConfig
+from codeverse.services import metrics
+from codeverse.services.cache import LRUCache
+from codeverse.services.translation_cache import translation_cache
+from codeverse.services.logging_config import fields
+from codeverse.services.streaming import CodeFenceStripper
+from codeverse.services.scheduler import BATCH, UpstreamOverloaded, request_priority
+from codeverse.services.llm_providers import ProviderError, create_llm_router
+from codeverse.services.singleflight import translation_flights
+from codeverse.core import rules
+from codeverse.core.chunker import Chunk, CodeChunker
 
-# Get the project root directory and load .env from there
 project_root = Path(__file__).parent.parent.parent
 env_path = project_root / '.env'
-load_dotenv(env_path)
+
+logger = logging.getLogger(__name__)
 
 class TranslationService:
     def __init__(self):
         self.api_key = os.getenv('GROQ_API_KEY')
-        print(f"Debug - Project root: {project_root}")
-        print(f"Debug - Env path: {env_path}")
-        print(f"Debug - API key exists: {bool(self.api_key)}")
-        
-        if not self.api_key or self.api_key == 'your_groq_api_key_here':
+        logger.debug("Translation service configuration", extra=fields(
+            project_root=str(project_root), env_path=str(env_path), api_key_set=bool(self.api_key)
+        ))
+
+        uses_groq = 'groq' in os.getenv('LLM_PROVIDERS', 'groq').lower()
+        if uses_groq and (not self.api_key or self.api_key == 'your_groq_api_key_here'):
             raise Exception(
                 "Invalid or missing GROQ_API_KEY in environment variables.\n"
                 "Please follow these steps to get a valid API key:\n"
@@ -28,12 +41,13 @@ class TranslationService:
                 "5. Add the key to your .env file at: {env_path}"
             )
         
-        self.base_url = "https://api.groq.com/openai/v1/chat/completions"
-        self.model = "mixtral-8x7b-32768"
-        self.headers = {
-            "Authorization": f"Bearer {self.api_key.strip()}",
-            "Content-Type": "application/json"
-        }
+        # Completions are routed across the providers in LLM_PROVIDERS
+        self.router = create_llm_router(self.api_key)
+        self.model = self.router.providers[0].model
+        self.llm_config = LLMConfig(model=self.model)
+        self.cache = translation_cache
+        # Identical requests arriving while one is in flight share its LLM call
+        self.inflight = translation_flights
         self.supported_languages = [
             'python',
             'javascript',
@@ -49,7 +63,72 @@ class TranslationService:
             'typescript'
         ]
 
-    def _create_translation_messages(self, source_code: str, source_lang: str, target_lang: str) -> list:
+        # Files longer than chunk_threshold_chars are split at top-level boundaries
+        # and translated in parallel chunks of up to chunk_max_chars
+        self.chunker = CodeChunker()
+        self.chunk_threshold_chars = int(os.getenv('TRANSLATE_CHUNK_THRESHOLD_CHARS', 8000))
+        self.chunk_max_chars = int(os.getenv('TRANSLATE_CHUNK_MAX_CHARS', 6000))
+        self.chunk_concurrency = int(os.getenv('TRANSLATE_CHUNK_CONCURRENCY', 4))
+
+        # Limits for /api/translate/batch
+        self.batch_max_items = int(os.getenv('TRANSLATE_BATCH_MAX_ITEMS', 500))
+        self.batch_max_concurrency = int(os.getenv('TRANSLATE_BATCH_MAX_CONCURRENCY', 4))
+
+        # mode="tiered": the offline rules serve a snippet when they cover at
+        # least rules_min_coverage of it; longer sources go straight to the LLM
+        self.modes = ('llm', 'tiered')
+        self.rules_min_coverage = float(os.getenv('TRANSLATE_RULES_MIN_COVERAGE', 1.0))
+        self.rules_max_chars = int(os.getenv('TRANSLATE_RULES_MAX_CHARS', 20000))
+
+        # Requests with a document_id keep the unit translations of the
+        # document's last version here (see _translate_document)
+        self.documents = LRUCache(
+            max_entries=int(os.getenv('TRANSLATE_DOCUMENT_MAX', 500)),
+            ttl=float(os.getenv('TRANSLATE_DOCUMENT_TTL', 3600))
+        )
+
+    def validate_request(self, request: CodeTranslationRequest) -> Optional[str]:
+        """Check languages and source code; returns an error message or None."""
+        with self._stage("validation", request.source_language, request.target_language).time():
+            # Validate languages
+            if request.source_language not in self.supported_languages:
+                return f"Source language '{request.source_language}' is not supported. Supported languages: {self.supported_languages}"
+
+            if request.target_language not in self.supported_languages:
+                return f"Target language '{request.target_language}' is not supported. Supported languages: {self.supported_languages}"
+
+            if request.mode not in self.modes:
+                return f"Translation mode '{request.mode}' is not supported. Supported modes: {list(self.modes)}"
+
+            # Clean and validate the source code
+            request.source_code = request.source_code.strip()
+            if not request.source_code:
+                return "Source code cannot be empty"
+
+            return None
+
+    def _pair_labels(self, source_language: str, target_language: str) -> tuple:
+        """Metric labels for a language pair (unsupported languages are grouped as "other")."""
+        source = source_language if source_language in self.supported_languages else "other"
+        target = target_language if target_language in self.supported_languages else "other"
+        return source, target
+
+    def _stage(self, stage: str, source_language: str, target_language: str):
+        """Stage latency histogram for a language pair."""
+        return metrics.translate_stage_seconds.labels(stage, *self._pair_labels(source_language, target_language))
+
+    def _create_translation_messages(self, source_code: str, source_lang: str, target_lang: str,
+                                     context: Optional[str] = None) -> list:
+        if context:
+            # Translating one chunk of a larger file
+            source_code = f"""(This is one part of a larger file. For reference only, the file's imports and
+top-level declarations are listed below. Do not translate or repeat them; translate only the part after them.)
+
+{context}
+
+Part to translate:
+{source_code}"""
+
         return [
             {
                 "role": "system",
@@ -80,85 +159,549 @@ ONLY return the translated code.
             }
         ]
 
-    async def translate(self, request: CodeTranslationRequest) -> TranslationResult:
+    def _sampling_params(self) -> dict:
+        return {
+            "temperature": self.llm_config.temperature,
+            "max_tokens": self.llm_config.max_tokens,
+            "top_p": self.llm_config.top_p,
+            "stop": self.llm_config.stop
+        }
+
+    def _cache_key(self, request: CodeTranslationRequest) -> str:
+        """Identifies a request (for sharing in-flight calls); cached results are keyed per provider."""
+        return self.cache.make_key(
+            request.source_code,
+            request.source_language,
+            request.target_language,
+            self.router.models,
+            self._sampling_params()
+        )
+
+    async def _cache_get(self, source_code: str, source_language: str,
+                         target_language: str) -> Optional[TranslationResult]:
+        """A cached translation from any of the configured providers."""
+        for provider in self.router.providers:
+            key = self.cache.make_key(source_code, source_language, target_language,
+                                      self.router.cache_model(provider.name), self._sampling_params())
+            cached_code = await self.cache.get(key)
+            if cached_code is not None:
+                return TranslationResult(
+                    success=True, translated_code=cached_code, cached=True, provider=provider.name, tier="llm"
+                )
+        return None
+
+    async def _cache_set(self, source_code: str, source_language: str, target_language: str,
+                         provider: Optional[str], translated_code: str):
+        """Cache a translation under the model that produced it (not if several providers did)."""
+        model = self.router.cache_model(provider) if provider else None
+        if model is not None:
+            key = self.cache.make_key(source_code, source_language, target_language, model, self._sampling_params())
+            await self.cache.set(key, translated_code)
+
+    def _clean_translation(self, translated_code: str, target_language: str) -> str:
+        """Strip Markdown code fences and a leading language tag from model output."""
+        translated_code = translated_code.strip()
+        if "```" in translated_code:
+            code_parts = translated_code.split("```")
+            if len(code_parts) >= 2:
+                translated_code = code_parts[1].strip()
+                if translated_code.startswith(target_language):
+                    translated_code = translated_code[len(target_language):].strip()
+        return translated_code
+
+    def _format_error(self, error_msg: str) -> str:
+        if "invalid_api_key" in error_msg.lower():
+            error_msg = (
+                "Invalid API key. Please check that:\n"
+                "1. You've copied the full API key from Groq console\n"
+                "2. The API key starts with 'gsk_'\n"
+                "3. There are no extra spaces or characters\n"
+                "4. The API key is active in your Groq console"
+            )
+        return f"Translation error: {error_msg}"
+
+    def _translate_rules(self, request: CodeTranslationRequest) -> Optional[TranslationResult]:
+        """
+        First tier of mode="tiered": the rule-based translation, if the rules
+        cover the whole snippet (see rules.translate_scored). Runs inline, as a
+        snippet takes well under a millisecond; None means ask the LLM.
+        """
+        result = self._rules_result(request)
+        metrics.translate_tiers.labels(
+            "llm" if result is None else "rules",
+            *self._pair_labels(request.source_language, request.target_language),
+        ).inc()
+        return result
+
+    def _rules_result(self, request: CodeTranslationRequest) -> Optional[TranslationResult]:
+        if len(request.source_code) > self.rules_max_chars:
+            return None
+        with self._stage("rules", request.source_language, request.target_language).time():
+            try:
+                translation = rules.translate_scored(
+                    request.source_code, request.source_language, request.target_language
+                )
+            except Exception:
+                logger.exception("Rule-based translation error")
+                return None
+        if translation is None or not translation.code.strip():
+            return None
+        if translation.coverage < self.rules_min_coverage:
+            logger.debug("Rules do not cover the snippet, escalating to the LLM", extra=fields(
+                coverage=translation.coverage, unsupported=list(translation.unsupported)
+            ))
+            return None
+        return TranslationResult(
+            success=True,
+            translated_code=translation.code.strip(),
+            error=None,
+            tier="rules",
+            confidence=translation.coverage
+        )
+
+    async def translate(self, request: CodeTranslationRequest, tiered: bool = True) -> TranslationResult:
+        """Translate one request; `tiered=False` skips the rules tier (already tried by the caller)."""
         try:
-            messages = self._create_translation_messages(
+            if request.document_id:
+                return await self._translate_document(request)
+
+            if tiered and request.mode == "tiered":
+                result = self._translate_rules(request)
+                if result is not None:
+                    return result
+
+            if not request.bypass_cache:
+                with self._stage("cache_lookup", request.source_language, request.target_language).time():
+                    cached = await self._cache_get(
+                        request.source_code, request.source_language, request.target_language
+                    )
+                if cached is not None:
+                    return cached
+
+            return await self.inflight.do(self._cache_key(request), lambda: self._translate_uncached(request))
+
+        except UpstreamOverloaded:
+            raise
+        except Exception as e:
+            error_msg = str(e)
+            logger.exception("Translation error")
+            return TranslationResult(
+                success=False,
+                translated_code=None,
+                error=self._format_error(error_msg)
+            )
+
+    async def _translate_uncached(self, request: CodeTranslationRequest) -> TranslationResult:
+        if len(request.source_code) > self.chunk_threshold_chars:
+            result = await self._translate_chunked(request)
+        else:
+            result = await self._translate_once(
                 request.source_code,
                 request.source_language,
                 request.target_language
             )
 
-            print(f"Debug - Using model: {self.model}")
-            print(f"Debug - Request messages: {json.dumps(messages, indent=2)}")
+        if result.success:
+            await self._cache_set(
+                request.source_code, request.source_language, request.target_language,
+                result.provider, result.translated_code
+            )
+        return result
 
-            payload = {
-                "model": self.model,
-                "messages": messages,
-                "temperature": 0.1,
-                "max_tokens": 4096,
-                "top_p": 0.95,
-                "stream": False
-            }
+    async def _translate_once(self, source_code: str, source_language: str, target_language: str,
+                              context: Optional[str] = None) -> TranslationResult:
+        """Translate one piece of code with a single completion call."""
+        with self._stage("prepare", source_language, target_language).time():
+            messages = self._create_translation_messages(
+                source_code,
+                source_language,
+                target_language,
+                context
+            )
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Translation request", extra=fields(
+                providers=[provider.name for provider in self.router.ranked(messages, self._sampling_params())],
+                messages=messages
+            ))
+
+        try:
+            with self._stage("upstream", source_language, target_language).time():
+                completion = await self.router.complete(messages, self._sampling_params())
+        except ProviderError as e:
+            logger.warning("Translation failed on every provider", extra=fields(error=str(e)))
+            return TranslationResult(
+                success=False,
+                translated_code=None,
+                error=str(e)
+            )
+
+        with self._stage("postprocess", source_language, target_language).time():
+            translated_code = self._clean_translation(completion.content, target_language)
+
+        if translated_code:
+            return TranslationResult(
+                success=True,
+                translated_code=translated_code,
+                error=None,
+                usage=completion.usage,
+                provider=completion.provider,
+                tier="llm"
+            )
+
+        return TranslationResult(
+            success=False,
+            translated_code=None,
+            error="Translation failed - Empty response"
+        )
+
+    async def _translate_chunked(self, request: CodeTranslationRequest) -> TranslationResult:
+        """
+        Translate a large file as parallel chunks (see _plan) and reassemble
+        them in order. The first chunk to fail cancels the others.
+        """
+        pieces, contexts = self._plan(request)
+        if len(pieces) <= 1:
+            return await self._translate_once(
+                request.source_code, request.source_language, request.target_language
+            )
+        limit = asyncio.Semaphore(max(1, self.chunk_concurrency))
 
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    self.base_url,
-                    headers=self.headers,
-                    json=payload,
-                    timeout=30.0
+        async def translate_piece(index: int) -> Tuple[int, TranslationResult]:
+            async with limit:
+                return index, await self._translate_once(
+                    pieces[index].code, request.source_language, request.target_language, contexts[index]
                 )
 
-                if response.status_code != 200:
-                    error_text = response.text
-                    print(f"Debug - Error Response: {error_text}")
+        results: List[Optional[TranslationResult]] = [None] * len(pieces)
+        tasks = [asyncio.create_task(translate_piece(index)) for index in range(len(pieces))]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                index, result = await next_done
+                if not result.success:
                     return TranslationResult(
                         success=False,
                         translated_code=None,
-                        error=f"API Error: {error_text}"
+                        error=f"Chunk {index + 1} of {len(results)} failed: {result.error}"
                     )
+                results[index] = result
+        finally:
+            # After a failure (or an exception such as UpstreamOverloaded) the other chunks are wasted calls
+            for task in tasks:
+                task.cancel()
 
-                result = response.json()
-                translated_code = result['choices'][0]['message']['content'].strip()
+        usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        for result in results:
+            for name in usage:
+                usage[name] += (result.usage or {}).get(name, 0)
 
-                # Clean up the response
-                if "```" in translated_code:
-                    code_parts = translated_code.split("```")
-                    if len(code_parts) >= 2:
-                        translated_code = code_parts[1].strip()
-                        if translated_code.startswith(request.target_language):
-                            translated_code = translated_code[len(request.target_language):].strip()
+        return TranslationResult(
+            success=True,
+            translated_code=self.chunker.assemble(
+                pieces, [result.translated_code for result in results], request.target_language
+            ),
+            error=None,
+            usage=usage,
+            provider=",".join(sorted({result.provider for result in results if result.provider})),
+            tier="llm"
+        )
 
-                if translated_code:
-                    return TranslationResult(
-                        success=True,
-                        translated_code=translated_code,
-                        error=None
-                    )
+    def _plan(self, request: CodeTranslationRequest) -> Tuple[List[Chunk], List[Optional[str]]]:
+        """
+        The pieces a file is translated in and the context each one gets.
+
+        Up to chunk_threshold_chars the file is one piece. Above it, the
+        top-level units (classes longer than chunk_max_chars split into their
+        shell and methods) are packed stably into chunks of up to
+        chunk_max_chars; the imports go with the first chunk, and every chunk
+        gets the imports and the file's signatures as context.
+        """
+        source = request.source_language
+        whole = [Chunk(index=0, name="file", code=request.source_code, start_line=1,
+                       end_line=request.source_code.count("\n") + 1)], [None]
+        if len(request.source_code) <= self.chunk_threshold_chars:
+            return whole
+        with self._stage("chunking", source, request.target_language).time():
+            header, units = self.chunker.split(request.source_code, source)
+            chunks = self.chunker.pack(
+                self.chunker.split_classes(units, source, self.chunk_max_chars), self.chunk_max_chars, stable=True
+            )
+        if len(chunks) <= 1:
+            return whole
+
+        if header.strip():
+            first = chunks[0].code.lstrip("\n")
+            chunks[0] = replace(chunks[0], code=f"{header}\n\n{first}")
+        context = self.chunker.context_header(header, units)
+        contexts: List[Optional[str]] = [self.chunker.context_header("", units) or None]
+        for chunk in chunks[1:]:
+            if chunk.kind == "member":
+                contexts.append(f"{context}\n\nThe part to translate is methods of {chunk.parent}, whose "
+                                "declaration and fields are translated separately: translate only these "
+                                "methods, as they appear inside the class body.")
+            else:
+                contexts.append(context)
+        return chunks, contexts
 
+    async def _translate_document(self, request: CodeTranslationRequest) -> TranslationResult:
+        """
+        Incremental translation of a document the client sends again after edits.
+
+        The source is split as for a one-off translation (see _plan) and each
+        piece is keyed by its content, language pair and model. Pieces whose
+        key was in the document's previous version reuse that translation;
+        the others are translated in parallel and everything is spliced back
+        in order. Editing one function of a large file costs one chunk's
+        translation, not the file's.
+        """
+        source, target = request.source_language, request.target_language
+        pieces, contexts = self._plan(request)
+        keys = [
+            self.cache.make_key(piece.code, source, target, self.router.models, self._sampling_params())
+            for piece in pieces
+        ]
+
+        document = self.documents.get(request.document_id)
+        # Rule-served units are only reused while the document stays in the same mode
+        previous: Dict[str, TranslationResult] = (
+            document["units"] if document and document["mode"] == request.mode else {}
+        )
+        limit = asyncio.Semaphore(max(1, self.chunk_concurrency))
+
+        async def translate_unit(piece: Chunk, unit_context: Optional[str]) -> TranslationResult:
+            async with limit:
+                return await self._translate_unit(request, piece, unit_context)
+
+        changed = [index for index, key in enumerate(keys) if key not in previous]
+        tasks = [asyncio.create_task(translate_unit(pieces[index], contexts[index])) for index in changed]
+        try:
+            # Failed units still let the others finish (they are kept for the
+            # retry), but an exception cancels them rather than leaving them running
+            translated = dict(zip(changed, await asyncio.gather(*tasks)))
+        finally:
+            for task in tasks:
+                task.cancel()
+        metrics.translate_document_units.labels("reused").inc(len(pieces) - len(changed))
+        metrics.translate_document_units.labels("translated").inc(len(changed))
+
+        results = [translated[index] if index in translated else previous[key] for index, key in enumerate(keys)]
+        # Keep what succeeded, so a retry after a failure only redoes the failed units
+        self.documents.set(request.document_id, {"mode": request.mode, "units": {
+            key: result.model_copy(update={"usage": None})
+            for key, result in zip(keys, results) if result.success
+        }})
+
+        usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        for index, result in enumerate(results):
+            if not result.success:
                 return TranslationResult(
                     success=False,
                     translated_code=None,
-                    error="Translation failed - Empty response"
+                    error=f"Unit {index + 1} of {len(results)} failed: {result.error}"
                 )
+            for name in usage:
+                usage[name] += (result.usage or {}).get(name, 0) if index in translated else 0
 
-        except Exception as e:
-            error_msg = str(e)
-            print(f"Translation error: {error_msg}")
-            
-            if "invalid_api_key" in error_msg.lower():
-                error_msg = (
-                    "Invalid API key. Please check that:\n"
-                    "1. You've copied the full API key from Groq console\n"
-                    "2. The API key starts with 'gsk_'\n"
-                    "3. There are no extra spaces or characters\n"
-                    "4. The API key is active in your Groq console"
+        return TranslationResult(
+            success=True,
+            translated_code=self.chunker.assemble(pieces, [result.translated_code for result in results], target),
+            error=None,
+            cached=not changed,
+            usage=usage,
+            provider=",".join(sorted({result.provider for result in results if result.provider})) or None,
+            tier=",".join(sorted({result.tier for result in results if result.tier})) or None,
+            units=len(results),
+            retranslated_units=len(changed)
+        )
+
+    async def _translate_unit(self, request: CodeTranslationRequest, piece: Chunk,
+                              context: Optional[str]) -> TranslationResult:
+        """One changed piece of a document: rules tier (if tiered), then the cache, then the LLM."""
+        code = piece.code
+        # The rules translate methods as free functions, so members go to the LLM
+        if request.mode == "tiered" and piece.kind != "member":
+            result = self._translate_rules(request.model_copy(update={"source_code": code}))
+            if result is not None:
+                return result
+        if not request.bypass_cache:
+            cached = await self._cache_get(code, request.source_language, request.target_language)
+            if cached is not None:
+                return cached
+        result = await self._translate_once(code, request.source_language, request.target_language, context)
+        if result.success:
+            await self._cache_set(
+                code, request.source_language, request.target_language, result.provider, result.translated_code
+            )
+        return result
+
+    async def translate_stream(self, request: CodeTranslationRequest) -> AsyncIterator[Dict]:
+        """
+        Translate code, yielding events as the completion streams in.
+
+        Yields {"type": "token", "content": ...} frames with code fences stripped
+        on the fly, then a final {"type": "done", ...} frame carrying the cleaned
+        result, or a {"type": "error", ...} frame.
+        """
+        try:
+            if request.document_id and len(request.source_code) > self.chunk_threshold_chars:
+                # Chunks are translated in parallel, so there is no single stream to relay.
+                # A smaller document is one piece, which the translation cache already reuses
+                yield self._final_event(await self.translate(request))
+                return
+
+            if request.mode == "tiered":
+                result = self._translate_rules(request)
+                if result is not None:
+                    yield {"type": "token", "content": result.translated_code}
+                    yield self._final_event(result)
+                    return
+
+            if not self.llm_config.stream:
+                result = await self.translate(request, tiered=False)
+                yield self._final_event(result)
+                return
+
+            if not request.bypass_cache:
+                with self._stage("cache_lookup", request.source_language, request.target_language).time():
+                    cached = await self._cache_get(
+                        request.source_code, request.source_language, request.target_language
+                    )
+                if cached is not None:
+                    yield {"type": "token", "content": cached.translated_code}
+                    yield self._final_event(cached)
+                    return
+
+            with self._stage("prepare", request.source_language, request.target_language).time():
+                messages = self._create_translation_messages(
+                    request.source_code,
+                    request.source_language,
+                    request.target_language
                 )
-            
-            return TranslationResult(
-                success=False,
-                translated_code=None,
-                error=f"Translation error: {error_msg}"
+            stripper = CodeFenceStripper()
+            raw_parts = []
+            provider = None
+            upstream_started = time.perf_counter()
+            try:
+                async for provider, content in self.router.stream(messages, self._sampling_params()):
+                    raw_parts.append(content)
+                    text = stripper.feed(content)
+                    if text:
+                        yield {"type": "token", "content": text}
+            except ProviderError as e:
+                yield {"type": "error", "success": False, "error": str(e)}
+                return
+
+            # Includes time the client took to consume tokens, as the stream is pulled by the response
+            self._stage("upstream", request.source_language, request.target_language).observe(
+                time.perf_counter() - upstream_started
+            )
+            tail = stripper.finish()
+            if tail:
+                yield {"type": "token", "content": tail}
+
+            with self._stage("postprocess", request.source_language, request.target_language).time():
+                translated_code = self._clean_translation("".join(raw_parts), request.target_language)
+            if not translated_code:
+                yield self._final_event(TranslationResult(
+                    success=False, error="Translation failed - Empty response"
+                ))
+                return
+
+            await self._cache_set(
+                request.source_code, request.source_language, request.target_language, provider, translated_code
             )
+            yield self._final_event(TranslationResult(
+                success=True, translated_code=translated_code, provider=provider, tier="llm"
+            ))
+
+        except UpstreamOverloaded as e:
+            yield {"type": "error", "success": False, "error": str(e), "retry_after": e.retry_after}
+        except Exception as e:
+            logger.exception("Translation error")
+            yield {"type": "error", "success": False, "error": self._format_error(str(e))}
+
+    async def translate_batch(
+        self,
+        items: List[CodeTranslationRequest],
+        max_concurrency: Optional[int] = None
+    ) -> AsyncIterator[Dict]:
+        """
+        Translate many requests, yielding one `item` event per input as it completes.
+
+        Items with the same cache key are translated once and share the result.
+        At most `max_concurrency` LLM calls run at a time. The last event is a
+        `summary` with counts, wall time and summed token usage.
+        """
+        started = time.perf_counter()
+        concurrency = min(max_concurrency or self.batch_max_concurrency, self.batch_max_concurrency)
+        limit = asyncio.Semaphore(max(1, concurrency))
+
+        # Group item indexes by translation key so duplicates share one call
+        groups: Dict[str, List[int]] = {}
+        group_requests: Dict[str, CodeTranslationRequest] = {}
+        invalid = []
+        for index, item in enumerate(items):
+            error = self.validate_request(item)
+            if error:
+                invalid.append((index, error))
+                continue
+            key = self._cache_key(item)
+            groups.setdefault(key, []).append(index)
+            group_requests.setdefault(key, item)
+
+        succeeded = failed = 0
+        usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+
+        for index, error in invalid:
+            failed += 1
+            yield {"type": "item", "index": index, "success": False, "translated_code": None, "error": error}
+
+        async def run_group(key: str):
+            item_started = time.perf_counter()
+            async with limit:
+                try:
+                    result = await self.translate(group_requests[key])
+                except UpstreamOverloaded as e:
+                    result = TranslationResult(success=False, translated_code=None, error=str(e))
+            return key, result, time.perf_counter() - item_started
+
+        # Batch work queues behind interactive requests for the upstream
+        with request_priority(BATCH):
+            tasks = [asyncio.create_task(run_group(key)) for key in groups]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                key, result, elapsed = await next_done
+                for name in usage:
+                    usage[name] += (result.usage or {}).get(name, 0)
+                for index in groups[key]:
+                    if result.success:
+                        succeeded += 1
+                    else:
+                        failed += 1
+                    yield {
+                        "type": "item",
+                        "index": index,
+                        **result.model_dump(exclude={"usage"}),
+                        "elapsed_ms": round(elapsed * 1000, 3)
+                    }
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        yield {
+            "type": "summary",
+            "total": len(items),
+            "unique": len(groups),
+            "succeeded": succeeded,
+            "failed": failed,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
+            "usage": usage
+        }
+
+    def _final_event(self, result: TranslationResult) -> Dict:
+        if not result.success:
+            return {"type": "error", "success": False, "error": result.error}
+        return {"type": "done", **result.model_dump()}
 
     def get_supported_languages(self) -> list:
         return self.supported_languages
\ No newline at end of file
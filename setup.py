@@ -4,10 +4,12 @@ setup(
     name="codeverse",
     version="0.1",
     packages=find_packages(),
+    python_requires=">=3.11.4",
     install_requires=[
-        "fastapi>=0.68.0",
+        "fastapi>=0.93.0",
+        "httpx[http2]>=0.24.0",
         "uvicorn>=0.15.0",
-        "pydantic>=1.8.0",
+        "pydantic>=2.0",
         "libcst>=0.3.19",
     ],
 ) 
\ No newline at end of file
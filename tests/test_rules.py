@@ -0,0 +1,90 @@
+from codeverse.core import rules
+
+
+def scored(code, source, target):
+    result = rules.translate_scored(code, source, target)
+    assert result is not None
+    return result
+
+
+def test_supported_snippet_scores_full_coverage():
+    result = scored("x = 1 + 2\nprint(x)\n", "python", "javascript")
+    assert result.coverage == 1.0
+    assert result.code == "let x = 1 + 2;\nconsole.log(x);\n"
+
+
+def test_let_hoisted_for_names_assigned_in_nested_blocks():
+    code = "def f(a):\n    if a:\n        y = 1\n    else:\n        y = 2\n    return y\n"
+    result = scored(code, "python", "javascript")
+    assert result.coverage == 1.0
+    assert result.code.splitlines()[1] == "    let y;"
+    assert "let y = " not in result.code
+
+
+def test_sequence_repetition_is_unsupported():
+    for code in ("x = [0] * 3\n", 'x = "a" * 3\n'):
+        result = scored(code, "python", "javascript")
+        assert result.coverage < 1.0
+        assert "sequence repetition" in result.unsupported
+
+
+def test_sequence_concatenation_is_unsupported():
+    result = scored("x = [1] + [2]\n", "python", "javascript")
+    assert result.coverage < 1.0
+    assert "sequence concatenation" in result.unsupported
+
+
+def test_object_literal_with_bare_keys_is_unsupported():
+    result = scored("let o = {a: 1};\nconsole.log(o.a);\n", "javascript", "python")
+    assert result.coverage < 1.0
+    assert "object literal with bare keys" in result.unsupported
+    assert "property access on an object" in result.unsupported
+
+
+def test_quoted_keys_and_blocks_are_not_object_literals():
+    code = "function f(a) {\n  if (a) {\n    return {'k': a};\n  }\n}\n"
+    assert scored(code, "javascript", "python").coverage == 1.0
+
+
+def test_string_concatenation_with_a_non_string_is_unsupported():
+    result = scored('let s = "a" + 1;\n', "javascript", "python")
+    assert result.coverage < 1.0
+    assert "string concatenation with a non-string" in result.unsupported
+
+
+def test_same_type_concatenation_is_supported():
+    code = 'let s = "a" + "b";\nlet n = 1 + +s;\nconsole.log(n);\n'
+    assert scored(code, "javascript", "python").coverage == 1.0
+
+
+def test_class_instantiation_is_unsupported():
+    code = "class A:\n    def __init__(self, n):\n        self.n = n\n\na = A(3)\n"
+    for source in (code, "b = Counter(3)\n"):
+        result = scored(source, "python", "javascript")
+        assert result.coverage < 1.0
+        assert "class instantiation" in result.unsupported
+
+
+def test_negative_index_is_unsupported():
+    for code in ("x = [1, 2]\ny = x[-1]\n", "s = 'ab'\nt = s[-1]\n"):
+        result = scored(code, "python", "javascript")
+        assert result.coverage < 1.0
+        assert "negative index" in result.unsupported
+
+
+def test_iteration_over_a_dict_is_unsupported():
+    result = scored("d = {'a': 1}\nfor k in d:\n    print(k)\n", "python", "javascript")
+    assert result.coverage < 1.0
+    assert "iteration over a non-range iterable" in result.unsupported
+    assert result.code.splitlines()[0] == "let d = {'a': 1};"
+
+
+def test_iteration_over_range_and_literals_is_supported():
+    for code in ("for i in range(3):\n    print(i)\n", "for v in [1, 2]:\n    print(v)\n"):
+        assert scored(code, "python", "javascript").coverage == 1.0
+
+
+def test_bitwise_operator_on_a_division_is_unsupported():
+    result = scored("let x = 7 / 2 | 0;\n", "javascript", "python")
+    assert result.coverage < 1.0
+    assert "bitwise operator on a division" in result.unsupported